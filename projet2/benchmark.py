@@ -0,0 +1,416 @@
+import argparse
+import contextlib
+import functools
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from bs4 import BeautifulSoup
+from book_record import BookRecord, DescriptionSpill
+from http_archive import HttpArchive, start_archive_server
+from http_session import create_session
+from parsers import DEFAULT_BACKEND
+from scraping_p1 import parse_product_page, rating_mapping
+
+
+"""
+Description : Mesures de performance des scripts de scraping, exécutées contre un serveur HTTP local afin de ne pas
+              dépendre du site http://books.toscrape.com.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+
+
+    Usage:
+        python benchmark.py pool [--requests N]
+        python benchmark.py parse [--iterations N]
+        python benchmark.py crawl [--archive FICHIER] [--concurrency 5,10,20,40] [--images]
+        python benchmark.py records [--books N]
+
+    Le crawl complet est mesuré contre une archive de réponses enregistrée avec http_archive.py, ou à défaut contre
+    un site de test construit à partir des pages du dossier fixtures.
+"""
+
+# Pages produit enregistrées utilisées par les mesures d'analyse HTML
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Page servie par le serveur local, de la taille d'une page produit typique
+FIXTURE_PAGE = b"<html><body>" + b"<p>Books to Scrape</p>" * 2000 + b"</body></html>"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """_summary_ : Gestionnaire HTTP/1.1 (keep-alive) qui sert la même page pour toutes les URL."""
+
+    protocol_version = "HTTP/1.1"
+    # Sans TCP_NODELAY, l'envoi séparé des en-têtes et du corps subit le délai d'acquittement TCP
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(FIXTURE_PAGE)))
+        self.end_headers()
+        self.wfile.write(FIXTURE_PAGE)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_fixture_server(handler_class: type = FixtureHandler) -> tuple[ThreadingHTTPServer, str]:
+    """_summary_ : Démarre un serveur HTTP local dans un thread en arrière-plan.
+
+    Args:
+        handler_class (type, optional): Gestionnaire des requêtes. Defaults to FixtureHandler.
+
+    Returns:
+        _tuple[ThreadingHTTPServer, str]_: Le serveur et son URL de base.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def requests_per_second(get, base_url: str, count: int) -> float:
+    """_summary_ : Mesure le débit de requêtes séquentielles effectuées avec la fonction get.
+
+    Args:
+        get (callable): Fonction qui effectue une requête GET sur une URL.
+        base_url (str): L'URL de base du serveur local.
+        count (int): Le nombre de requêtes à effectuer.
+
+    Returns:
+        _float_: Le nombre de requêtes par seconde.
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        get(f"{base_url}catalogue/book_{i}/index.html").content
+    return count / (time.perf_counter() - start)
+
+
+def bench_pool(args: argparse.Namespace) -> None:
+    """_summary_ : Compare requests.get (une connexion par requête) à la session partagée (connexions persistantes)."""
+    server, base_url = start_fixture_server()
+    try:
+        before = requests_per_second(requests.get, base_url, args.requests)
+        session = create_session()
+        after = requests_per_second(session.get, base_url, args.requests)
+        session.close()
+    finally:
+        server.shutdown()
+
+    print(f"requests.get       : {before:8.1f} requêtes/s")
+    print(f"session partagée   : {after:8.1f} requêtes/s")
+    print(f"gain               : x{after / before:.2f}")
+
+
+def load_product_fixtures() -> list[tuple[str, bytes]]:
+    """_summary_ : Charge les pages produit du dossier fixtures.
+
+    Returns:
+        _list[tuple[str, bytes]]_: L'URL d'origine et le contenu HTML de chaque page.
+    """
+    fixtures = []
+    for file_name in sorted(os.listdir(FIXTURES_DIR)):
+        if file_name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+                url = f"http://books.toscrape.com/catalogue/{file_name[:-5]}/index.html"
+                fixtures.append((url, f.read()))
+    return fixtures
+
+
+def parse_product_page_full_tree(page: bytes, url: str) -> dict:
+    """_summary_ : Analyse d'origine d'une page produit (arbre complet avec html.parser et une recherche par champ),
+    conservée comme point de comparaison."""
+    soup = BeautifulSoup(page, 'html.parser')
+    tds = soup.find_all('td')
+    review_class = soup.find('p', class_='star-rating')['class'][1]
+    image_url = soup.find('article', class_='product_page').find("div").find("img").get("src")
+    return {
+        'product_page_url': str(url),
+        'universal_product_code': tds[0].string,
+        'title': soup.h1.text,
+        'price_including_tax': tds[3].string,
+        'price_excluding_tax': tds[2].string,
+        'number_available': int(re.search(r'\d+', tds[5].string).group()),
+        'product_description': soup.find("meta", {"name": "description"}).get("content").strip(),
+        'category': soup.find("ul", class_="breadcrumb").find_all("li")[-2].find("a").text,
+        'review_rating': rating_mapping.get(review_class, None),
+        'image_url': url.rsplit('/', 2)[0] + '/' + image_url,
+    }
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    """_summary_ : Mesure le temps d'analyse d'une page produit pour chaque parseur disponible."""
+    fixtures = load_product_fixtures()
+    expected = [parse_product_page_full_tree(page, url) for url, page in fixtures]
+
+    candidates = [
+        ("html.parser, arbre complet", parse_product_page_full_tree),
+        ("html.parser + SoupStrainer", functools.partial(parse_product_page, backend="html.parser")),
+    ]
+    if DEFAULT_BACKEND == "lxml":
+        candidates.append(("lxml + SoupStrainer", functools.partial(parse_product_page, backend="lxml")))
+
+    for label, parse in candidates:
+        # Chaque parseur doit produire exactement les mêmes données que l'analyse d'origine
+        if [parse(page, url) for url, page in fixtures] != expected:
+            raise AssertionError(f"{label} ne produit pas les mêmes données que l'analyse d'origine")
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for url, page in fixtures:
+                parse(page, url)
+        per_page = (time.perf_counter() - start) / (args.iterations * len(fixtures))
+        print(f"{label:30} : {per_page * 1000:7.3f} ms/page")
+
+
+def build_fixture_archive(path: str, categories: int = 4, books_per_category: int = 45, page_size: int = 20) -> str:
+    """_summary_ : Construit une archive de réponses (voir http_archive.py) d'un site de test ayant la structure de
+    http://books.toscrape.com : page d'accueil, pages de catégorie paginées, pages produit (celles du dossier fixtures,
+    chacune avec son propre code UPC) et images. Le site est identique d'une exécution à l'autre.
+
+    Args:
+        path (str): Le chemin de l'archive.
+        categories (int, optional): Nombre de catégories. Defaults to 4.
+        books_per_category (int, optional): Nombre de livres par catégorie. Defaults to 45.
+        page_size (int, optional): Nombre de livres par page de catégorie. Defaults to 20.
+
+    Returns:
+        _str_: Le chemin de l'archive.
+    """
+    fixtures = load_product_fixtures()
+    html_headers = {"Content-Type": "text/html; charset=utf-8"}
+    with HttpArchive(path, "w") as archive:
+        category_slugs = [f"category-{number}_{number + 2}" for number in range(categories)]
+        nav = "".join(f'<li><a href="catalogue/category/books/{slug}/index.html">Category {slug}</a></li>' for slug in category_slugs)
+        archive.add("/index.html", 200, html_headers, (
+            '<html><body><div class="side_categories"><ul class="nav nav-list">'
+            f'<li><a href="catalogue/category/books_1/index.html">Books</a><ul>{nav}</ul></li></ul></div></body></html>'
+        ).encode())
+        archive.add("/", 200, html_headers, archive.get("/index.html")[2])
+
+        book_number = 0
+        for slug in category_slugs:
+            articles = []
+            for _ in range(books_per_category):
+                url, page = fixtures[book_number % len(fixtures)]
+                book_data = parse_product_page(page, url)
+                # Chaque livre a sa propre URL et son propre code UPC
+                upc = hashlib.sha256(str(book_number).encode()).hexdigest()[:16]
+                book_slug = f"book-{book_number}_{book_number}"
+                archive.add(f"/catalogue/{book_slug}/index.html", 200, html_headers,
+                            page.replace(book_data["universal_product_code"].encode(), upc.encode()))
+                archive.add(book_data["image_url"], 200, {"Content-Type": "image/jpeg"}, hashlib.sha256(upc.encode()).digest() * 256)
+                rating = next(name for name, value in rating_mapping.items() if value == book_data["review_rating"])
+                title = html.escape(book_data["title"])
+                articles.append(
+                    f'<li><article class="product_pod"><p class="star-rating {rating}"></p>'
+                    f'<h3><a href="../../../{book_slug}/index.html" title="{title}">{title[:20]}...</a></h3>'
+                    f'<div class="product_price"><p class="price_color">{book_data["price_including_tax"]}</p>'
+                    '<p class="instock availability">In stock</p></div></article></li>'
+                )
+                book_number += 1
+
+            pages = [articles[start:start + page_size] for start in range(0, len(articles), page_size)]
+            for index, page_articles in enumerate(pages):
+                first = index * page_size + 1
+                next_link = f'<li class="next"><a href="page-{index + 2}.html">next</a></li>' if index + 1 < len(pages) else ""
+                page_name = "index.html" if index == 0 else f"page-{index + 1}.html"
+                archive.add(f"/catalogue/category/books/{slug}/{page_name}", 200, html_headers, (
+                    f'<html><body><div class="page-header action"><h1>Category {slug}</h1></div>'
+                    f'<form><strong>{len(articles)}</strong> results - showing <strong>{first}</strong> to '
+                    f'<strong>{first + len(page_articles) - 1}</strong>.</form>'
+                    f'<ol class="row">{"".join(page_articles)}</ol>'
+                    f'<ul class="pager"><li class="current">Page {index + 1} of {len(pages)}</li>{next_link}</ul></body></html>'
+                ).encode())
+    return path
+
+
+def crawl_once(site_url: str, concurrency: int, download_images: bool) -> dict:
+    """_summary_ : Exécute un crawl complet de scraping_p3.py dans un dossier temporaire et retourne ses mesures.
+    Appelée dans un processus neuf, afin que la mémoire maximale mesurée soit celle de ce seul crawl.
+
+    Args:
+        site_url (str): L'URL du serveur d'archive.
+        concurrency (int): Nombre maximal de requêtes simultanées.
+        download_images (bool): Télécharger les images.
+
+    Returns:
+        _dict_: La durée, le débit, le nombre de requêtes, le temps d'analyse moyen d'une page produit et la mémoire
+        maximale du processus.
+    """
+    from scraping_p3 import scrape_all_category_books
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                scrape_all_category_books(
+                    site_url, "results_p3", download_images,
+                    concurrency=concurrency, per_host=concurrency, rate=0, report="report.json",
+                )
+            duration = time.perf_counter() - start
+            with open("report.json", encoding="utf-8") as f:
+                report = json.load(f)
+        finally:
+            os.chdir(cwd)
+    product = report["stages"].get("product", {})
+    return {
+        "duration_s": duration,
+        "pages_per_s": report["pages_per_s"],
+        "requests": report["requests"],
+        "parse_ms": (product.get("parse_ms") or {}).get("mean"),
+        # ru_maxrss est en kilo-octets sous Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bench_crawl(args: argparse.Namespace) -> None:
+    """_summary_ : Mesure le débit, le coût d'analyse par page et la mémoire d'un crawl complet de scraping_p3.py pour
+    plusieurs niveaux de concurrence, contre une archive rejouée par un serveur local."""
+    with tempfile.TemporaryDirectory() as folder:
+        archive_path = args.archive or build_fixture_archive(os.path.join(folder, "fixtures.zip"), args.categories, args.books)
+        with HttpArchive(archive_path) as archive:
+            server, site_url = start_archive_server(archive)
+            try:
+                print(f"Archive : {archive_path} ({len(archive)} réponses)")
+                print(f"{'concurrence':>11} {'durée (s)':>10} {'pages/s':>9} {'requêtes':>9} {'analyse (ms/page)':>18} {'RSS max (Mo)':>13}")
+                # spawn : chaque crawl s'exécute dans un processus neuf
+                context = multiprocessing.get_context("spawn")
+                for concurrency in args.concurrency:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(crawl_once, site_url, concurrency, args.images).result()
+                    print(
+                        f"{concurrency:>11} {result['duration_s']:>10.2f} {result['pages_per_s']:>9.1f} {result['requests']:>9} "
+                        f"{result['parse_ms'] or 0:>18.3f} {result['max_rss_mb']:>13.1f}"
+                    )
+            finally:
+                server.shutdown()
+
+
+def synthetic_books(count: int, categories: int = 50):
+    """_summary_ : Génère les données de livres fictifs, de la forme retournée par parse_product_page() : chaque livre a
+    sa propre URL, son propre titre et sa propre description (d'environ 1000 caractères, comme sur le site).
+
+    Args:
+        count (int): Nombre de livres.
+        categories (int, optional): Nombre de catégories. Defaults to 50.
+
+    Yields:
+        _dict_: Les données de chaque livre.
+    """
+    for number in range(count):
+        slug = f"book-{number}_{number}"
+        yield {
+            'product_page_url': f"http://books.toscrape.com/catalogue/{slug}/index.html",
+            'universal_product_code': f"{number:016x}",
+            'title': f"Book number {number}",
+            'price_including_tax': f"£{10 + number % 5000 / 100:.2f}",
+            'price_excluding_tax': f"£{10 + number % 5000 / 100:.2f}",
+            'number_available': number % 23,
+            'product_description': f"Description of book {number}. " + "Lorem ipsum dolor sit amet. " * 35,
+            # Chaque livre porte sa propre chaîne de catégorie, comme après l'analyse de sa page
+            'category': f"Category {number % categories}",
+            'review_rating': number % 5 + 1,
+            'image_url': f"http://books.toscrape.com/media/cache/{number:032x}.jpg",
+        }
+
+
+def traced_size(build) -> tuple[int, float]:
+    """_summary_ : Retourne la mémoire occupée par le résultat de build() et la durée de sa construction.
+
+    Args:
+        build (callable): La fonction qui construit les données mesurées.
+
+    Returns:
+        _tuple[int, float]_: La mémoire allouée encore occupée, en octets, et la durée en secondes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    duration = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size, duration
+
+
+def bench_records(args: argparse.Namespace) -> None:
+    """_summary_ : Compare la mémoire occupée par un catalogue fictif sous forme de dictionnaires et sous forme de
+    BookRecord (avec et sans fichier de débordement des descriptions), et le coût de la conversion en lignes CSV."""
+    # La forme compacte doit restituer exactement les données d'origine
+    with tempfile.TemporaryDirectory() as folder, DescriptionSpill(os.path.join(folder, "check.spill")) as spill:
+        for book_data in synthetic_books(1000):
+            if BookRecord.from_dict(book_data, spill).to_dict() != book_data:
+                raise AssertionError("BookRecord ne restitue pas les données d'origine")
+
+    print(f"Catalogue fictif de {args.books} livres")
+    print(f"{'représentation':32} {'mémoire (Mo)':>13} {'octets/livre':>13} {'construction (s)':>17}")
+    with tempfile.TemporaryDirectory() as folder:
+        spill_path = os.path.join(folder, "descriptions.spill")
+        candidates = [
+            ("dictionnaires", lambda: list(synthetic_books(args.books))),
+            ("BookRecord", lambda: [BookRecord.from_dict(book_data) for book_data in synthetic_books(args.books)]),
+        ]
+        for label, build in candidates:
+            size, duration = traced_size(build)
+            print(f"{label:32} {size / 2**20:>13.1f} {size / args.books:>13.0f} {duration:>17.2f}")
+
+        with DescriptionSpill(spill_path) as spill:
+            size, duration = traced_size(lambda: [BookRecord.from_dict(book_data, spill) for book_data in synthetic_books(args.books)])
+            print(f"{'BookRecord + débordement':32} {size / 2**20:>13.1f} {size / args.books:>13.0f} {duration:>17.2f}")
+            print(f"Fichier de débordement : {os.path.getsize(spill_path) / 2**20:.1f} Mo")
+
+            records = [BookRecord.from_dict(book_data, spill) for book_data in synthetic_books(args.books)]
+            for label, convert in (("to_row()", BookRecord.to_row), ("to_dict()", BookRecord.to_dict)):
+                start = time.perf_counter()
+                for record in records:
+                    convert(record)
+                per_book = (time.perf_counter() - start) / len(records)
+                print(f"Conversion {label:10} : {per_book * 1e6:.2f} µs/livre (avec relecture des descriptions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures de performance des scripts de scraping contre un serveur HTTP local")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pool_parser = subparsers.add_parser("pool", help="Débit des requêtes avec et sans pool de connexions persistantes")
+    pool_parser.add_argument("--requests", type=int, default=500, metavar="N", help="Nombre de requêtes à effectuer")
+    pool_parser.set_defaults(func=bench_pool)
+
+    parse_parser = subparsers.add_parser("parse", help="Temps d'analyse d'une page produit enregistrée dans fixtures")
+    parse_parser.add_argument("--iterations", type=int, default=200, metavar="N", help="Nombre d'analyses de chaque page")
+    parse_parser.set_defaults(func=bench_parse)
+
+    crawl_parser = subparsers.add_parser("crawl", help="Crawl complet de scraping_p3.py rejoué depuis une archive, pour plusieurs niveaux de concurrence")
+    crawl_parser.add_argument("--archive", help="Archive enregistrée avec http_archive.py (par défaut, un site de test construit à partir de fixtures)")
+    crawl_parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[5, 10, 20, 40], metavar="N,N,...", help="Niveaux de concurrence mesurés")
+    crawl_parser.add_argument("--images", action="store_true", help="Télécharger également les images")
+    crawl_parser.add_argument("--categories", type=int, default=4, metavar="N", help="Nombre de catégories du site de test")
+    crawl_parser.add_argument("--books", type=int, default=45, metavar="N", help="Nombre de livres par catégorie du site de test")
+    crawl_parser.set_defaults(func=bench_crawl)
+
+    records_parser = subparsers.add_parser("records", help="Mémoire d'un catalogue fictif sous forme de dictionnaires et de BookRecord")
+    records_parser.add_argument("--books", type=int, default=100000, metavar="N", help="Nombre de livres du catalogue fictif")
+    records_parser.set_defaults(func=bench_records)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import re
+import struct
+import sys
+import threading
+from scraping_p1 import BOOK_FIELDS, parse_price
+
+
+"""
+Description : Représentation compacte des données d'un livre, pour conserver en mémoire un grand nombre de livres.
+              Un dictionnaire de dix clés par livre coûte son tableau de hachage et une chaîne par valeur ; BookRecord
+              range les mêmes données dans des attributs à emplacements fixes (__slots__) :
+                - les noms de catégorie et les symboles monétaires sont internés (une seule chaîne par valeur) ;
+                - les prix et le stock sont convertis une seule fois en nombres, y compris lorsqu'ils sont lus dans
+                  un fichier CSV ;
+                - les descriptions longues peuvent être écrites dans un fichier de débordement (DescriptionSpill),
+                  le livre ne conservant que leur position dans le fichier.
+
+              to_dict() et to_row() restituent les valeurs exactes du dictionnaire d'origine, dans l'ordre des
+              colonnes des fichiers CSV (le stock d'une ligne CSV est restitué sous forme d'entier).
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Longueur à partir de laquelle une description est écrite dans le fichier de débordement, en caractères
+DEFAULT_SPILL_THRESHOLD = 256
+
+# Prix affiché sur le site : symbole monétaire suivi du montant ("£51.77")
+price_pattern = re.compile(r'(\D*)(\d+\.\d{2})$')
+
+# En-tête de chaque description du fichier de débordement : sa longueur en octets
+length_header = struct.Struct('<I')
+
+
+class DescriptionSpill:
+    """_summary_ : Fichier de débordement des descriptions longues. Chaque description est écrite une seule fois, à la
+    suite des précédentes, et relue à partir de sa position dans le fichier.
+
+    Args:
+        path (str): Le chemin du fichier, remplacé s'il existe.
+        threshold (int, optional): Longueur minimale d'une description écrite dans le fichier, en caractères.
+            Defaults to DEFAULT_SPILL_THRESHOLD.
+    """
+
+    def __init__(self, path: str, threshold: int = DEFAULT_SPILL_THRESHOLD) -> None:
+        self.path = path
+        self.threshold = threshold
+        self.file = open(path, "w+b")
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "DescriptionSpill":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, description: str) -> int:
+        """_summary_ : Écrit une description à la fin du fichier.
+
+        Args:
+            description (str): La description.
+
+        Returns:
+            _int_: La position de la description dans le fichier.
+        """
+        data = description.encode("utf-8")
+        with self.lock:
+            offset = self.size
+            self.file.seek(offset)
+            self.file.write(length_header.pack(len(data)))
+            self.file.write(data)
+            self.size += length_header.size + len(data)
+        return offset
+
+    def read(self, offset: int) -> str:
+        """_summary_ : Relit la description écrite à une position du fichier.
+
+        Args:
+            offset (int): La position retournée par write().
+
+        Returns:
+            _str_: La description.
+        """
+        with self.lock:
+            self.file.seek(offset)
+            (length,) = length_header.unpack(self.file.read(length_header.size))
+            return self.file.read(length).decode("utf-8")
+
+    def close(self) -> None:
+        """_summary_ : Ferme le fichier. Les descriptions qui y ont été écrites ne sont plus lisibles."""
+        self.file.close()
+
+
+def _split_price(price: str) -> tuple[str, float]:
+    # Le symbole monétaire est conservé à part, afin de restituer exactement le prix affiché
+    if price is None:
+        return None, None
+    match = price_pattern.match(price)
+    if match is None:
+        raise ValueError(f"Prix invalide : {price!r}")
+    return sys.intern(match.group(1)), parse_price(match.group(2))
+
+
+def _format_price(currency: str, price: float) -> str:
+    return None if price is None else f"{currency}{price:.2f}"
+
+
+class BookRecord:
+    """_summary_ : Données d'un livre, équivalentes au dictionnaire retourné par parse_product_page(), sous une forme
+    compacte. Les prix sont des nombres (price_including_tax, price_excluding_tax) et la description est lue dans le
+    fichier de débordement si elle y a été écrite.
+    """
+
+    __slots__ = (
+        'product_page_url',
+        'universal_product_code',
+        'title',
+        'price_including_tax',
+        'price_excluding_tax',
+        'number_available',
+        '_description',
+        'category',
+        'review_rating',
+        'image_url',
+        'currency',
+        '_spill',
+    )
+
+    @classmethod
+    def from_dict(cls, book_data: dict, spill: DescriptionSpill = None) -> "BookRecord":
+        """_summary_ : Construit la forme compacte des données d'un livre.
+
+        Args:
+            book_data (dict): Les données du livre, éventuellement limitées à certains champs (les champs absents
+                valent None).
+            spill (DescriptionSpill, optional): Le fichier de débordement des descriptions longues. Defaults to None.
+
+        Returns:
+            _BookRecord_: Les données du livre.
+        """
+        record = cls.__new__(cls)
+        get = book_data.get
+        record.product_page_url = get('product_page_url')
+        record.universal_product_code = get('universal_product_code')
+        record.title = get('title')
+        currency_including, record.price_including_tax = _split_price(get('price_including_tax'))
+        currency_excluding, record.price_excluding_tax = _split_price(get('price_excluding_tax'))
+        record.currency = currency_including or currency_excluding
+        number_available = get('number_available')
+        # Le stock lu dans un fichier CSV est une chaîne : il est converti en entier, comme celui de parse_product_page()
+        record.number_available = int(number_available) if number_available not in (None, '') else None
+        description = get('product_description')
+        if spill is not None and description is not None and len(description) >= spill.threshold:
+            record._description = spill.write(description)
+            record._spill = spill
+        else:
+            record._description = description
+            record._spill = None
+        category = get('category')
+        record.category = sys.intern(category) if category is not None else None
+        record.review_rating = get('review_rating')
+        record.image_url = get('image_url')
+        return record
+
+    @property
+    def product_description(self) -> str:
+        """_summary_ : La description du livre, relue dans le fichier de débordement si nécessaire."""
+        if self._spill is not None:
+            return self._spill.read(self._description)
+        return self._description
+
+    def to_row(self) -> tuple:
+        """_summary_ : Retourne les valeurs du livre dans l'ordre de BOOK_FIELDS (colonnes des fichiers CSV), avec les
+        prix tels qu'affichés sur le site."""
+        return (
+            self.product_page_url,
+            self.universal_product_code,
+            self.title,
+            _format_price(self.currency, self.price_including_tax),
+            _format_price(self.currency, self.price_excluding_tax),
+            self.number_available,
+            self.product_description,
+            self.category,
+            self.review_rating,
+            self.image_url,
+        )
+
+    def to_dict(self) -> dict:
+        """_summary_ : Retourne les données du livre sous la forme du dictionnaire retourné par parse_product_page()."""
+        return dict(zip(BOOK_FIELDS, self.to_row()))
+
+    def __repr__(self) -> str:
+        return f"BookRecord({self.universal_product_code!r}, {self.title!r})"
@@ -0,0 +1,299 @@
+import argparse
+import csv
+import glob
+import heapq
+import os
+import sqlite3
+import tempfile
+from scraping_p1 import parse_price
+
+
+"""
+Description : Comparaison de deux crawls (deux dossiers de fichiers CSV produits par scraping_p3.py, deux fichiers CSV
+              ou deux catalogues SQLite), pour le suivi des prix. Les livres sont identifiés par leur code UPC ; le
+              rapport contient une ligne par livre ajouté, supprimé, ou dont le prix TTC ou le stock a changé.
+
+              La comparaison se fait en un seul passage sur les deux crawls triés par code UPC (jointure par
+              fusion). Les fichiers CSV sont triés par un tri externe : des lots d'au plus run_size livres sont
+              triés en mémoire et écrits dans des fichiers temporaires, puis fusionnés. La mémoire utilisée ne
+              dépend donc pas de la taille du catalogue. Un catalogue SQLite est lu directement dans l'ordre des
+              codes UPC.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+
+
+    Usage:
+        python crawl_diff.py ANCIEN NOUVEAU [--output FICHIER] [--run-size N]
+
+    Input:
+        ANCIEN, NOUVEAU : dossier de fichiers CSV (par exemple une copie de results_p3), fichier CSV ou catalogue
+        SQLite (fichier .sqlite ou .db écrit avec --sink sqlite).
+
+    Output:
+        crawl_diff.csv : fichier CSV contenant une ligne par changement : change (added, removed, price_changed,
+        stock_changed), universal_product_code, title, category, old_price, new_price, old_stock, new_stock,
+        product_page_url
+"""
+
+# Rapport par défaut
+DEFAULT_OUTPUT = "crawl_diff.csv"
+
+# Nombre maximal de livres triés en mémoire à la fois
+DEFAULT_RUN_SIZE = 100000
+
+# Nombre maximal de fichiers temporaires fusionnés à la fois
+MERGE_WIDTH = 64
+
+# Types de changement
+ADDED, REMOVED, PRICE_CHANGED, STOCK_CHANGED = "added", "removed", "price_changed", "stock_changed"
+
+# Colonnes du rapport
+DIFF_FIELDS = (
+    'change',
+    'universal_product_code',
+    'title',
+    'category',
+    'old_price',
+    'new_price',
+    'old_stock',
+    'new_stock',
+    'product_page_url',
+)
+
+# Extensions des catalogues SQLite
+SQLITE_EXTENSIONS = (".sqlite", ".db")
+
+# Livres d'un catalogue SQLite, dans l'ordre des codes UPC (l'ordre binaire de SQLite est celui des chaînes Python)
+SELECT_BOOKS = """
+SELECT universal_product_code, title, category, price_including_tax, number_available, product_page_url
+FROM books ORDER BY universal_product_code
+"""
+
+
+def snapshot_files(path: str) -> list[str]:
+    """_summary_ : Retourne les fichiers CSV d'un crawl.
+
+    Args:
+        path (str): Un dossier de fichiers CSV ou un fichier CSV.
+
+    Returns:
+        _list[str]_: Les chemins des fichiers CSV.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.csv")))
+    if os.path.isfile(path):
+        return [path]
+    raise ValueError(f"Crawl introuvable : {path}")
+
+
+def _parse_stock(value: str) -> int:
+    return int(value) if value not in (None, "") else None
+
+
+def read_csv_entries(path: str):
+    """_summary_ : Parcourt les livres des fichiers CSV d'un crawl, dans l'ordre des fichiers.
+
+    Args:
+        path (str): Un dossier de fichiers CSV ou un fichier CSV.
+
+    Yields:
+        _tuple_: Le code UPC, le titre, la catégorie, le prix TTC (nombre), le stock et l'URL de chaque livre.
+    """
+    for filename in snapshot_files(path):
+        with open(filename, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames and 'universal_product_code' not in reader.fieldnames:
+                raise ValueError(f"Le fichier {filename} n'a pas de colonne universal_product_code")
+            for row in reader:
+                if not row['universal_product_code']:
+                    continue
+                yield (
+                    row['universal_product_code'],
+                    row.get('title'),
+                    row.get('category'),
+                    parse_price(row.get('price_including_tax')),
+                    _parse_stock(row.get('number_available')),
+                    row.get('product_page_url'),
+                )
+
+
+def _write_run(entries: list[tuple], folder: str, number: int) -> str:
+    # Les prix sont écrits avec repr() afin d'être relus à l'identique
+    path = os.path.join(folder, f"run-{number}.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for upc, title, category, price, stock, url in entries:
+            writer.writerow(
+                (upc, title, category, "" if price is None else repr(price), "" if stock is None else stock, url)
+            )
+    return path
+
+
+def _read_run(path: str):
+    with open(path, newline='', encoding='utf-8') as f:
+        for upc, title, category, price, stock, url in csv.reader(f):
+            yield upc, title, category, float(price) if price else None, _parse_stock(stock), url
+
+
+def _entry_key(entry: tuple) -> str:
+    return entry[0]
+
+
+def sorted_entries(path: str, folder: str, run_size: int = DEFAULT_RUN_SIZE):
+    """_summary_ : Parcourt les livres d'un crawl dans l'ordre des codes UPC.
+
+    Args:
+        path (str): Un dossier de fichiers CSV, un fichier CSV ou un catalogue SQLite.
+        folder (str): Le dossier des fichiers temporaires du tri externe.
+        run_size (int, optional): Nombre maximal de livres triés en mémoire à la fois. Defaults to DEFAULT_RUN_SIZE.
+
+    Yields:
+        _tuple_: Les livres, comme read_csv_entries(), triés par code UPC.
+    """
+    if path.endswith(SQLITE_EXTENSIONS):
+        if not os.path.isfile(path):
+            raise ValueError(f"Crawl introuvable : {path}")
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            yield from connection.execute(SELECT_BOOKS)
+        finally:
+            connection.close()
+        return
+
+    # Tri externe : lots triés en mémoire et écrits dans des fichiers temporaires
+    prefix = os.path.join(folder, str(len(os.listdir(folder))))
+    os.makedirs(prefix)
+    runs, batch = [], []
+    for entry in read_csv_entries(path):
+        batch.append(entry)
+        if len(batch) >= run_size:
+            batch.sort(key=_entry_key)
+            runs.append(_write_run(batch, prefix, len(runs)))
+            batch = []
+    batch.sort(key=_entry_key)
+    if not runs:
+        # Le crawl tient dans un seul lot : pas de fichier temporaire
+        yield from batch
+        return
+
+    # Fusion par étapes, afin de ne pas ouvrir plus de MERGE_WIDTH fichiers à la fois
+    number = len(runs)
+    while len(runs) + 1 > MERGE_WIDTH:
+        group, runs = runs[:MERGE_WIDTH], runs[MERGE_WIDTH:]
+        runs.append(_write_run(heapq.merge(*map(_read_run, group), key=_entry_key), prefix, number))
+        number += 1
+        for run in group:
+            os.remove(run)
+    yield from heapq.merge(*map(_read_run, runs), batch, key=_entry_key)
+
+
+def _unique(entries):
+    # Un livre présent dans plusieurs fichiers du même crawl n'est comparé qu'une fois
+    previous = None
+    for entry in entries:
+        if entry[0] != previous:
+            previous = entry[0]
+            yield entry
+
+
+def _change(change: str, old: tuple, new: tuple) -> dict:
+    current = new or old
+    return {
+        'change': change,
+        'universal_product_code': current[0],
+        'title': current[1],
+        'category': current[2],
+        'old_price': old[3] if old else None,
+        'new_price': new[3] if new else None,
+        'old_stock': old[4] if old else None,
+        'new_stock': new[4] if new else None,
+        'product_page_url': current[5],
+    }
+
+
+def diff_snapshots(old_path: str, new_path: str, run_size: int = DEFAULT_RUN_SIZE):
+    """_summary_ : Compare deux crawls par une jointure par fusion sur le code UPC.
+
+    Args:
+        old_path (str): L'ancien crawl : dossier de fichiers CSV, fichier CSV ou catalogue SQLite.
+        new_path (str): Le nouveau crawl, sous l'une des mêmes formes.
+        run_size (int, optional): Nombre maximal de livres triés en mémoire à la fois, par crawl. Defaults to
+            DEFAULT_RUN_SIZE.
+
+    Yields:
+        _dict_: Un changement, avec les colonnes DIFF_FIELDS, dans l'ordre des codes UPC. Un livre dont le prix et le
+        stock ont changé produit deux changements.
+    """
+    with tempfile.TemporaryDirectory(prefix="crawl_diff_") as folder:
+        old_entries = _unique(sorted_entries(old_path, folder, run_size))
+        new_entries = _unique(sorted_entries(new_path, folder, run_size))
+        old = next(old_entries, None)
+        new = next(new_entries, None)
+        while old is not None or new is not None:
+            if new is None or (old is not None and old[0] < new[0]):
+                yield _change(REMOVED, old, None)
+                old = next(old_entries, None)
+            elif old is None or new[0] < old[0]:
+                yield _change(ADDED, None, new)
+                new = next(new_entries, None)
+            else:
+                if old[3] != new[3]:
+                    yield _change(PRICE_CHANGED, old, new)
+                if old[4] != new[4]:
+                    yield _change(STOCK_CHANGED, old, new)
+                old = next(old_entries, None)
+                new = next(new_entries, None)
+
+
+def write_diff(old_path: str, new_path: str, output: str = DEFAULT_OUTPUT, run_size: int = DEFAULT_RUN_SIZE) -> dict:
+    """_summary_ : Écrit le rapport des changements entre deux crawls dans un fichier CSV.
+
+    Args:
+        old_path (str): L'ancien crawl.
+        new_path (str): Le nouveau crawl.
+        output (str, optional): Le fichier CSV du rapport. Defaults to DEFAULT_OUTPUT.
+        run_size (int, optional): Nombre maximal de livres triés en mémoire à la fois. Defaults to DEFAULT_RUN_SIZE.
+
+    Returns:
+        _dict_: Le nombre de changements de chaque type.
+    """
+    counts = {ADDED: 0, REMOVED: 0, PRICE_CHANGED: 0, STOCK_CHANGED: 0}
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=DIFF_FIELDS, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for change in diff_snapshots(old_path, new_path, run_size):
+            writer.writerow(change)
+            counts[change['change']] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Comparaison de deux crawls du site par code UPC "
+        "(ajouts, suppressions, changements de prix et de stock)"
+    )
+    parser.add_argument("old", help="Ancien crawl : dossier de fichiers CSV, fichier CSV ou catalogue SQLite")
+    parser.add_argument("new", help="Nouveau crawl, sous l'une des mêmes formes")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Fichier CSV du rapport")
+    parser.add_argument(
+        "--run-size",
+        type=int,
+        default=DEFAULT_RUN_SIZE,
+        metavar="N",
+        help="Nombre maximal de livres triés en mémoire à la fois",
+    )
+    args = parser.parse_args()
+
+    counts = write_diff(args.old, args.new, args.output, args.run_size)
+    print(
+        f"Rapport écrit dans {args.output} : {counts[ADDED]} ajout(s), {counts[REMOVED]} suppression(s), "
+        f"{counts[PRICE_CHANGED]} changement(s) de prix, {counts[STOCK_CHANGED]} changement(s) de stock"
+    )
+
+
+if __name__ == "__main__":
+    main()
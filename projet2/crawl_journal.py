@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+
+"""
+Description : Journal de reprise d'un crawl de scraping_p3.py. Il enregistre les catégories terminées, les pages de
+              catégorie traitées (avec les codes UPC de leurs livres et la position atteinte dans le fichier CSV) et
+              les images écrites ou en attente de téléchargement, afin qu'un crawl interrompu reprenne là où il
+              s'est arrêté avec l'option --resume.
+
+              Le journal est écrit dans un fichier temporaire puis renommé : même un arrêt brutal (kill -9) laisse
+              sur le disque soit l'ancienne version complète du journal, soit la nouvelle.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Fichier du journal par défaut
+DEFAULT_JOURNAL_FILE = "crawl_journal.json"
+
+# Délai minimal entre deux écritures du journal, en secondes
+SAVE_INTERVAL = 1.0
+
+
+class CrawlJournal:
+    """_summary_ : Journal de reprise d'un crawl, enregistré au format JSON.
+
+    Une page de catégorie n'est marquée comme traitée qu'une fois ses lignes écrites dans le fichier CSV, avec la
+    taille du fichier à cet instant. À la reprise, le fichier CSV est tronqué à cette taille : les lignes écrites
+    après le dernier enregistrement du journal sont réécrites une seule fois.
+
+    Args:
+        path (str, optional): Chemin du fichier du journal, None pour un journal conservé en mémoire uniquement.
+            Defaults to DEFAULT_JOURNAL_FILE.
+        resume (bool, optional): Charger le journal existant au lieu de repartir de zéro. Defaults to False.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_FILE, resume: bool = False) -> None:
+        self.path = path
+        self.state = {"categories": {}, "images": [], "pending_images": {}}
+        if resume and path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+        self.images = set(self.state["images"])
+        self.last_save = 0.0
+
+    def _category(self, category_name: str) -> dict:
+        return self.state["categories"].setdefault(
+            category_name, {"done": False, "csv_offset": 0, "pages": {}, "products": {}}
+        )
+
+    def is_category_done(self, category_name: str) -> bool:
+        """_summary_ : Indique si toutes les données de la catégorie ont été écrites."""
+        return self.state["categories"].get(category_name, {}).get("done", False)
+
+    def done_pages(self, category_name: str) -> dict:
+        """_summary_ : Retourne les pages traitées de la catégorie, associées à l'URL de leur page suivante."""
+        return self._category(category_name)["pages"]
+
+    def csv_offset(self, category_name: str) -> int:
+        """_summary_ : Retourne la taille du fichier CSV de la catégorie lors de la dernière page traitée."""
+        return self._category(category_name)["csv_offset"]
+
+    def mark_page_done(self, category_name: str, page_url: str, next_page_url: str, books_data: list[dict], csv_offset: int) -> None:
+        """_summary_ : Enregistre une page de catégorie dont les lignes ont été écrites dans le fichier CSV.
+
+        Args:
+            category_name (str): Le nom de la catégorie.
+            page_url (str): L'URL de la page de catégorie.
+            next_page_url (str): L'URL de la page suivante, None s'il s'agit de la dernière.
+            books_data (list[dict]): Les données des livres de la page.
+            csv_offset (int): La taille du fichier CSV après l'écriture des lignes de la page.
+        """
+        category = self._category(category_name)
+        category["pages"][page_url] = next_page_url
+        for book_data in books_data:
+            category["products"][book_data["product_page_url"]] = book_data.get("universal_product_code")
+        category["csv_offset"] = csv_offset
+        self.save()
+
+    def mark_category_done(self, category_name: str) -> None:
+        """_summary_ : Enregistre une catégorie entièrement traitée."""
+        self._category(category_name)["done"] = True
+        self.save(force=True)
+
+    def has_image(self, image_path: str) -> bool:
+        """_summary_ : Indique si l'image a déjà été écrite et se trouve toujours sur le disque."""
+        return image_path in self.images and os.path.exists(image_path)
+
+    def pending_images(self) -> list[tuple[str, str]]:
+        """_summary_ : Retourne l'URL et le chemin des images mises en file d'attente mais pas encore écrites."""
+        return [(image_url, image_path) for image_path, image_url in self.state["pending_images"].items()]
+
+    def add_pending_image(self, image_url: str, image_path: str) -> None:
+        """_summary_ : Enregistre une image mise en file d'attente, dont la page de catégorie peut être marquée comme
+        traitée avant la fin du téléchargement.
+        """
+        self.state["pending_images"][image_path] = image_url
+
+    def add_image(self, image_path: str) -> None:
+        """_summary_ : Enregistre une image écrite sur le disque."""
+        self.state["pending_images"].pop(image_path, None)
+        if image_path not in self.images:
+            self.images.add(image_path)
+            self.state["images"].append(image_path)
+            self.save()
+
+    def save(self, force: bool = False) -> None:
+        """_summary_ : Écrit le journal de manière atomique, au plus une fois par SAVE_INTERVAL sauf si force est vrai."""
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_save < SAVE_INTERVAL:
+            return
+        self.last_save = now
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        """_summary_ : Supprime le journal, une fois le crawl terminé."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,200 @@
+import asyncio
+import aiohttp
+from collections import deque
+from typing import AsyncIterator
+from http_session import create_client_session, fetch_page_async, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from http_cache import parse_with_cache
+from metrics import run_parse
+from parse_pool import ParsePool
+from scraping_p1 import parse_product_page
+from scraping_p2 import parse_category_page, parse_category_listing, listing_is_enough, plan_category_pages
+
+
+"""
+Description : Moteur de crawl asynchrone utilisé par scraping_p3.py. Les pages de catégorie, les pages de pagination
+              et les pages produit sont téléchargées en parallèle à travers une seule session aiohttp (voir
+              http_session.py) dont le nombre de connexions simultanées est borné globalement et par hôte.
+
+              Les URL de toutes les pages d'une catégorie sont déduites de sa première page (nombre de résultats et
+              nombre de livres par page, voir scraping_p2.plan_category_pages) : les pages suivantes sont
+              téléchargées à l'avance au lieu d'attendre le lien "next" de chaque page.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Nombre maximal de requêtes simultanées, toutes destinations confondues
+DEFAULT_CONCURRENCY = 20
+
+# Nombre maximal de requêtes simultanées vers un même hôte
+DEFAULT_PER_HOST = 10
+
+# Nombre de pages d'une catégorie téléchargées et traitées à la fois
+DEFAULT_PREFETCH_PAGES = 4
+
+
+class CrawlEngine:
+    """_summary_ : Moteur de crawl asynchrone partageant une session aiohttp bornée.
+
+    Args:
+        concurrency (int, optional): Nombre maximal de connexions simultanées. Defaults to DEFAULT_CONCURRENCY.
+        per_host (int, optional): Nombre maximal de connexions simultanées par hôte. Defaults to DEFAULT_PER_HOST.
+        timeout (float, optional): Délai d'expiration d'une requête, en secondes. Defaults to DEFAULT_TIMEOUT.
+        retries (int, optional): Nombre de nouvelles tentatives sur erreur. Defaults to DEFAULT_RETRIES.
+        parse_workers (int, optional): Nombre de processus d'analyse des pages produit (voir parse_pool.py). Avec 0,
+            les pages sont analysées dans la boucle d'événements. Defaults to 0.
+        prefetch_pages (int, optional): Nombre de pages d'une catégorie traitées à la fois lorsque toutes ses pages
+            sont connues. Defaults to DEFAULT_PREFETCH_PAGES.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST, timeout: float = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES, parse_workers: int = 0, prefetch_pages: int = DEFAULT_PREFETCH_PAGES) -> None:
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.parse_workers = parse_workers
+        self.prefetch_pages = prefetch_pages
+        self.session = None
+        self.parse_pool = None
+
+    async def __aenter__(self) -> "CrawlEngine":
+        self.session = create_client_session(self.concurrency, self.per_host, self.timeout)
+        if self.parse_workers:
+            self.parse_pool = ParsePool(self.parse_workers)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+
+    async def fetch(self, url: str) -> tuple[bytes, bool]:
+        """_summary_ : Télécharge le contenu d'une page.
+
+        Args:
+            url (str): URL de la page à télécharger
+
+        Returns:
+            _tuple[bytes, bool]_: Le contenu de la page (None si la requête a échoué), et True si la page n'a pas
+            changé depuis sa mise en cache.
+        """
+        try:
+            status, page, not_modified = await fetch_page_async(self.session, url, self.retries)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            # L'échec est déjà compté par fetch_async : seule cette page est ignorée, le crawl continue
+            print(f"La requête vers {url} a échoué : {type(error).__name__}")
+            return None, False
+        if status != 200:
+            print("La requête a échoué avec le code :", status)
+            return None, False
+        return page, not_modified
+
+    async def extract_product_info(self, url: str) -> dict:
+        """_summary_ : Version asynchrone de scraping_p1.extract_product_info.
+
+        Args:
+            url (str): URL de la page du bouquin
+
+        Returns:
+            _dict_: Les données du bouquin, ou None si la requête a échoué.
+        """
+        page, not_modified = await self.fetch(url)
+        if page is None:
+            return None
+        return parse_with_cache(url, page, not_modified, parse_product_page)
+
+    async def scrape_category_pages(self, category_url: str, done_pages: dict = None, fields: set[str] = None) -> AsyncIterator[tuple[str, str, list[dict]]]:
+        """_summary_ : Parcourt les pages d'une catégorie. Les pages produit de chaque page de la catégorie sont
+        téléchargées en parallèle, ainsi que les pages suivantes de la catégorie lorsque leurs URL peuvent être
+        déduites de la première ; l'ordre des pages et des livres est conservé.
+
+        Args:
+            category_url (str): URL de la page web de la catégorie spécifiée
+            done_pages (dict, optional): Pages déjà traitées, associées à l'URL de leur page suivante. Elles ne sont
+                pas retraitées (voir crawl_journal.py) ; seule la première page est retéléchargée, pour connaître
+                les autres.
+            fields (set[str], optional): Champs nécessaires. S'ils sont tous affichés sur les pages de catégorie
+                (scraping_p2.LISTING_FIELDS), les pages produit ne sont pas téléchargées et seuls ces champs sont
+                renseignés. Defaults to None (tous les champs).
+
+        Yields:
+            _tuple[str, str, list[dict]]_: L'URL de chaque page de la catégorie, l'URL de la page suivante (None pour
+            la dernière) et les informations des livres de la page.
+        """
+        page, not_modified = await self.fetch(category_url)
+        if page is None:
+            return
+        page_urls = plan_category_pages(page, category_url)
+
+        if page_urls is None:
+            # Nombre de pages inconnu : les liens "next" sont suivis une page après l'autre
+            while category_url:
+                if done_pages and category_url in done_pages:
+                    category_url, page = done_pages[category_url], None
+                    continue
+                page_url = category_url
+                scraped = await self._scrape_page(page_url, fields, page, not_modified)
+                page = None
+                if scraped is None:
+                    break
+                category_url, books_data = scraped
+                yield page_url, category_url, books_data
+            return
+
+        # Toutes les pages sont connues : les pages suivantes sont téléchargées pendant le traitement de la page en
+        # cours, prefetch_pages pages au plus à la fois, et produites dans l'ordre
+        page_urls = [page_url for page_url in page_urls if not (done_pages and page_url in done_pages)]
+        tasks = deque()
+        try:
+            for index, page_url in enumerate(page_urls):
+                while len(tasks) < max(1, self.prefetch_pages) and index + len(tasks) < len(page_urls):
+                    next_url = page_urls[index + len(tasks)]
+                    first_page = page if next_url == category_url else None
+                    tasks.append(asyncio.ensure_future(self._scrape_page(next_url, fields, first_page, not_modified)))
+                scraped = await tasks.popleft()
+                if scraped is None:
+                    break
+                next_page_url, books_data = scraped
+                yield page_url, next_page_url, books_data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _scrape_page(self, page_url: str, fields: set[str] = None, page: bytes = None, not_modified: bool = False) -> tuple[str, list[dict]]:
+        # Télécharge (si page n'est pas fourni) et traite une page de catégorie ; None si la requête a échoué
+        if page is None:
+            page, not_modified = await self.fetch(page_url)
+            if page is None:
+                return None
+        if listing_is_enough(fields):
+            books_data, next_page_url = run_parse(parse_category_listing, page, page_url)
+            return next_page_url, books_data
+        product_urls, next_page_url = parse_with_cache(page_url, page, not_modified, parse_category_page)
+        if self.parse_pool is None:
+            books_data = await asyncio.gather(*(self.extract_product_info(url) for url in product_urls))
+        else:
+            # Le réseau ne fait que télécharger, l'analyse des pages est envoyée en un lot au pool de processus
+            fetched = await asyncio.gather(*(self.fetch(url) for url in product_urls))
+            product_pages = [
+                (product_page, url, product_not_modified)
+                for url, (product_page, product_not_modified) in zip(product_urls, fetched)
+                if product_page is not None
+            ]
+            books_data = await self.parse_pool.parse_async(product_pages)
+        return next_page_url, [book_data for book_data in books_data if book_data]
+
+    async def scrape_category_books(self, category_url: str) -> AsyncIterator[dict]:
+        """_summary_ : Version asynchrone de scraping_p2.scrape_category_books.
+
+        Args:
+            category_url (str): URL de la page web de la catégorie spécifiée
+
+        Yields:
+            _dict_: Les informations de chaque livre de la catégorie, dès que sa page de catégorie est traitée.
+        """
+        async for _, _, books_data in self.scrape_category_pages(category_url):
+            for book_data in books_data:
+                yield book_data
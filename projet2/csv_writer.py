@@ -0,0 +1,125 @@
+import csv
+import filecmp
+import os
+
+
+"""
+Description : Écriture en continu des données de livres dans un fichier CSV. Les lignes sont écrites par petits lots
+              au fur et à mesure de leur extraction : la mémoire utilisée ne dépend pas de la taille de la catégorie
+              et les lignes déjà écrites sont conservées si le script s'arrête en cours de route.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Nombre maximal de lignes conservées en mémoire avant leur écriture dans le fichier
+DEFAULT_BUFFER_SIZE = 20
+
+
+class StreamingCsvWriter:
+    """_summary_ : Écrit des dictionnaires dans un fichier CSV par lots de buffer_size lignes.
+
+    Le fichier n'est créé qu'à la réception de la première ligne, dont les clés donnent les en-têtes de colonnes.
+    En mode incrémental, les lignes sont écrites dans un fichier temporaire qui ne remplace le fichier existant
+    que si son contenu a changé.
+
+    Args:
+        csv_filename (str): Le chemin du fichier CSV.
+        buffer_size (int, optional): Nombre maximal de lignes en attente d'écriture. Defaults to DEFAULT_BUFFER_SIZE.
+        incremental (bool, optional): Ne pas réécrire le fichier si son contenu est inchangé. Defaults to False.
+        resume_offset (int, optional): Taille, en octets, d'un fichier déjà écrit en partie : le fichier est tronqué
+            à cette taille et les nouvelles lignes y sont ajoutées. Defaults to 0.
+    """
+
+    def __init__(self, csv_filename: str, buffer_size: int = DEFAULT_BUFFER_SIZE, incremental: bool = False, resume_offset: int = 0) -> None:
+        self.csv_filename = csv_filename
+        self.buffer_size = buffer_size
+        self.incremental = incremental
+        self.resume_offset = resume_offset if os.path.exists(self.path) else 0
+        self.rows_written = 0
+        self.buffer = []
+        self.csvfile = None
+        self.writer = None
+        self.closed = False
+
+    def __enter__(self) -> "StreamingCsvWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def path(self) -> str:
+        """_summary_ : Chemin du fichier réellement écrit (fichier temporaire en mode incrémental)."""
+        return self.csv_filename + ".tmp" if self.incremental else self.csv_filename
+
+    def write(self, book_data: dict) -> None:
+        """_summary_ : Ajoute une ligne, écrite dès que le lot est complet.
+
+        Args:
+            book_data (dict): Les données d'un livre.
+        """
+        self.buffer.append(book_data)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def _open(self) -> None:
+        if self.resume_offset:
+            # Reprise : les en-têtes et les lignes jusqu'à resume_offset sont conservés
+            self.csvfile = open(self.path, 'r+', newline='', encoding='utf-8')
+            self.csvfile.truncate(self.resume_offset)
+            self.csvfile.seek(0, os.SEEK_END)
+        else:
+            self.csvfile = open(self.path, 'w', newline='', encoding='utf-8')
+
+    def flush(self) -> None:
+        """_summary_ : Écrit les lignes en attente dans le fichier."""
+        if not self.buffer:
+            return
+        if self.csvfile is None:
+            self._open()
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.csvfile, fieldnames=self.buffer[0].keys(), quoting=csv.QUOTE_ALL)
+            if not self.resume_offset:
+                self.writer.writeheader()
+        self.writer.writerows(self.buffer)
+        self.csvfile.flush()
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def tell(self) -> int:
+        """_summary_ : Retourne la taille du fichier après l'écriture des lignes en attente."""
+        self.flush()
+        if self.csvfile is None:
+            return self.resume_offset
+        return os.fstat(self.csvfile.fileno()).st_size
+
+    def close(self) -> bool:
+        """_summary_ : Écrit les dernières lignes et ferme le fichier.
+
+        Returns:
+            _bool_: True si le fichier CSV a été écrit ou modifié, False s'il était déjà à jour ou s'il n'y avait
+            aucune ligne.
+        """
+        if self.closed:
+            return False
+        self.closed = True
+        self.flush()
+        if self.csvfile is None and self.resume_offset:
+            # Reprise sans nouvelle ligne : retirer les lignes écrites après le dernier point de reprise
+            self._open()
+        if self.csvfile is None:
+            return False
+        self.csvfile.close()
+        self.csvfile = None
+
+        if not self.incremental:
+            return True
+        if os.path.exists(self.csv_filename) and filecmp.cmp(self.path, self.csv_filename, shallow=False):
+            os.remove(self.path)
+            return False
+        os.replace(self.path, self.csv_filename)
+        return True
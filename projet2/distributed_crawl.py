@@ -0,0 +1,248 @@
+import argparse
+import multiprocessing
+import os
+import time
+from http_session import fetch_page
+from scraping_p1 import extract_product_info
+from scraping_p2 import parse_category_page, check_fields, select_fields
+from scraping_p3 import parse_category_links, base_url, results_folder_3
+from sinks import CategorySink, check_sinks, SINKS, DEFAULT_SINKS
+from sqlite_sink import open_catalogue, close_catalogue, DEFAULT_DATABASE
+from rate_limiter import enable_rate_limiter, DEFAULT_RATE, DEFAULT_MIN_RATE, DEFAULT_MAX_RATE
+from work_queue import WorkQueue, worker_name, DEFAULT_QUEUE_FILE, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+
+
+"""
+Description : Crawl distribué de toutes les catégories du site "http://books.toscrape.com/", pour les catalogues trop
+              grands pour un seul processus scraping_p3.py. Le coordinateur parcourt les pages de catégorie et place
+              les URL des pages produit dans une file de travail SQLite (voir work_queue.py) ; plusieurs processus de
+              travail, sur une ou plusieurs machines partageant le fichier de la file, louent des lots de pages
+              produit et en extraient les données avec scraping_p1.extract_product_info(). Les résultats sont
+              ensuite rassemblés dans les mêmes fichiers CSV par catégorie que ceux de scraping_p3.py.
+
+              Chaque commande peut être relancée : le coordinateur n'ajoute pas deux fois la même URL, et les
+              éléments loués par un processus arrêté sont repris à l'expiration de leur location.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+
+
+    Usage:
+        python distributed_crawl.py coordinate [--queue FICHIER]
+        python distributed_crawl.py work [--queue FICHIER] [--batch-size N] [--lease SECONDES] [--rate REQ/S]
+        python distributed_crawl.py merge [--queue FICHIER] [--sink SORTIE] [--fields CHAMPS]
+        python distributed_crawl.py status [--queue FICHIER]
+        python distributed_crawl.py run --workers N : les trois étapes, avec N processus de travail locaux
+
+    Output:
+        crawl_queue.sqlite : file de travail partagée par le coordinateur et les processus de travail.
+        results_p3/*.csv : fichiers CSV contenant les informations essentielles de tous les bouquins de toutes les catégories données.
+"""
+
+# Nombre de pages produit louées à la fois par un processus de travail
+DEFAULT_BATCH_SIZE = 20
+
+# Attente d'un processus de travail lorsque tous les éléments restants sont loués par d'autres processus, en secondes
+IDLE_WAIT = 1.0
+
+
+def coordinate(queue_path: str = DEFAULT_QUEUE_FILE, site_url: str = base_url) -> int:
+    """_summary_ : Parcourt les pages de toutes les catégories et place les URL des pages produit dans la file de travail.
+
+    Args:
+        queue_path (str, optional): Le fichier de la file de travail. Defaults to DEFAULT_QUEUE_FILE.
+        site_url (str, optional): L'URL de base du site web. Defaults to scraping_p3.base_url.
+
+    Returns:
+        _int_: Le nombre de pages produit ajoutées à la file.
+    """
+    status_code, page, _ = fetch_page(site_url)
+    if status_code != 200:
+        print("La requête a échoué pour la page d'accueil avec le code :", status_code)
+        return 0
+
+    added = 0
+    with WorkQueue(queue_path) as queue:
+        for category_name, category_url in parse_category_links(page, site_url):
+            position = 0
+            while category_url:
+                status_code, page, _ = fetch_page(category_url)
+                if status_code != 200:
+                    print("La requête a échoué avec le code :", status_code)
+                    break
+                product_urls, category_url = parse_category_page(page, category_url)
+                items = [(product_url, category_name, position + index) for index, product_url in enumerate(product_urls)]
+                position += len(product_urls)
+                added += queue.put_many(items)
+            print(f"Catégorie {category_name} : {position} page(s) produit")
+    print(f"{added} page(s) produit ajoutée(s) à la file {queue_path}")
+    return added
+
+
+def work(queue_path: str = DEFAULT_QUEUE_FILE, batch_size: int = DEFAULT_BATCH_SIZE, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS, rate: float = DEFAULT_RATE, rate_share: int = 1) -> int:
+    """_summary_ : Processus de travail : loue des lots de pages produit et en extrait les données, jusqu'à ce que la
+    file soit terminée.
+
+    Args:
+        queue_path (str, optional): Le fichier de la file de travail. Defaults to DEFAULT_QUEUE_FILE.
+        batch_size (int, optional): Nombre de pages produit louées à la fois. Defaults to DEFAULT_BATCH_SIZE.
+        lease_seconds (float, optional): Durée d'une location, en secondes. Elle doit couvrir le traitement d'un lot.
+            Defaults to DEFAULT_LEASE_SECONDS.
+        max_attempts (int, optional): Nombre maximal de tentatives par page. Defaults to DEFAULT_MAX_ATTEMPTS.
+        rate (float, optional): Débit initial du processus, en requêtes par seconde (voir rate_limiter.py), 0 pour
+            ne pas limiter le débit. Defaults to DEFAULT_RATE.
+        rate_share (int, optional): Nombre de processus qui se partagent ce débit : chacun reçoit une part égale
+            du débit initial, minimal et maximal. Defaults to 1.
+
+    Returns:
+        _int_: Le nombre de pages produit extraites par ce processus.
+    """
+    if rate:
+        enable_rate_limiter(rate / rate_share, DEFAULT_MIN_RATE / rate_share, DEFAULT_MAX_RATE / rate_share)
+    worker = worker_name()
+    processed = 0
+    with WorkQueue(queue_path, lease_seconds, max_attempts) as queue:
+        while True:
+            items = queue.lease(worker, batch_size)
+            if not items:
+                if queue.is_finished():
+                    break
+                # Les éléments restants sont loués par d'autres processus : leur location peut encore expirer
+                time.sleep(IDLE_WAIT)
+                continue
+            for item_id, url in items:
+                try:
+                    book_data = extract_product_info(url)
+                except Exception as error:  # Une page en erreur ne doit pas arrêter le processus de travail
+                    queue.fail(item_id, worker, f"{type(error).__name__}: {error}")
+                    continue
+                if book_data is None:
+                    queue.fail(item_id, worker, "page indisponible")
+                elif queue.complete(item_id, worker, book_data):
+                    processed += 1
+    print(f"Processus {worker} : {processed} page(s) produit extraite(s)")
+    return processed
+
+
+def merge(queue_path: str = DEFAULT_QUEUE_FILE, results_folder: str = results_folder_3, sinks: tuple[str] = DEFAULT_SINKS, fields: tuple[str] = None, database: str = None) -> None:
+    """_summary_ : Écrit les résultats de la file de travail dans les sorties de scraping_p3.py (un fichier CSV par
+    catégorie par défaut), dans l'ordre des livres sur le site.
+
+    Args:
+        queue_path (str, optional): Le fichier de la file de travail. Defaults to DEFAULT_QUEUE_FILE.
+        results_folder (str, optional): Le dossier des résultats. Defaults to scraping_p3.results_folder_3.
+        sinks (tuple[str], optional): Les sorties, parmi sinks.SINKS. Defaults to DEFAULT_SINKS.
+        fields (tuple[str], optional): Les champs écrits. Defaults to None (tous les champs).
+        database (str, optional): Base de données de la sortie sqlite. Defaults to results_folder/DEFAULT_DATABASE.
+    """
+    if fields is not None:
+        check_fields(fields)
+    check_sinks(sinks, fields)
+    os.makedirs(results_folder, exist_ok=True)
+    if "sqlite" in sinks:
+        open_catalogue(database or os.path.join(results_folder, DEFAULT_DATABASE))
+    try:
+        with WorkQueue(queue_path) as queue:
+            counts = queue.counts()
+            if not queue.is_finished():
+                print(f"Attention : la file n'est pas terminée ({counts['pending']} en attente, {counts['leased']} louée(s))")
+            if counts['failed']:
+                print(f"Attention : {counts['failed']} page(s) produit en échec définitif")
+            for category_name in queue.categories():
+                with CategorySink(category_name, results_folder, sinks) as writer:
+                    for book_data in queue.results(category_name):
+                        writer.write(select_fields(book_data, fields))
+                print(f"Les données des livres de la catégorie {category_name} ont été écrites dans {', '.join(writer.paths)}")
+    finally:
+        close_catalogue()
+
+
+def run(workers: int, queue_path: str = DEFAULT_QUEUE_FILE, site_url: str = base_url, **kwargs) -> None:
+    """_summary_ : Exécute le crawl distribué sur la machine locale : coordinateur, workers processus de travail, puis
+    rassemblement des résultats.
+
+    Args:
+        workers (int): Le nombre de processus de travail.
+        queue_path (str, optional): Le fichier de la file de travail. Defaults to DEFAULT_QUEUE_FILE.
+        site_url (str, optional): L'URL de base du site web. Defaults to scraping_p3.base_url.
+        **kwargs: Options des processus de travail (batch_size, lease_seconds, max_attempts, rate, voir work()) et
+            du rassemblement (results_folder, sinks, fields, database, voir merge()). Le débit rate est partagé entre
+            les processus de travail.
+    """
+    work_options = {name: kwargs[name] for name in ("batch_size", "lease_seconds", "max_attempts", "rate") if name in kwargs}
+    # Le site reçoit au total le débit demandé, et non workers fois ce débit
+    work_options["rate_share"] = workers
+    merge_options = {name: kwargs[name] for name in ("results_folder", "sinks", "fields", "database") if name in kwargs}
+
+    coordinate(queue_path, site_url)
+    # spawn : chaque processus crée sa propre session HTTP au lieu d'hériter des connexions du coordinateur
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=work, args=(queue_path,), kwargs=work_options) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    merge(queue_path, **merge_options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl distribué des données de livres de toutes les catégories du site http://books.toscrape.com/")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_FILE, help="Fichier de la file de travail partagée")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinate_parser = subparsers.add_parser("coordinate", help="Placer les pages produit de toutes les catégories dans la file")
+    coordinate_parser.add_argument("--base-url", default=base_url, help="URL de base du site web")
+
+    def add_work_arguments(command_parser, rate_help):
+        command_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, metavar="N", help="Nombre de pages produit louées à la fois")
+        command_parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, metavar="SECONDES", help="Durée d'une location, après laquelle un lot non terminé est repris")
+        command_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, metavar="N", help="Nombre maximal de tentatives par page produit")
+        command_parser.add_argument("--rate", type=float, default=DEFAULT_RATE, metavar="REQ/S", help=rate_help)
+
+    def add_merge_arguments(command_parser):
+        command_parser.add_argument("--results", default=results_folder_3, help="Dossier des résultats")
+        command_parser.add_argument("--sink", dest="sinks", action="append", choices=SINKS, help="Sortie des données, répétable (csv par défaut)")
+        command_parser.add_argument("--fields", help="Champs à écrire, séparés par des virgules (par défaut tous)")
+        command_parser.add_argument("--database", help="Base de données de la sortie sqlite")
+
+    add_work_arguments(
+        subparsers.add_parser("work", help="Extraire les pages produit de la file jusqu'à ce qu'elle soit terminée"),
+        "Débit initial de ce processus de travail (0 : pas de limite)",
+    )
+    add_merge_arguments(subparsers.add_parser("merge", help="Écrire les résultats de la file dans les fichiers CSV par catégorie"))
+    subparsers.add_parser("status", help="Afficher l'avancement de la file")
+
+    run_parser = subparsers.add_parser("run", help="Coordinateur, processus de travail locaux et rassemblement des résultats")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count(), metavar="N", help="Nombre de processus de travail")
+    run_parser.add_argument("--base-url", default=base_url, help="URL de base du site web")
+    add_work_arguments(run_parser, "Débit initial total, partagé entre les processus de travail (0 : pas de limite)")
+    add_merge_arguments(run_parser)
+    args = parser.parse_args()
+
+    if args.command in ("work", "run"):
+        work_options = dict(batch_size=args.batch_size, lease_seconds=args.lease, max_attempts=args.max_attempts, rate=args.rate)
+    if args.command in ("merge", "run"):
+        merge_options = dict(
+            results_folder=args.results,
+            sinks=tuple(args.sinks or DEFAULT_SINKS),
+            fields=tuple(args.fields.split(',')) if args.fields else None,
+            database=args.database,
+        )
+
+    if args.command == "coordinate":
+        coordinate(args.queue, args.base_url)
+    elif args.command == "work":
+        work(args.queue, **work_options)
+    elif args.command == "merge":
+        merge(args.queue, **merge_options)
+    elif args.command == "status":
+        with WorkQueue(args.queue) as queue:
+            print(", ".join(f"{state} : {count}" for state, count in queue.counts().items()))
+    else:
+        run(args.workers, args.queue, args.base_url, **work_options, **merge_options)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlsplit
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+"""
+Description : Enregistrement et rejeu des réponses HTTP d'un crawl, pour exécuter les scripts de scraping et leurs
+              mesures de performance sans interroger le site http://books.toscrape.com. Les réponses sont conservées
+              dans une archive ZIP compressée : un index (chemin de l'URL -> code, en-têtes et contenu) et le
+              contenu de chaque réponse, stocké une seule fois par empreinte SHA-256.
+
+              En mode record, un serveur HTTP local relaie les requêtes vers le site et enregistre ses réponses ; en
+              mode serve, il rejoue les réponses de l'archive (avec les réponses 304 aux requêtes conditionnelles).
+              ReplayAdapter rejoue l'archive directement dans une session requests, sans serveur.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+
+
+    Usage:
+        python http_archive.py record --archive books.zip [--upstream URL] [--port N]
+        python http_archive.py serve --archive books.zip [--port N]
+        python http_archive.py info --archive books.zip
+
+    Exemple : enregistrer un crawl complet puis le rejouer
+        python http_archive.py record --archive books.zip --port 8000
+        python scraping_p3.py --base-url http://127.0.0.1:8000/
+        python http_archive.py serve --archive books.zip --port 8000
+"""
+
+# Nom de l'index dans l'archive
+INDEX_NAME = "index.json"
+
+# En-têtes des réponses conservés dans l'archive
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Retry-After")
+
+# Site relayé par défaut en mode record
+DEFAULT_UPSTREAM = "http://books.toscrape.com/"
+
+# Port par défaut du serveur local
+DEFAULT_PORT = 8000
+
+
+def archive_key(url: str) -> str:
+    """_summary_ : Retourne la clé d'une URL dans l'archive : son chemin, sans les segments "." et "..", et sa requête.
+
+    Args:
+        url (str): L'URL complète ou son chemin.
+
+    Returns:
+        _str_: La clé, indépendante de l'hôte.
+    """
+    parts = urlsplit(url)
+    path = urlsplit(urljoin("http://archive/", parts.path or "/")).path
+    return path + (f"?{parts.query}" if parts.query else "")
+
+
+class HttpArchive:
+    """_summary_ : Archive ZIP de réponses HTTP, ouverte en lecture ("r") ou en écriture ("w").
+
+    En écriture, l'archive est écrite sous un nom temporaire puis renommée par close().
+
+    Args:
+        path (str): Le chemin de l'archive.
+        mode (str, optional): "r" pour rejouer, "w" pour enregistrer. Defaults to "r".
+    """
+
+    def __init__(self, path: str, mode: str = "r") -> None:
+        if mode not in ("r", "w"):
+            raise ValueError(f"Mode d'archive inconnu : {mode}")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        if mode == "r":
+            self.zip = zipfile.ZipFile(path)
+            self.index = json.loads(self.zip.read(INDEX_NAME))
+        else:
+            self.zip = zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_DEFLATED)
+            self.index = {}
+        self.bodies = {entry["body"] for entry in self.index.values()}
+
+    def __enter__(self) -> "HttpArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, url: str, status: int, headers, body: bytes) -> None:
+        """_summary_ : Enregistre une réponse.
+
+        Args:
+            url (str): L'URL demandée.
+            status (int): Le code de la réponse.
+            headers: Les en-têtes de la réponse (seuls RECORDED_HEADERS sont conservés).
+            body (bytes): Le contenu de la réponse.
+        """
+        name = "bodies/" + hashlib.sha256(body).hexdigest()
+        with self.lock:
+            if name not in self.bodies:
+                self.zip.writestr(name, body)
+                self.bodies.add(name)
+            self.index[archive_key(url)] = {
+                "status": status,
+                "headers": {header: headers[header] for header in RECORDED_HEADERS if header in headers},
+                "body": name,
+            }
+
+    def get(self, url: str) -> tuple[int, dict, bytes]:
+        """_summary_ : Retourne la réponse enregistrée pour une URL.
+
+        Args:
+            url (str): L'URL complète ou son chemin.
+
+        Returns:
+            _tuple[int, dict, bytes]_: Le code, les en-têtes et le contenu de la réponse, ou None si l'URL n'est pas
+            dans l'archive.
+        """
+        entry = self.index.get(archive_key(url))
+        if entry is None:
+            return None
+        with self.lock:
+            body = self.zip.read(entry["body"])
+        return entry["status"], entry["headers"], body
+
+    def close(self) -> None:
+        """_summary_ : Ferme l'archive. En écriture, écrit l'index et renomme l'archive."""
+        if self.zip is None:
+            return
+        if self.mode == "w":
+            self.zip.writestr(INDEX_NAME, json.dumps(self.index, indent=1))
+            self.zip.close()
+            os.replace(self.path + ".tmp", self.path)
+        else:
+            self.zip.close()
+        self.zip = None
+
+
+def replay_response(archive: HttpArchive, url: str, request_headers) -> tuple[int, dict, bytes]:
+    """_summary_ : Réponse rejouée pour une requête : la réponse enregistrée, 304 si la requête conditionnelle
+    correspond à son ETag, 404 si l'URL n'est pas dans l'archive.
+
+    Args:
+        archive (HttpArchive): L'archive.
+        url (str): L'URL demandée.
+        request_headers: Les en-têtes de la requête.
+
+    Returns:
+        _tuple[int, dict, bytes]_: Le code, les en-têtes et le contenu de la réponse.
+    """
+    recorded = archive.get(url)
+    if recorded is None:
+        return 404, {"Content-Type": "text/plain"}, b"Not recorded"
+    return conditional_response(recorded, request_headers)
+
+
+def conditional_response(recorded: tuple[int, dict, bytes], request_headers) -> tuple[int, dict, bytes]:
+    """_summary_ : Retourne 304 sans contenu si la requête conditionnelle correspond à l'ETag de la réponse
+    enregistrée, sinon la réponse enregistrée."""
+    status, headers, body = recorded
+    etag = headers.get("ETag")
+    if status == 200 and etag and request_headers.get("If-None-Match") == etag:
+        return 304, headers, b""
+    return status, headers, body
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """_summary_ : Serveur HTTP du rejeu et de l'enregistrement, silencieux sur les connexions fermées par le client."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """_summary_ : Gestionnaire HTTP/1.1 du serveur d'archive. Sans site relayé (upstream), les réponses sont
+    rejouées depuis l'archive ; avec un site relayé, elles sont téléchargées et enregistrées."""
+
+    protocol_version = "HTTP/1.1"
+    # Sans TCP_NODELAY, l'envoi séparé des en-têtes et du corps subit le délai d'acquittement TCP
+    disable_nagle_algorithm = True
+    archive = None
+    upstream = None
+    session = None
+
+    def _response(self) -> tuple[int, dict, bytes]:
+        if self.upstream is None:
+            return replay_response(self.archive, self.path, self.headers)
+        # Les requêtes sont relayées sans en-têtes conditionnels, afin d'enregistrer le contenu complet
+        response = self.session.get(urljoin(self.upstream, self.path.lstrip("/")), timeout=30)
+        self.archive.add(self.path, response.status_code, response.headers, response.content)
+        headers = {header: response.headers[header] for header in RECORDED_HEADERS if header in response.headers}
+        return conditional_response((response.status_code, headers, response.content), self.headers)
+
+    def _send(self, with_body: bool) -> None:
+        status, headers, body = self._response()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self._send(with_body=True)
+
+    def do_HEAD(self) -> None:
+        self._send(with_body=False)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_archive_server(archive: HttpArchive, port: int = 0, upstream: str = None) -> tuple[ThreadingHTTPServer, str]:
+    """_summary_ : Démarre le serveur d'archive dans un thread en arrière-plan.
+
+    Args:
+        archive (HttpArchive): L'archive, ouverte en lecture pour rejouer ou en écriture pour enregistrer.
+        port (int, optional): Le port d'écoute, 0 pour un port libre. Defaults to 0.
+        upstream (str, optional): Le site relayé et enregistré, None pour rejouer l'archive. Defaults to None.
+
+    Returns:
+        _tuple[ThreadingHTTPServer, str]_: Le serveur et son URL de base.
+    """
+    handler_class = type("BoundArchiveHandler", (ArchiveHandler,), {
+        "archive": archive,
+        "upstream": upstream,
+        "session": requests.Session() if upstream else None,
+    })
+    server = ArchiveServer(("127.0.0.1", port), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+class ReplayAdapter(BaseAdapter):
+    """_summary_ : Adaptateur de transport requests qui rejoue les réponses d'une archive sans accès au réseau.
+
+    Exemple : session.mount("http://", ReplayAdapter(archive))
+
+    Args:
+        archive (HttpArchive): L'archive, ouverte en lecture.
+    """
+
+    def __init__(self, archive: HttpArchive) -> None:
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs) -> requests.Response:
+        status, headers, body = replay_response(self.archive, request.url, request.headers)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body if request.method != "HEAD" else b""
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enregistrement et rejeu des réponses HTTP d'un crawl")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Relayer les requêtes vers le site et enregistrer ses réponses")
+    record_parser.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="Site relayé")
+    serve_parser = subparsers.add_parser("serve", help="Rejouer les réponses de l'archive")
+    info_parser = subparsers.add_parser("info", help="Afficher le contenu de l'archive")
+    for command_parser in (record_parser, serve_parser, info_parser):
+        command_parser.add_argument("--archive", required=True, help="Fichier de l'archive")
+    for command_parser in (record_parser, serve_parser):
+        command_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port du serveur local")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with HttpArchive(args.archive) as archive:
+            statuses = {}
+            for entry in archive.index.values():
+                statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+            print(f"{len(archive)} réponse(s), {len(archive.bodies)} contenu(s) distinct(s), codes : {statuses}")
+        return
+
+    archive = HttpArchive(args.archive, "w" if args.command == "record" else "r")
+    server, server_url = start_archive_server(archive, args.port, args.upstream if args.command == "record" else None)
+    label = "d'enregistrement" if args.command == "record" else "de rejeu"
+    print(f"Serveur {label} sur {server_url} (Ctrl+C pour arrêter)")
+    # L'archive est enregistrée aussi bien après Ctrl+C qu'après un arrêt par SIGTERM
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        archive.close()
+        if args.command == "record":
+            print(f"{len(archive)} réponse(s) enregistrée(s) dans {args.archive}")
+
+if __name__ == "__main__":
+    main()
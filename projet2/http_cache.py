@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import threading
+from metrics import run_parse
+
+
+"""
+Description : Cache HTTP persistant sur disque, indexé par URL. Chaque entrée conserve le contenu de la réponse, ses
+              validateurs (ETag, Last-Modified) et, éventuellement, le résultat de l'analyse de la page. Les requêtes
+              suivantes envoient If-None-Match / If-Modified-Since : une réponse 304 réutilise le contenu en cache
+              sans le retélécharger. Les entrées les moins récemment utilisées sont supprimées lorsque la taille
+              totale du cache dépasse la limite fixée.
+
+              Les méthodes du cache peuvent être appelées depuis plusieurs threads (voir fetch_page_async(), qui
+              lit et écrit les fichiers hors de la boucle d'événements) : seul l'index des entrées est protégé par
+              un verrou, les lectures et écritures de fichiers se font en dehors.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Dossier par défaut du cache
+DEFAULT_CACHE_DIR = ".http_cache"
+
+# Taille maximale par défaut du cache, en octets
+DEFAULT_MAX_SIZE = 500 * 1024 * 1024
+
+# Cache partagé, activé par enable_cache()
+_cache = None
+
+
+class HttpCache:
+    """_summary_ : Cache HTTP sur disque avec éviction par taille (entrées les moins récemment utilisées en premier).
+
+    Chaque URL est stockée dans deux fichiers nommés d'après le hash SHA-1 de l'URL : <hash>.body pour le contenu et
+    <hash>.json pour les métadonnées (URL, validateurs, résultat d'analyse).
+
+    Args:
+        directory (str, optional): Dossier du cache. Defaults to DEFAULT_CACHE_DIR.
+        max_size (int, optional): Taille maximale des contenus en cache, en octets. Defaults to DEFAULT_MAX_SIZE.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+        # Taille et date de dernier accès de chaque entrée, reconstruites à partir des fichiers présents
+        self.entries = {}
+        for file_name in os.listdir(directory):
+            if file_name.endswith(".json"):
+                key = file_name[:-5]
+                body_path = self._path(key, ".body")
+                size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+                self.entries[key] = [size, os.path.getmtime(self._path(key, ".json"))]
+        self.total_size = sum(size for size, _ in self.entries.values())
+        # Verrou de self.entries et self.total_size
+        self.lock = threading.Lock()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _write(self, path: str, data: bytes) -> None:
+        # Écriture dans un fichier temporaire puis renommage, pour ne jamais laisser d'entrée tronquée
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_meta(self, key: str) -> dict:
+        try:
+            with open(self._path(key, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _touch(self, key: str) -> None:
+        try:
+            os.utime(self._path(key, ".json"))
+            mtime = os.path.getmtime(self._path(key, ".json"))
+        except FileNotFoundError:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.entries[key][1] = mtime
+
+    def conditional_headers(self, url: str, require_body: bool = True) -> dict:
+        """_summary_ : Retourne les en-têtes de requête conditionnelle correspondant aux validateurs en cache.
+
+        Args:
+            url (str): L'URL demandée.
+            require_body (bool, optional): N'envoyer les validateurs que si le contenu est en cache. Defaults to True.
+
+        Returns:
+            _dict_: Les en-têtes If-None-Match / If-Modified-Since, vide si l'URL n'est pas en cache.
+        """
+        key = self._key(url)
+        if key not in self.entries:
+            return {}
+        meta = self._read_meta(key)
+        if meta is None or (require_body and not meta.get("has_body")):
+            return {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url: str, headers, body: bytes = None) -> None:
+        """_summary_ : Enregistre une réponse 200 et ses validateurs. Sans validateur, l'entrée éventuelle est supprimée.
+
+        Args:
+            url (str): L'URL de la réponse.
+            headers (Mapping): Les en-têtes de la réponse.
+            body (bytes, optional): Le contenu de la réponse. Si None, seuls les validateurs sont conservés.
+        """
+        key = self._key(url)
+        self.remove(key)
+
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        size = 0
+        if body is not None:
+            self._write(self._path(key, ".body"), body)
+            size = len(body)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "has_body": body is not None}
+        self._write(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+        mtime = os.path.getmtime(self._path(key, ".json"))
+        with self.lock:
+            self.entries[key] = [size, mtime]
+            self.total_size += size
+        self.evict()
+
+    def get_body(self, url: str) -> bytes:
+        """_summary_ : Retourne le contenu en cache d'une URL, ou None s'il est absent."""
+        key = self._key(url)
+        if key not in self.entries:
+            return None
+        try:
+            with open(self._path(key, ".body"), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(key)
+        return body
+
+    def get_parsed(self, url: str):
+        """_summary_ : Retourne le résultat d'analyse enregistré avec set_parsed(), ou None."""
+        key = self._key(url)
+        if key not in self.entries:
+            return None
+        meta = self._read_meta(key)
+        return meta.get("parsed") if meta else None
+
+    def set_parsed(self, url: str, parsed) -> None:
+        """_summary_ : Associe à l'entrée d'une URL le résultat (sérialisable en JSON) de l'analyse de son contenu.
+
+        Il est supprimé dès qu'un nouveau contenu est enregistré pour cette URL.
+        """
+        key = self._key(url)
+        if key not in self.entries:
+            return
+        meta = self._read_meta(key)
+        if meta is None:
+            return
+        meta["parsed"] = parsed
+        self._write(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+    def remove(self, key: str) -> None:
+        """_summary_ : Supprime une entrée du cache à partir de sa clé."""
+        with self.lock:
+            if key not in self.entries:
+                return
+            size, _ = self.entries.pop(key)
+            self.total_size -= size
+        for suffix in (".body", ".json"):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def evict(self) -> None:
+        """_summary_ : Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la taille maximale."""
+        if self.total_size <= self.max_size:
+            return
+        with self.lock:
+            keys = sorted(self.entries, key=lambda key: self.entries[key][1])
+        for key in keys:
+            if self.total_size <= self.max_size:
+                break
+            self.remove(key)
+
+
+def parse_with_cache(url: str, page: bytes, not_modified: bool, parse):
+    """_summary_ : Analyse une page avec la fonction parse, en réutilisant le résultat en cache si la page n'a pas changé.
+
+    Args:
+        url (str): L'URL de la page.
+        page (bytes): Le contenu de la page.
+        not_modified (bool): True si le serveur a répondu 304 et que le contenu provient du cache.
+        parse (callable): Fonction d'analyse appelée avec (page, url), dont le résultat est sérialisable en JSON.
+
+    Returns:
+        Le résultat de l'analyse.
+    """
+    cache = get_cache()
+    if cache is None:
+        return run_parse(parse, page, url)
+    if not_modified:
+        parsed = cache.get_parsed(url)
+        if parsed is not None:
+            return parsed
+    parsed = run_parse(parse, page, url)
+    cache.set_parsed(url, parsed)
+    return parsed
+
+
+def enable_cache(directory: str = DEFAULT_CACHE_DIR, max_size: int = DEFAULT_MAX_SIZE) -> HttpCache:
+    """_summary_ : Active le cache HTTP partagé utilisé par les fonctions de téléchargement.
+
+    Args:
+        directory (str, optional): Dossier du cache. Defaults to DEFAULT_CACHE_DIR.
+        max_size (int, optional): Taille maximale du cache, en octets. Defaults to DEFAULT_MAX_SIZE.
+
+    Returns:
+        _HttpCache_: Le cache activé.
+    """
+    global _cache
+    _cache = HttpCache(directory, max_size)
+    return _cache
+
+
+def get_cache() -> HttpCache:
+    """_summary_ : Retourne le cache HTTP partagé, ou None s'il n'est pas activé."""
+    return _cache
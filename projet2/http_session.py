@@ -0,0 +1,296 @@
+import asyncio
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http_cache import get_cache
+from metrics import get_metrics
+from rate_limiter import get_rate_limiter
+
+
+"""
+Description : Couche de session HTTP partagée par les scripts scraping_p1.py, scraping_p2.py et scraping_p3.py.
+              Les connexions sont conservées ouvertes (keep-alive) dans un pool de taille configurable, chaque requête
+              a un délai d'expiration et les erreurs de connexion ou les réponses 429 et 5xx sont réessayées avec un délai
+              croissant (backoff exponentiel). Lorsque le cache HTTP est activé (voir http_cache.py), les requêtes de
+              fetch_page() et fetch_page_async() sont conditionnelles et une réponse 304 réutilise le contenu en cache.
+              Lorsque le limiteur de débit est activé (voir rate_limiter.py), chaque requête attend son tour auprès
+              de l'hôte et sa réponse ajuste le débit autorisé ; les nouvelles tentatives ne sont alors plus faites
+              par urllib3 mais passent elles aussi par le limiteur.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Nombre de connexions conservées ouvertes par hôte
+DEFAULT_POOL_SIZE = 20
+
+# Délai d'expiration d'une requête, en secondes
+DEFAULT_TIMEOUT = 10
+
+# Nombre de nouvelles tentatives après une erreur de connexion ou une réponse 429 ou 5xx
+DEFAULT_RETRIES = 3
+
+# Facteur du délai d'attente entre deux tentatives : backoff_factor * 2 ** (tentative - 1) secondes
+DEFAULT_BACKOFF_FACTOR = 0.5
+
+# Codes de réponse HTTP pour lesquels la requête est réessayée
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Session synchrone partagée, créée au premier appel de get_session()
+_session = None
+
+# Session synchrone sans nouvelles tentatives d'urllib3, utilisée lorsque le limiteur de débit est activé
+_limited_session = None
+
+# Paramètres utilisés pour créer la session partagée
+_settings = {
+    "pool_size": DEFAULT_POOL_SIZE,
+    "timeout": DEFAULT_TIMEOUT,
+    "retries": DEFAULT_RETRIES,
+    "backoff_factor": DEFAULT_BACKOFF_FACTOR,
+}
+
+
+def configure(**kwargs) -> None:
+    """_summary_ : Modifie les paramètres de la session partagée (pool_size, timeout, retries, backoff_factor).
+    La session existante est fermée et sera recréée au prochain appel de get_session().
+
+    Args:
+        **kwargs: Les paramètres à modifier.
+    """
+    global _session, _limited_session
+    unknown = set(kwargs) - set(_settings)
+    if unknown:
+        raise ValueError(f"Paramètres de session inconnus : {', '.join(sorted(unknown))}")
+    _settings.update(kwargs)
+    if _session is not None:
+        _session.close()
+        _session = None
+    if _limited_session is not None:
+        _limited_session.close()
+        _limited_session = None
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> requests.Session:
+    """_summary_ : Crée une session requests avec un pool de connexions persistantes et une politique de nouvelles tentatives.
+
+    Args:
+        pool_size (int, optional): Nombre de connexions conservées par hôte. Defaults to DEFAULT_POOL_SIZE.
+        retries (int, optional): Nombre de nouvelles tentatives. Defaults to DEFAULT_RETRIES.
+        backoff_factor (float, optional): Facteur du délai entre deux tentatives. Defaults to DEFAULT_BACKOFF_FACTOR.
+
+    Returns:
+        _requests.Session_: La session configurée.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(limited: bool = False) -> requests.Session:
+    """_summary_ : Retourne la session synchrone partagée, en la créant si nécessaire.
+
+    Args:
+        limited (bool, optional): Retourner la session sans nouvelles tentatives d'urllib3, dont les requêtes sont
+            réessayées par fetch() à travers le limiteur de débit. Defaults to False.
+
+    Returns:
+        _requests.Session_: La session partagée.
+    """
+    global _session, _limited_session
+    if limited:
+        if _limited_session is None:
+            _limited_session = create_session(_settings["pool_size"], 0, _settings["backoff_factor"])
+        return _limited_session
+    if _session is None:
+        _session = create_session(_settings["pool_size"], _settings["retries"], _settings["backoff_factor"])
+    return _session
+
+
+def fetch(url: str, headers: dict = None) -> requests.Response:
+    """_summary_ : Effectue une requête GET à travers la session partagée.
+
+    Args:
+        url (str): L'URL à télécharger.
+        headers (dict, optional): En-têtes supplémentaires de la requête.
+
+    Returns:
+        _requests.Response_: La réponse HTTP.
+    """
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        return _fetch_limited(url, headers, limiter)
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, headers=headers, timeout=_settings["timeout"])
+    except requests.RequestException:
+        get_metrics().record_failure(url)
+        raise
+    record_response(url, time.perf_counter() - start, len(response.content), response.status_code)
+    # Nouvelles tentatives faites par urllib3 (voir create_session)
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and retries.history:
+        get_metrics().record_retry(url, len(retries.history))
+    return response
+
+
+def _fetch_limited(url: str, headers: dict, limiter) -> requests.Response:
+    # Comme fetch_async() : chaque tentative attend son tour auprès du limiteur, et sa réponse ajuste le débit
+    retries, backoff_factor = _settings["retries"], _settings["backoff_factor"]
+    for attempt in range(retries + 1):
+        limiter.acquire_sync(url)
+        start = time.perf_counter()
+        try:
+            response = get_session(limited=True).get(url, headers=headers, timeout=_settings["timeout"])
+        except requests.RequestException:
+            limiter.record(url, None, time.perf_counter() - start)
+            if attempt == retries:
+                get_metrics().record_failure(url)
+                raise
+        else:
+            limiter.record(url, response.status_code, time.perf_counter() - start, response.headers)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                record_response(url, time.perf_counter() - start, len(response.content), response.status_code)
+                return response
+        get_metrics().record_retry(url)
+        time.sleep(backoff_factor * 2 ** attempt)
+
+
+def record_response(url: str, seconds: float, nbytes: int, status: int) -> None:
+    """_summary_ : Enregistre une réponse HTTP dans les mesures du crawl (voir metrics.py).
+
+    Args:
+        url (str): L'URL demandée.
+        seconds (float): La durée de la requête, en secondes.
+        nbytes (int): Le nombre d'octets reçus.
+        status (int): Le code de la réponse.
+    """
+    metrics = get_metrics()
+    metrics.record_fetch(url, seconds, nbytes, status)
+    if status not in (200, 304):
+        metrics.record_failure(url)
+
+
+def fetch_page(url: str) -> tuple[int, bytes, bool]:
+    """_summary_ : Télécharge une page à travers la session partagée et le cache HTTP s'il est activé.
+
+    Args:
+        url (str): L'URL à télécharger.
+
+    Returns:
+        _tuple[int, bytes, bool]_: Le code de la réponse, son contenu, et True si la page n'a pas changé depuis sa
+        mise en cache (réponse 304, le code retourné est alors 200).
+    """
+    cache = get_cache()
+    if cache is None:
+        response = fetch(url)
+        return response.status_code, response.content, False
+
+    response = fetch(url, cache.conditional_headers(url))
+    if response.status_code == 304:
+        page = cache.get_body(url)
+        if page is not None:
+            return 200, page, True
+        # L'entrée a disparu du cache entre-temps : la page est retéléchargée sans condition
+        response = fetch(url)
+    if response.status_code == 200:
+        cache.store(url, response.headers, response.content)
+    return response.status_code, response.content, False
+
+
+def create_client_session(pool_size: int = DEFAULT_POOL_SIZE, per_host: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT) -> aiohttp.ClientSession:
+    """_summary_ : Crée une session aiohttp avec un pool de connexions persistantes borné globalement et par hôte.
+
+    Args:
+        pool_size (int, optional): Nombre maximal de connexions simultanées. Defaults to DEFAULT_POOL_SIZE.
+        per_host (int, optional): Nombre maximal de connexions simultanées par hôte. Defaults to DEFAULT_POOL_SIZE.
+        timeout (float, optional): Délai d'expiration d'une requête, en secondes. Defaults to DEFAULT_TIMEOUT.
+
+    Returns:
+        _aiohttp.ClientSession_: La session configurée.
+    """
+    connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=per_host)
+    # Le délai s'applique à la connexion et à la lecture, pas à l'attente d'une connexion libre dans le pool
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=client_timeout)
+
+
+async def fetch_async(session: aiohttp.ClientSession, url: str, retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR, headers: dict = None) -> tuple[int, bytes, dict]:
+    """_summary_ : Effectue une requête GET asynchrone, réessayée avec backoff sur les erreurs de connexion et les réponses 429 et 5xx.
+
+    Args:
+        session (aiohttp.ClientSession): La session à utiliser.
+        url (str): L'URL à télécharger.
+        retries (int, optional): Nombre de nouvelles tentatives. Defaults to DEFAULT_RETRIES.
+        backoff_factor (float, optional): Facteur du délai entre deux tentatives. Defaults to DEFAULT_BACKOFF_FACTOR.
+        headers (dict, optional): En-têtes supplémentaires de la requête.
+
+    Returns:
+        _tuple[int, bytes, dict]_: Le code de la réponse, son contenu (None si le code n'est pas 200) et ses en-têtes.
+    """
+    limiter = get_rate_limiter()
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            # Attente du tour de l'hôte, prolongée par un éventuel Retry-After de la réponse précédente
+            await limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                if limiter is not None:
+                    limiter.record(url, response.status, time.perf_counter() - start, response.headers)
+                if response.status not in RETRY_STATUSES or attempt == retries:
+                    body = await response.read() if response.status == 200 else None
+                    record_response(url, time.perf_counter() - start, len(body or b""), response.status)
+                    return response.status, body, response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if limiter is not None:
+                limiter.record(url, None, time.perf_counter() - start)
+            if attempt == retries:
+                get_metrics().record_failure(url)
+                raise
+        get_metrics().record_retry(url)
+        await asyncio.sleep(backoff_factor * 2 ** attempt)
+
+
+async def fetch_page_async(session: aiohttp.ClientSession, url: str, retries: int = DEFAULT_RETRIES) -> tuple[int, bytes, bool]:
+    """_summary_ : Version asynchrone de fetch_page(), qui passe par le cache HTTP s'il est activé.
+
+    Args:
+        session (aiohttp.ClientSession): La session à utiliser.
+        url (str): L'URL à télécharger.
+        retries (int, optional): Nombre de nouvelles tentatives. Defaults to DEFAULT_RETRIES.
+
+    Returns:
+        _tuple[int, bytes, bool]_: Le code de la réponse, son contenu, et True si la page n'a pas changé depuis sa
+        mise en cache.
+    """
+    cache = get_cache()
+    if cache is None:
+        status, page, _ = await fetch_async(session, url, retries)
+        return status, page, False
+
+    # Les fichiers du cache sont lus et écrits dans un thread, pour ne pas bloquer les autres requêtes du crawl
+    conditional_headers = await asyncio.to_thread(cache.conditional_headers, url)
+    status, page, headers = await fetch_async(session, url, retries, headers=conditional_headers)
+    if status == 304:
+        cached_page = await asyncio.to_thread(cache.get_body, url)
+        if cached_page is not None:
+            return 200, cached_page, True
+        status, page, headers = await fetch_async(session, url, retries)
+    if status == 200:
+        await asyncio.to_thread(cache.store, url, headers, page)
+    return status, page, False
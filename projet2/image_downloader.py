@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import os
+import time
+import aiohttp
+from http_cache import get_cache
+from image_store import ImageStore
+from http_session import record_response
+from metrics import get_metrics
+from rate_limiter import get_rate_limiter
+
+
+"""
+Description : Téléchargement des images des livres pour scraping_p3.py. Le nombre de téléchargements simultanés est
+              borné, le contenu de chaque image est lu par morceaux et écrit dans un fichier temporaire renommé une
+              fois complet : une image interrompue ne laisse jamais de fichier tronqué. Les écritures sur le disque
+              sont effectuées dans des threads afin de ne pas bloquer la boucle d'événements. L'empreinte SHA-256
+              de chaque image est calculée pendant son écriture, pour son enregistrement dans le stockage par
+              contenu (voir image_store.py).
+
+              Pendant un crawl, les images sont placées dans une file d'attente (ImageQueue) vidée en tâche de fond :
+              le téléchargement des images se poursuit pendant l'extraction des catégories suivantes. Les requêtes
+              passent par le même limiteur de débit que les pages (voir rate_limiter.py).
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Nombre maximal d'images téléchargées simultanément
+DEFAULT_IMAGE_CONCURRENCY = 10
+
+# Taille des morceaux lus puis écrits sur le disque, en octets
+CHUNK_SIZE = 64 * 1024
+
+# Nombre maximal d'images en attente dans une ImageQueue
+DEFAULT_QUEUE_SIZE = 1000
+
+
+async def _acquire(image_url: str) -> None:
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        await limiter.acquire(image_url)
+
+
+def _record(image_url: str, response: aiohttp.ClientResponse, start: float) -> None:
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        limiter.record(image_url, response.status, time.perf_counter() - start, response.headers)
+
+
+def _write_chunks(image_file, chunks: list[bytes], digest) -> None:
+    for chunk in chunks:
+        image_file.write(chunk)
+        digest.update(chunk)
+
+
+def _finish(image_file, tmp_path: str, image_path: str) -> None:
+    image_file.close()
+    os.replace(tmp_path, image_path)
+
+
+def _discard(image_file, tmp_path: str) -> None:
+    image_file.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+class ImageDownloader:
+    """_summary_ : Télécharge des images à travers une session aiohttp, avec un nombre borné de téléchargements
+    simultanés.
+
+    Args:
+        session (aiohttp.ClientSession): La session à utiliser.
+        concurrency (int, optional): Nombre maximal de téléchargements simultanés. Defaults to DEFAULT_IMAGE_CONCURRENCY.
+        chunk_size (int, optional): Taille des morceaux écrits sur le disque, en octets. Defaults to CHUNK_SIZE.
+        store (ImageStore, optional): Stockage des images par empreinte (voir image_store.py). Sans stockage, chaque
+            image est écrite directement à son chemin de destination.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int = DEFAULT_IMAGE_CONCURRENCY, chunk_size: int = CHUNK_SIZE, store: ImageStore = None) -> None:
+        self.session = session
+        self.chunk_size = chunk_size
+        self.store = store
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _is_complete(self, image_url: str, image_path: str) -> bool:
+        # Une image déjà présente est conservée si sa taille correspond à celle annoncée par le serveur
+        if not await asyncio.to_thread(os.path.exists, image_path):
+            return False
+        await _acquire(image_url)
+        start = time.perf_counter()
+        async with self.session.head(image_url) as response:
+            _record(image_url, response, start)
+            if response.status != 200 or response.content_length is None:
+                return False
+            return response.content_length == await asyncio.to_thread(os.path.getsize, image_path)
+
+    async def _adopt(self, image_path: str) -> None:
+        # Image présente sur le disque mais absente du stockage (dossier écrit avant l'utilisation du stockage)
+        if self.store is not None and not await asyncio.to_thread(self.store.lookup, image_path):
+            await asyncio.to_thread(self.store.adopt, image_path)
+
+    async def download(self, image_url: str, image_path: str) -> bool:
+        """_summary_:  Télécharge et enregistre une image depuis une URL.
+
+        Args:
+            image_url (str): L'URL de l'image à télécharger.
+            image_path (str): Le chemin de destination où l'image sera enregistrée localement.
+
+        Returns:
+            _bool_: True si l'image est enregistrée sur le disque et à jour.
+        """
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                return await self._download(image_url, image_path)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as error:
+                get_metrics().record_failure(image_url)
+                if get_rate_limiter() is not None and not isinstance(error, OSError):
+                    get_rate_limiter().record(image_url, None, time.perf_counter() - start)
+                print(f"Échec du téléchargement de l'image {image_path} depuis {image_url} : {error}")
+                return False
+
+    async def _download(self, image_url: str, image_path: str) -> bool:
+        # Avec le cache HTTP, une image déjà présente n'est retéléchargée que si elle a changé sur le serveur
+        cache = get_cache()
+        headers = {}
+        if await asyncio.to_thread(os.path.exists, image_path):
+            headers = cache.conditional_headers(image_url, require_body=False) if cache else {}
+            if not headers and self.store is not None and await asyncio.to_thread(self.store.lookup, image_path):
+                print(f"L'image {image_path} est déjà présente.")
+                return True
+            if not headers and await self._is_complete(image_url, image_path):
+                await self._adopt(image_path)
+                print(f"L'image {image_path} est déjà présente.")
+                return True
+
+        await _acquire(image_url)
+        start = time.perf_counter()
+        async with self.session.get(image_url, headers=headers) as response:
+            _record(image_url, response, start)
+            if response.status != 200:
+                record_response(image_url, time.perf_counter() - start, 0, response.status)
+            if response.status == 304:
+                await self._adopt(image_path)
+                print(f"L'image {image_path} est à jour.")
+                return True
+            if response.status != 200:
+                print(f"Échec du téléchargement de l'image {image_path} depuis {image_url}")
+                return False
+
+            tmp_path = image_path + ".part"
+            image_file = await asyncio.to_thread(open, tmp_path, 'wb')
+            digest = hashlib.sha256()
+            try:
+                # Les morceaux reçus sont regroupés jusqu'à chunk_size octets avant chaque écriture
+                chunks, buffered, received = [], 0, 0
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    chunks.append(chunk)
+                    buffered += len(chunk)
+                    received += len(chunk)
+                    if buffered >= self.chunk_size:
+                        await asyncio.to_thread(_write_chunks, image_file, chunks, digest)
+                        chunks, buffered = [], 0
+                await asyncio.to_thread(_write_chunks, image_file, chunks, digest)
+                record_response(image_url, time.perf_counter() - start, received, response.status)
+            except BaseException:
+                await asyncio.to_thread(_discard, image_file, tmp_path)
+                raise
+            if self.store is None:
+                await asyncio.to_thread(_finish, image_file, tmp_path, image_path)
+            else:
+                await asyncio.to_thread(image_file.close)
+                await asyncio.to_thread(self.store.add, image_path, tmp_path, digest.hexdigest())
+            print(f"L'image {image_path} a été téléchargée avec succès.")
+
+            if cache:
+                cache.store(image_url, response.headers)
+            return True
+
+    async def download_all(self, images: list[tuple[str, str]]) -> list[bool]:
+        """_summary_ : Télécharge une liste d'images, au plus concurrency à la fois.
+
+        Args:
+            images (list[tuple[str, str]]): L'URL et le chemin de destination de chaque image.
+
+        Returns:
+            _list[bool]_: Le résultat de download() pour chaque image, dans l'ordre de la liste.
+        """
+        return await asyncio.gather(*(self.download(image_url, image_path) for image_url, image_path in images))
+
+
+class ImageQueue:
+    """_summary_ : File d'attente de téléchargements d'images, vidée en tâche de fond par des tâches asyncio pendant
+    que le crawl se poursuit.
+
+    La file est bornée : lorsqu'elle est pleine, put() attend qu'une place se libère, ce qui limite la mémoire
+    utilisée si le crawl va plus vite que les téléchargements. À la sortie du bloc async with, la file est vidée
+    avant l'arrêt des tâches.
+
+    Args:
+        downloader (ImageDownloader): Le téléchargeur utilisé par les tâches.
+        workers (int, optional): Nombre de tâches de téléchargement. Defaults to DEFAULT_IMAGE_CONCURRENCY.
+        maxsize (int, optional): Nombre maximal d'images en attente. Defaults to DEFAULT_QUEUE_SIZE.
+        on_done (callable, optional): Fonction appelée avec le chemin de chaque image et le résultat de son
+            téléchargement.
+    """
+
+    def __init__(self, downloader: ImageDownloader, workers: int = DEFAULT_IMAGE_CONCURRENCY, maxsize: int = DEFAULT_QUEUE_SIZE, on_done=None) -> None:
+        self.downloader = downloader
+        self.workers = workers
+        self.on_done = on_done
+        self.queue = asyncio.Queue(maxsize)
+        self.tasks = []
+
+    async def __aenter__(self) -> "ImageQueue":
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            await self.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _worker(self) -> None:
+        while True:
+            image_url, image_path = await self.queue.get()
+            try:
+                downloaded = await self.downloader.download(image_url, image_path)
+                if self.on_done is not None:
+                    self.on_done(image_path, downloaded)
+            finally:
+                self.queue.task_done()
+
+    async def put(self, image_url: str, image_path: str) -> None:
+        """_summary_ : Ajoute une image à télécharger, en attendant une place libre si la file est pleine.
+
+        Args:
+            image_url (str): L'URL de l'image à télécharger.
+            image_path (str): Le chemin de destination de l'image.
+        """
+        await self.queue.put((image_url, image_path))
+
+    async def join(self) -> None:
+        """_summary_ : Attend la fin de tous les téléchargements en attente."""
+        await self.queue.join()
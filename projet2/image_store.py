@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+"""
+Description : Stockage des images des livres par contenu. Chaque image est enregistrée une seule fois sous le nom de
+              son empreinte SHA-256 (dossier objects), quel que soit le nombre de livres ou de catégories qui
+              l'utilisent. Un index par catégorie (index.json) associe le code UPC de chaque livre à l'empreinte de
+              son image, et le fichier <category>/<UPC>.jpg est un lien physique vers l'objet : les fichiers ne sont
+              pas dupliqués sur le disque.
+
+              Des miniatures des images peuvent être générées par lots dans un pool de processus, si la bibliothèque
+              Pillow est installée (pip3 install Pillow).
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Nom du fichier d'index de chaque dossier de catégorie
+INDEX_FILE = "index.json"
+
+# Fichier des objets déjà vérifiés, avec leur taille et leur date de modification lors de la vérification
+VERIFIED_FILE = "verified.json"
+
+# Délai minimal entre deux écritures des index, en secondes
+SAVE_INTERVAL = 1.0
+
+# Taille de lecture des fichiers lors du calcul des empreintes, en octets
+READ_SIZE = 64 * 1024
+
+
+def file_digest(path: str) -> str:
+    """_summary_ : Calcule l'empreinte SHA-256 d'un fichier.
+
+    Args:
+        path (str): Le chemin du fichier.
+
+    Returns:
+        _str_: L'empreinte, en hexadécimal.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _link(source: str, destination: str) -> None:
+    # Lien physique, ou copie si le système de fichiers ne gère pas les liens
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def require_pillow() -> None:
+    """_summary_ : Lève une ValueError si Pillow n'est pas installée."""
+    if Image is None:
+        raise ValueError("La bibliothèque Pillow n'est pas installée (pip install Pillow)")
+
+
+def make_thumbnails(batch: list[tuple[str, str]], size: int) -> int:
+    """_summary_ : Génère les miniatures d'un lot d'images. Exécutée dans un processus du pool.
+
+    Args:
+        batch (list[tuple[str, str]]): Le chemin de chaque image et celui de sa miniature.
+        size (int): Taille maximale, en pixels, du plus grand côté des miniatures.
+
+    Returns:
+        _int_: Le nombre de miniatures générées, les images illisibles sont ignorées.
+    """
+    count = 0
+    for source, destination in batch:
+        tmp_path = destination + ".tmp"
+        try:
+            with Image.open(source) as image:
+                image.thumbnail((size, size))
+                image.convert("RGB").save(tmp_path, "JPEG", quality=85)
+        except OSError as error:
+            print(f"Impossible de générer la miniature de {source} : {error}")
+            continue
+        os.replace(tmp_path, destination)
+        count += 1
+    return count
+
+
+class ImageStore:
+    """_summary_ : Stockage des images par empreinte SHA-256, avec un index UPC -> empreinte par catégorie.
+
+    Les images sont rangées dans <root>/objects/<2 premiers caractères>/<empreinte>.jpg. Chaque dossier de catégorie
+    <root>/<category> contient l'index de la catégorie et un lien <UPC>.jpg vers l'objet de chaque livre (une copie
+    si le système de fichiers ne gère pas les liens physiques).
+
+    Les méthodes peuvent être appelées depuis plusieurs threads (voir image_downloader.py).
+
+    Args:
+        root (str): Le dossier des images.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.objects_folder = os.path.join(root, "objects")
+        self.indexes = {}
+        self.dirty = set()
+        self.last_save = 0.0
+        self.lock = threading.RLock()
+
+    def object_path(self, digest: str) -> str:
+        """_summary_ : Retourne le chemin de l'objet d'empreinte donnée."""
+        return os.path.join(self.objects_folder, digest[:2], digest + ".jpg")
+
+    def _index(self, category_folder: str) -> dict:
+        if category_folder not in self.indexes:
+            index_path = os.path.join(category_folder, INDEX_FILE)
+            index = {}
+            if os.path.exists(index_path):
+                with open(index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            self.indexes[category_folder] = index
+        return self.indexes[category_folder]
+
+    @staticmethod
+    def _split(image_path: str) -> tuple[str, str]:
+        # <root>/<category>/<UPC>.jpg -> (<root>/<category>, <UPC>)
+        return os.path.dirname(image_path), os.path.splitext(os.path.basename(image_path))[0]
+
+    def lookup(self, image_path: str) -> str:
+        """_summary_ : Retourne l'empreinte de l'image d'un livre si elle est présente dans le stockage.
+
+        Args:
+            image_path (str): Le chemin <root>/<category>/<UPC>.jpg de l'image.
+
+        Returns:
+            _str_: L'empreinte de l'image, ou None si elle est absente de l'index, de l'objet ou du lien.
+        """
+        category_folder, upc = self._split(image_path)
+        with self.lock:
+            digest = self._index(category_folder).get(upc)
+        if digest is None or not os.path.exists(self.object_path(digest)) or not os.path.exists(image_path):
+            return None
+        return digest
+
+    def add(self, image_path: str, tmp_path: str, digest: str = None) -> str:
+        """_summary_ : Ajoute une image téléchargée au stockage et la rattache au livre.
+
+        Si un objet de même empreinte existe déjà, le fichier téléchargé est supprimé.
+
+        Args:
+            image_path (str): Le chemin <root>/<category>/<UPC>.jpg de l'image.
+            tmp_path (str): Le fichier contenant l'image téléchargée. Il est déplacé ou supprimé.
+            digest (str, optional): L'empreinte SHA-256 de l'image, calculée si elle n'est pas fournie.
+
+        Returns:
+            _str_: L'empreinte de l'image.
+        """
+        digest = digest or file_digest(tmp_path)
+        object_path = self.object_path(digest)
+        with self.lock:
+            if os.path.exists(object_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(tmp_path, object_path)
+            self._attach(image_path, digest)
+        return digest
+
+    def adopt(self, image_path: str) -> str:
+        """_summary_ : Ajoute au stockage une image déjà enregistrée en dehors de celui-ci (ancienne organisation
+        des dossiers). Le fichier n'est ni déplacé ni réécrit s'il devient lui-même l'objet.
+
+        Args:
+            image_path (str): Le chemin <root>/<category>/<UPC>.jpg de l'image.
+
+        Returns:
+            _str_: L'empreinte de l'image.
+        """
+        digest = file_digest(image_path)
+        object_path = self.object_path(digest)
+        with self.lock:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                _link(image_path, object_path)
+            self._attach(image_path, digest)
+        return digest
+
+    def _attach(self, image_path: str, digest: str) -> None:
+        object_path = self.object_path(digest)
+        if not (os.path.exists(image_path) and os.path.samefile(object_path, image_path)):
+            # Le lien est créé sous un nom temporaire puis renommé, pour remplacer une ancienne image sans coupure
+            link_tmp_path = image_path + ".link"
+            if os.path.exists(link_tmp_path):
+                os.remove(link_tmp_path)
+            _link(object_path, link_tmp_path)
+            os.replace(link_tmp_path, image_path)
+
+        category_folder, upc = self._split(image_path)
+        self._index(category_folder)[upc] = digest
+        self.dirty.add(category_folder)
+        self.save()
+
+    def save(self, force: bool = False) -> None:
+        """_summary_ : Écrit les index modifiés, au plus une fois par SAVE_INTERVAL sauf si force est vrai."""
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_save < SAVE_INTERVAL:
+                return
+            self.last_save = now
+            for category_folder in self.dirty:
+                _write_json(os.path.join(category_folder, INDEX_FILE), self.indexes[category_folder])
+            self.dirty = set()
+
+    def objects(self) -> list[str]:
+        """_summary_ : Retourne l'empreinte de tous les objets du stockage."""
+        if not os.path.exists(self.objects_folder):
+            return []
+        return sorted(
+            os.path.splitext(name)[0]
+            for prefix in os.listdir(self.objects_folder)
+            for name in os.listdir(os.path.join(self.objects_folder, prefix))
+            if name.endswith(".jpg")
+        )
+
+    def verify(self) -> list[str]:
+        """_summary_ : Vérifie l'empreinte des objets et supprime les objets corrompus.
+
+        La vérification est incrémentale : seuls les objets ajoutés ou modifiés (taille ou date de modification
+        différente) depuis la vérification précédente sont relus. Les livres dont l'objet est supprimé sont
+        retirés de leur index avec leur lien, leur image est retéléchargée au crawl suivant.
+
+        Returns:
+            _list[str]_: L'empreinte des objets corrompus.
+        """
+        verified_path = os.path.join(self.root, VERIFIED_FILE)
+        verified = {}
+        if os.path.exists(verified_path):
+            with open(verified_path, "r", encoding="utf-8") as f:
+                verified = json.load(f)
+
+        corrupted = []
+        checked = {}
+        for digest in self.objects():
+            stat = os.stat(self.object_path(digest))
+            signature = [stat.st_size, stat.st_mtime_ns]
+            if verified.get(digest) != signature and file_digest(self.object_path(digest)) != digest:
+                corrupted.append(digest)
+                os.remove(self.object_path(digest))
+            else:
+                checked[digest] = signature
+        _write_json(verified_path, checked)
+
+        if corrupted:
+            for category_folder in self._category_folders():
+                index = self._index(category_folder)
+                for upc in [upc for upc, digest in index.items() if digest in corrupted]:
+                    del index[upc]
+                    self.dirty.add(category_folder)
+                    image_path = os.path.join(category_folder, upc + ".jpg")
+                    if os.path.exists(image_path):
+                        os.remove(image_path)
+            self.save(force=True)
+        return corrupted
+
+    def _category_folders(self) -> list[str]:
+        return [
+            os.path.join(self.root, name)
+            for name in sorted(os.listdir(self.root))
+            if os.path.exists(os.path.join(self.root, name, INDEX_FILE))
+        ]
+
+    def thumbnail_path(self, digest: str, size: int) -> str:
+        """_summary_ : Retourne le chemin de la miniature de taille donnée d'un objet."""
+        return os.path.join(self.root, "thumbnails", str(size), digest[:2], digest + ".jpg")
+
+    def build_thumbnails(self, size: int, workers: int = None) -> int:
+        """_summary_ : Génère les miniatures manquantes de tous les objets, par lots répartis entre plusieurs
+        processus.
+
+        Les miniatures sont enregistrées dans <root>/thumbnails/<size>/, sous l'empreinte de l'image d'origine : une
+        image partagée par plusieurs livres n'a qu'une seule miniature.
+
+        Args:
+            size (int): Taille maximale, en pixels, du plus grand côté des miniatures.
+            workers (int, optional): Nombre de processus. Defaults to os.cpu_count().
+
+        Returns:
+            _int_: Le nombre de miniatures générées.
+        """
+        require_pillow()
+
+        pending = []
+        for digest in self.objects():
+            thumbnail_path = self.thumbnail_path(digest, size)
+            if not os.path.exists(thumbnail_path):
+                os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+                pending.append((self.object_path(digest), thumbnail_path))
+        if not pending:
+            return 0
+
+        workers = workers or os.cpu_count() or 1
+        batch_size = -(-len(pending) // workers)
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        with ProcessPoolExecutor(max_workers=len(batches)) as executor:
+            return sum(executor.map(make_thumbnails, batches, [size] * len(batches)))
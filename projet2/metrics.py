@@ -0,0 +1,242 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from array import array
+from urllib.parse import urlparse
+
+
+"""
+Description : Mesures d'un crawl, communes aux trois scripts de scraping. Pour chaque étape (page d'accueil, pages de
+              catégorie, pages produit, images), on relève la durée de chaque requête HTTP (histogramme et
+              percentiles), le volume téléchargé, les nouvelles tentatives, les échecs, la durée de l'analyse de
+              chaque page et le débit en pages par seconde. report() rassemble ces mesures dans un rapport JSON.
+
+              Le profil cProfile de l'analyse des pages (le chemin critique en CPU) peut également être enregistré.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Bornes supérieures des classes de l'histogramme des durées de requête, en millisecondes
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Étapes du crawl, déduites de l'URL (voir url_stage)
+STAGES = ("home", "category", "product", "image")
+
+# Nombre de lignes du profil affichées à la fin du crawl
+PROFILE_LINES = 20
+
+
+def url_stage(url: str) -> str:
+    """_summary_ : Retourne l'étape du crawl à laquelle appartient une URL du site.
+
+    Args:
+        url (str): L'URL.
+
+    Returns:
+        _str_: "image", "category", "product" ou "home".
+    """
+    path = urlparse(url).path
+    if "/media/" in path:
+        return "image"
+    if "/category/" in path:
+        return "category"
+    if path.startswith("/catalogue/"):
+        return "product"
+    return "home"
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class StageMetrics:
+    """_summary_ : Mesures d'une étape du crawl."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = 0
+        self.not_modified = 0
+        self.latencies = array('d')
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.parse_times = array('d')
+        self.first = None
+        self.last = None
+
+    def _touch(self) -> None:
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        self.last = now
+
+    def report(self) -> dict:
+        """_summary_ : Retourne les mesures de l'étape sous forme de dictionnaire."""
+        latencies = sorted(self.latencies)
+        parse_times = sorted(self.parse_times)
+        duration = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "failures": self.failures,
+            "not_modified": self.not_modified,
+            "duration_s": round(duration, 3),
+            "pages_per_s": round(self.requests / duration, 2) if duration > 0 else None,
+            "latency_ms": {
+                "mean": round(1000 * sum(latencies) / len(latencies), 2),
+                "p50": round(1000 * _percentile(latencies, 0.50), 2),
+                "p95": round(1000 * _percentile(latencies, 0.95), 2),
+                "p99": round(1000 * _percentile(latencies, 0.99), 2),
+                "max": round(1000 * latencies[-1], 2),
+                "histogram": {
+                    f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)
+                } | {f">{LATENCY_BUCKETS_MS[-1]}": self.histogram[-1]},
+            } if latencies else None,
+            "parse_ms": {
+                "pages": len(parse_times),
+                "total": round(1000 * sum(parse_times), 2),
+                "mean": round(1000 * sum(parse_times) / len(parse_times), 3),
+                "p95": round(1000 * _percentile(parse_times, 0.95), 3),
+            } if parse_times else None,
+        }
+
+
+class Metrics:
+    """_summary_ : Mesures d'un crawl, par étape."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.stages = {stage: StageMetrics() for stage in STAGES}
+
+    def record_fetch(self, url: str, seconds: float, nbytes: int, status: int) -> None:
+        """_summary_ : Enregistre une requête HTTP terminée.
+
+        Args:
+            url (str): L'URL demandée.
+            seconds (float): La durée de la requête, en secondes.
+            nbytes (int): Le nombre d'octets reçus.
+            status (int): Le code de la réponse.
+        """
+        stage = self.stages[url_stage(url)]
+        stage._touch()
+        stage.requests += 1
+        stage.bytes += nbytes
+        if status == 304:
+            stage.not_modified += 1
+        stage.latencies.append(seconds)
+        milliseconds = 1000 * seconds
+        bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS_MS) if milliseconds <= bound), len(LATENCY_BUCKETS_MS))
+        stage.histogram[bucket] += 1
+
+    def record_retry(self, url: str, count: int = 1) -> None:
+        """_summary_ : Enregistre une ou plusieurs nouvelles tentatives d'une requête."""
+        self.stages[url_stage(url)].retries += count
+
+    def record_failure(self, url: str) -> None:
+        """_summary_ : Enregistre une requête en échec (erreur de connexion ou code autre que 200 et 304)."""
+        self.stages[url_stage(url)].failures += 1
+
+    def record_parse(self, url: str, seconds: float) -> None:
+        """_summary_ : Enregistre la durée de l'analyse d'une page."""
+        self.stages[url_stage(url)].parse_times.append(seconds)
+
+    def report(self) -> dict:
+        """_summary_ : Retourne le rapport du crawl, sérialisable en JSON."""
+        duration = time.perf_counter() - self.start
+        stages = {name: stage.report() for name, stage in self.stages.items() if stage.requests or stage.parse_times}
+        pages = sum(stage.requests for name, stage in self.stages.items() if name != "image")
+        return {
+            "duration_s": round(duration, 3),
+            "requests": sum(stage.requests for stage in self.stages.values()),
+            "bytes": sum(stage.bytes for stage in self.stages.values()),
+            "retries": sum(stage.retries for stage in self.stages.values()),
+            "failures": sum(stage.failures for stage in self.stages.values()),
+            "pages_per_s": round(pages / duration, 2) if duration > 0 else None,
+            "stages": stages,
+        }
+
+    def write_report(self, path: str) -> dict:
+        """_summary_ : Écrit le rapport du crawl dans un fichier JSON et affiche son résumé.
+
+        Args:
+            path (str): Le chemin du fichier.
+
+        Returns:
+            _dict_: Le rapport.
+        """
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(
+            f"Rapport du crawl écrit dans {path} : {report['requests']} requêtes, {report['bytes']} octets, "
+            f"{report['failures']} échec(s), {report['pages_per_s']} pages/s en {report['duration_s']} s"
+        )
+        return report
+
+
+# Mesures du processus, remplacées par reset_metrics()
+_metrics = Metrics()
+
+# Profil de l'analyse des pages, activé par enable_profile()
+_profiler = None
+
+
+def get_metrics() -> Metrics:
+    """_summary_ : Retourne les mesures du processus."""
+    return _metrics
+
+
+def reset_metrics() -> Metrics:
+    """_summary_ : Remet les mesures à zéro, au début d'un crawl."""
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+
+def enable_profile() -> None:
+    """_summary_ : Active le profil cProfile des analyses de pages faites par run_parse()."""
+    global _profiler
+    _profiler = cProfile.Profile()
+
+
+def run_parse(parse, page: bytes, url: str):
+    """_summary_ : Appelle parse(page, url) en mesurant sa durée, sous le profileur s'il est activé.
+
+    Args:
+        parse (callable): La fonction d'analyse.
+        page (bytes): Le contenu de la page.
+        url (str): L'URL de la page.
+
+    Returns:
+        Le résultat de parse(page, url).
+    """
+    start = time.perf_counter()
+    if _profiler is not None:
+        result = _profiler.runcall(parse, page, url)
+    else:
+        result = parse(page, url)
+    _metrics.record_parse(url, time.perf_counter() - start)
+    return result
+
+
+def write_profile(path: str) -> None:
+    """_summary_ : Enregistre le profil de l'analyse des pages (lisible avec pstats ou snakeviz) et affiche les
+    fonctions les plus coûteuses.
+
+    Args:
+        path (str): Le chemin du fichier de profil.
+    """
+    if _profiler is None:
+        return
+    _profiler.dump_stats(path)
+    output = io.StringIO()
+    pstats.Stats(_profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    print(output.getvalue())
+    print(f"Profil de l'analyse des pages écrit dans {path}")
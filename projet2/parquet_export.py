@@ -0,0 +1,176 @@
+import filecmp
+import os
+from scraping_p1 import parse_price
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+"""
+Description : Export des données de livres au format Parquet, en complément des fichiers CSV. Les données de toutes
+              les catégories forment un seul jeu de données partitionné par catégorie (un dossier par catégorie),
+              dont les colonnes sont typées : prix en nombres décimaux, stock et note en entiers, catégorie encodée
+              par dictionnaire. load_books_dataset() relit le jeu de données complet en une seule fois.
+
+              La bibliothèque pyarrow est nécessaire (pip3 install pyarrow).
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Dossier du jeu de données Parquet, dans le dossier des résultats
+DATASET_FOLDER = "books_parquet"
+
+# Nom du fichier Parquet de chaque partition
+PART_FILE = "part-0.parquet"
+
+# Nombre de lignes conservées en mémoire avant l'écriture d'un groupe de lignes (row group)
+DEFAULT_ROW_GROUP_SIZE = 1000
+
+
+def books_schema():
+    """_summary_ : Retourne le schéma Arrow des données de livres."""
+    return pa.schema([
+        ('product_page_url', pa.string()),
+        ('universal_product_code', pa.string()),
+        ('title', pa.string()),
+        ('price_including_tax', pa.float64()),
+        ('price_excluding_tax', pa.float64()),
+        ('number_available', pa.int32()),
+        ('product_description', pa.string()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('review_rating', pa.int8()),
+        ('image_url', pa.string()),
+    ])
+
+
+def typed_columns(books_data: list[dict]) -> dict:
+    """_summary_ : Convertit des données de livres en colonnes typées.
+
+    Args:
+        books_data (list[dict]): Les données des livres, telles que retournées par scraping_p1.parse_product_page(),
+            éventuellement réduites à certains champs (option --fields).
+
+    Returns:
+        _dict_: Les valeurs de chaque colonne du schéma books_schema(), None pour les champs absents.
+    """
+    columns = {name: [book_data.get(name) for book_data in books_data] for name in books_schema().names}
+    for name in ('price_including_tax', 'price_excluding_tax'):
+        columns[name] = [parse_price(price) for price in columns[name]]
+    return columns
+
+
+def require_pyarrow() -> None:
+    """_summary_ : Lève une ValueError si pyarrow n'est pas installé."""
+    if pa is None:
+        raise ValueError("La bibliothèque pyarrow n'est pas installée (pip install pyarrow)")
+
+
+class ParquetCategoryWriter:
+    """_summary_ : Écrit les données des livres d'une catégorie dans sa partition du jeu de données Parquet, par
+    groupes de row_group_size lignes.
+
+    Le fichier est écrit sous un nom temporaire puis renommé à la fermeture. Même interface que
+    csv_writer.StreamingCsvWriter, sans reprise d'un fichier écrit en partie.
+
+    Args:
+        dataset_folder (str): Le dossier du jeu de données.
+        category_name (str): Le nom de la catégorie, qui donne le nom de la partition.
+        row_group_size (int, optional): Nombre de lignes par groupe de lignes. Defaults to DEFAULT_ROW_GROUP_SIZE.
+        incremental (bool, optional): Ne pas remplacer le fichier si son contenu est inchangé. Defaults to False.
+    """
+
+    def __init__(self, dataset_folder: str, category_name: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE, incremental: bool = False) -> None:
+        require_pyarrow()
+        self.filename = os.path.join(dataset_folder, category_name, PART_FILE)
+        self.row_group_size = row_group_size
+        self.incremental = incremental
+        self.resume_offset = 0
+        self.rows_written = 0
+        self.buffer = []
+        self.writer = None
+        self.closed = False
+
+    def __enter__(self) -> "ParquetCategoryWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def path(self) -> str:
+        """_summary_ : Chemin du fichier en cours d'écriture."""
+        return self.filename + ".tmp"
+
+    def write(self, book_data: dict) -> None:
+        """_summary_ : Ajoute une ligne, écrite dès que le groupe de lignes est complet.
+
+        Args:
+            book_data (dict): Les données d'un livre.
+        """
+        self.buffer.append(book_data)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """_summary_ : Écrit les lignes en attente dans un nouveau groupe de lignes."""
+        if not self.buffer:
+            return
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path, books_schema())
+        self.writer.write_table(pa.table(typed_columns(self.buffer), schema=books_schema()))
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def tell(self) -> int:
+        """_summary_ : Toujours 0 : un fichier Parquet ne peut pas être repris en cours d'écriture."""
+        return 0
+
+    def close(self) -> bool:
+        """_summary_ : Écrit les dernières lignes et renomme le fichier.
+
+        Returns:
+            _bool_: True si le fichier a été écrit ou modifié, False s'il était déjà à jour ou s'il n'y avait aucune
+            ligne.
+        """
+        if self.closed:
+            return False
+        self.closed = True
+        self.flush()
+        if self.writer is None:
+            return False
+        self.writer.close()
+
+        if self.incremental and os.path.exists(self.filename) and filecmp.cmp(self.path, self.filename, shallow=False):
+            os.remove(self.path)
+            return False
+        os.replace(self.path, self.filename)
+        return True
+
+
+def load_books_dataset(dataset_folder: str, categories: list[str] = None, columns: list[str] = None):
+    """_summary_ : Lit le jeu de données Parquet en une seule fois.
+
+    Args:
+        dataset_folder (str): Le dossier du jeu de données.
+        categories (list[str], optional): Noms des partitions (catégories) à lire. Defaults to toutes.
+        columns (list[str], optional): Colonnes à lire. Defaults to toutes.
+
+    Returns:
+        _pyarrow.Table_: Les données des livres (table.to_pandas() pour un DataFrame pandas).
+    """
+    require_pyarrow()
+    names = categories if categories is not None else sorted(
+        name for name in os.listdir(dataset_folder) if os.path.exists(os.path.join(dataset_folder, name, PART_FILE))
+    )
+    paths = [os.path.join(dataset_folder, name, PART_FILE) for name in names]
+    if not paths:
+        return books_schema().empty_table() if columns is None else books_schema().empty_table().select(columns)
+    return pq.ParquetDataset(paths, schema=books_schema()).read(columns=columns)
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http_cache import get_cache
+from metrics import get_metrics
+from parsers import get_backend
+from scraping_p1 import parse_product_page
+
+
+"""
+Description : Pool de processus d'analyse des pages produit. L'analyse HTML avec BeautifulSoup occupe le processeur
+              et garde le GIL : le réseau se contente de télécharger le contenu brut des pages, qui est envoyé par
+              lots à des processus dédiés afin d'utiliser tous les cœurs de la machine.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+
+def parse_product_pages(batch: list[tuple[bytes, str]], backend: str) -> list[tuple[dict, float]]:
+    """_summary_ : Analyse un lot de pages produit. Exécutée dans un processus du pool.
+
+    Args:
+        batch (list[tuple[bytes, str]]): Le contenu HTML et l'URL de chaque page.
+        backend (str): Parseur HTML à utiliser.
+
+    Returns:
+        _list[tuple[dict, float]]_: Les données de chaque bouquin et la durée de son analyse en secondes, dans l'ordre
+        du lot.
+    """
+    results = []
+    for page, url in batch:
+        start = time.perf_counter()
+        product_data = parse_product_page(page, url, backend)
+        results.append((product_data, time.perf_counter() - start))
+    return results
+
+
+class ParsePool:
+    """_summary_ : Répartit l'analyse des pages produit entre plusieurs processus.
+
+    Les pages inchangées dont l'analyse est en cache (voir http_cache.py) ne sont pas renvoyées aux processus.
+
+    Args:
+        workers (int): Nombre de processus d'analyse.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """_summary_ : Arrête les processus d'analyse."""
+        self.executor.shutdown()
+
+    def _split(self, pages: list[tuple[bytes, str, bool]]) -> tuple[list, list[int], list[list[tuple[bytes, str]]]]:
+        # Réutiliser les analyses en cache, puis répartir les pages restantes en un lot par processus
+        cache = get_cache()
+        results = [None] * len(pages)
+        pending = []
+        for index, (page, url, not_modified) in enumerate(pages):
+            if cache is not None and not_modified:
+                results[index] = cache.get_parsed(url)
+            if results[index] is None:
+                pending.append(index)
+
+        batch_size = -(-len(pending) // self.workers) if pending else 1
+        batches = [
+            [(pages[index][0], pages[index][1]) for index in pending[start:start + batch_size]]
+            for start in range(0, len(pending), batch_size)
+        ]
+        return results, pending, batches
+
+    def _merge(self, pages, results: list, pending: list[int], parsed_batches: list[list[tuple[dict, float]]]) -> list[dict]:
+        cache = get_cache()
+        metrics = get_metrics()
+        parsed = [parsed_page for batch in parsed_batches for parsed_page in batch]
+        for index, (product_data, seconds) in zip(pending, parsed):
+            results[index] = product_data
+            metrics.record_parse(pages[index][1], seconds)
+            if cache is not None:
+                cache.set_parsed(pages[index][1], product_data)
+        return results
+
+    def parse(self, pages: list[tuple[bytes, str, bool]]) -> list[dict]:
+        """_summary_ : Analyse des pages produit dans les processus du pool.
+
+        Args:
+            pages (list[tuple[bytes, str, bool]]): Le contenu HTML, l'URL de chaque page et True si la page n'a pas
+            changé depuis sa mise en cache.
+
+        Returns:
+            _list[dict]_: Les données de chaque bouquin, dans l'ordre des pages.
+        """
+        results, pending, batches = self._split(pages)
+        futures = [self.executor.submit(parse_product_pages, batch, get_backend()) for batch in batches]
+        return self._merge(pages, results, pending, [future.result() for future in futures])
+
+    async def parse_async(self, pages: list[tuple[bytes, str, bool]]) -> list[dict]:
+        """_summary_ : Version asynchrone de parse(), qui laisse la boucle d'événements libre pendant l'analyse."""
+        results, pending, batches = self._split(pages)
+        parsed_batches = await asyncio.gather(*(
+            asyncio.wrap_future(self.executor.submit(parse_product_pages, batch, get_backend()))
+            for batch in batches
+        ))
+        return self._merge(pages, results, pending, parsed_batches)
@@ -0,0 +1,58 @@
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_BACKEND = "lxml"
+except ImportError:
+    DEFAULT_BACKEND = "html.parser"
+
+
+"""
+Description : Choix du parseur HTML utilisé par BeautifulSoup dans les scripts de scraping. Le parseur lxml, écrit en
+              C, est utilisé lorsqu'il est installé ; sinon le parseur html.parser de la bibliothèque standard.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Parseurs pris en charge
+BACKENDS = ("lxml", "html.parser")
+
+# Parseur utilisé par make_soup()
+_backend = DEFAULT_BACKEND
+
+
+def set_backend(name: str) -> None:
+    """_summary_ : Choisit le parseur HTML utilisé par make_soup().
+
+    Args:
+        name (str): "lxml" ou "html.parser".
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Parseur HTML inconnu : {name}")
+    if name == "lxml" and DEFAULT_BACKEND != "lxml":
+        raise ValueError("Le parseur lxml n'est pas installé (pip install lxml)")
+    _backend = name
+
+
+def get_backend() -> str:
+    """_summary_ : Retourne le nom du parseur HTML utilisé par make_soup()."""
+    return _backend
+
+
+def make_soup(page: bytes, parse_only=None, backend: str = None) -> BeautifulSoup:
+    """_summary_ : Construit un objet BeautifulSoup avec le parseur choisi.
+
+    Args:
+        page (bytes): Contenu HTML de la page.
+        parse_only (SoupStrainer, optional): Limite l'arbre construit aux éléments retenus par ce filtre.
+        backend (str, optional): Parseur à utiliser à la place du parseur choisi par set_backend().
+
+    Returns:
+        _BeautifulSoup_: L'arbre de la page.
+    """
+    return BeautifulSoup(page, backend or _backend, parse_only=parse_only)
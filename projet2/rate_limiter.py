@@ -0,0 +1,212 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+
+"""
+Description : Limitation du débit des requêtes par hôte, partagée par le téléchargement des pages et des images.
+              Chaque hôte dispose d'un seau de jetons (token bucket) dont le débit s'adapte selon la règle AIMD :
+              tant que les réponses sont rapides, il augmente d'un pas fixe par seconde (et non par réponse, ce qui
+              le ferait croître d'autant plus vite qu'il est élevé), et il est divisé par deux sur une réponse 429
+              ou 5xx ou sur une erreur de connexion. Comme pour le contrôle de congestion de TCP, il n'est divisé
+              qu'une fois par épisode de surcharge : les échecs des requêtes envoyées avant la dernière réduction
+              sont ignorés. Une réponse accompagnée d'un en-tête Retry-After suspend les requêtes vers l'hôte
+              pendant la durée demandée.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Débit initial par hôte, en requêtes par seconde
+DEFAULT_RATE = 10.0
+
+# Débit minimal et maximal par hôte, en requêtes par seconde
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 50.0
+
+# Augmentation du débit par seconde de réponses rapides, en requêtes par seconde
+RATE_INCREASE = 0.5
+
+# Facteur appliqué au débit après une réponse 429 ou 5xx ou une erreur de connexion
+RATE_DECREASE = 0.5
+
+# Durée de réponse en dessous de laquelle le débit est augmenté, en secondes
+TARGET_LATENCY = 1.0
+
+# Durée maximale d'attente demandée par un en-tête Retry-After prise en compte, en secondes
+MAX_RETRY_AFTER = 300.0
+
+# Limiteur partagé, activé par enable_rate_limiter()
+_limiter = None
+
+
+def parse_retry_after(value: str) -> float:
+    """_summary_ : Convertit la valeur d'un en-tête Retry-After (secondes ou date HTTP) en durée d'attente.
+
+    Args:
+        value (str): La valeur de l'en-tête.
+
+    Returns:
+        _float_: La durée d'attente en secondes, ou None si l'en-tête est absent ou invalide.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class HostRateLimiter:
+    """_summary_ : Seau de jetons d'un hôte, dont le débit s'adapte aux réponses du serveur.
+
+    Args:
+        rate (float): Débit initial, en requêtes par seconde.
+        min_rate (float): Débit minimal.
+        max_rate (float): Débit maximal.
+    """
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float) -> None:
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # Date de la dernière réduction du débit
+        self.decreased_at = float("-inf")
+
+    def _refill(self, now: float) -> None:
+        # Le seau contient au plus une seconde de requêtes au débit courant
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """_summary_ : Prend un jeton s'il y en a un de disponible.
+
+        Returns:
+            _float_: 0 si un jeton a été pris, sinon la durée à attendre avant de réessayer, en secondes.
+        """
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def record(self, status: int, latency: float, retry_after: float = None) -> None:
+        """_summary_ : Adapte le débit à une réponse du serveur.
+
+        Args:
+            status (int): Le code de la réponse, None pour une erreur de connexion.
+            latency (float): La durée de la requête, en secondes.
+            retry_after (float, optional): La durée demandée par l'en-tête Retry-After, en secondes.
+        """
+        now = time.monotonic()
+        if status is None or status == 429 or status >= 500:
+            # Une requête envoyée avant la dernière réduction a été émise à l'ancien débit : pas de nouvelle réduction
+            if now - latency >= self.decreased_at:
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+                self.decreased_at = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.tokens = 0.0
+        elif latency < TARGET_LATENCY:
+            # Environ self.rate réponses par seconde : le débit augmente de RATE_INCREASE par seconde
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE / self.rate)
+
+
+class RateLimiter:
+    """_summary_ : Limiteur de débit des requêtes, avec un seau de jetons par hôte.
+
+    Args:
+        rate (float, optional): Débit initial par hôte, en requêtes par seconde. Defaults to DEFAULT_RATE.
+        min_rate (float, optional): Débit minimal par hôte. Defaults to DEFAULT_MIN_RATE.
+        max_rate (float, optional): Débit maximal par hôte. Defaults to DEFAULT_MAX_RATE.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE) -> None:
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.hosts = {}
+
+    def host(self, url: str) -> HostRateLimiter:
+        """_summary_ : Retourne le seau de jetons de l'hôte d'une URL."""
+        netloc = urlparse(url).netloc
+        if netloc not in self.hosts:
+            self.hosts[netloc] = HostRateLimiter(self.rate, self.min_rate, self.max_rate)
+        return self.hosts[netloc]
+
+    async def acquire(self, url: str) -> None:
+        """_summary_ : Attend qu'une requête vers l'hôte de l'URL soit autorisée."""
+        host = self.host(url)
+        while True:
+            delay = host.reserve()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, url: str) -> None:
+        """_summary_ : Version bloquante de acquire(), pour les requêtes synchrones."""
+        host = self.host(url)
+        while True:
+            delay = host.reserve()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    def record(self, url: str, status: int, latency: float, headers=None) -> None:
+        """_summary_ : Adapte le débit de l'hôte d'une URL à une réponse.
+
+        Args:
+            url (str): L'URL demandée.
+            status (int): Le code de la réponse, None pour une erreur de connexion.
+            latency (float): La durée de la requête, en secondes.
+            headers (optional): Les en-têtes de la réponse, pour l'en-tête Retry-After.
+        """
+        retry_after = parse_retry_after(headers.get("Retry-After")) if headers is not None else None
+        self.host(url).record(status, latency, retry_after)
+
+    def rates(self) -> dict:
+        """_summary_ : Retourne le débit courant de chaque hôte, en requêtes par seconde."""
+        return {netloc: round(host.rate, 2) for netloc, host in self.hosts.items()}
+
+
+def enable_rate_limiter(rate: float = DEFAULT_RATE, min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE) -> RateLimiter:
+    """_summary_ : Active le limiteur de débit partagé par les fonctions de téléchargement.
+
+    Args:
+        rate (float, optional): Débit initial par hôte, en requêtes par seconde. Defaults to DEFAULT_RATE.
+        min_rate (float, optional): Débit minimal par hôte. Defaults to DEFAULT_MIN_RATE.
+        max_rate (float, optional): Débit maximal par hôte. Defaults to DEFAULT_MAX_RATE.
+
+    Returns:
+        _RateLimiter_: Le limiteur activé.
+    """
+    global _limiter
+    _limiter = RateLimiter(rate, min_rate, max_rate)
+    return _limiter
+
+
+def disable_rate_limiter() -> None:
+    """_summary_ : Désactive le limiteur de débit partagé."""
+    global _limiter
+    _limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """_summary_ : Retourne le limiteur de débit partagé, ou None s'il n'est pas activé."""
+    return _limiter
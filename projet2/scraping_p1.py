@@ -1,5 +1,8 @@
-import requests
-from bs4 import BeautifulSoup
+from http_session import fetch_page
+from http_cache import parse_with_cache
+from bs4 import SoupStrainer
+from parsers import make_soup
+from metrics import get_metrics, enable_profile, write_profile
 import re
 import csv
 import argparse
@@ -18,11 +21,120 @@ Date : 07/09/2023
 
     Input:
         URL(string): URL de la page du bouquin
+        --report(str) : Fichier du rapport JSON des mesures
+        --profile(str) : Fichier du profil cProfile de l'analyse de la page
 
     Output:
         product_data.csv : fichier CSV contenant les informations du bouquin: product_page_url, universal_product_code, title, price_including_tax, price_excluding_tax, number_available, product_description, category, review_rating, image_url
 """
 
+# Champs des données d'un livre, dans l'ordre des colonnes des fichiers CSV
+BOOK_FIELDS = (
+    'product_page_url',
+    'universal_product_code',
+    'title',
+    'price_including_tax',
+    'price_excluding_tax',
+    'number_available',
+    'product_description',
+    'category',
+    'review_rating',
+    'image_url',
+)
+
+# Mapping des valeurs textuelles aux chiffres
+rating_mapping = {
+    'One': 1,
+    'Two': 2,
+    'Three': 3,
+    'Four': 4,
+    'Five': 5
+}
+
+
+def parse_price(price: str) -> float:
+    """_summary_ : Convertit un prix affiché sur le site ("£51.77") en nombre.
+
+    Args:
+        price (str): Le prix, avec son symbole monétaire.
+
+    Returns:
+        _float_: Le prix, ou None s'il est vide.
+    """
+    digits = re.sub(r'[^\d.]', '', price or '')
+    return float(digits) if digits else None
+
+
+# Éléments de la page produit conservés lors de l'analyse : la balise meta de description (dans <head>), le fil
+# d'Ariane qui contient la catégorie et l'article qui contient toutes les autres informations. Le reste de la page
+# (en-tête, scripts, pied de page) n'est pas construit.
+product_strainer = SoupStrainer(['meta', 'ul', 'article'])
+
+
+def parse_product_page(page: bytes, url: str, backend: str = None) -> dict:
+    """_summary_ : Fonction pour extraire les informations du contenu HTML d'une page d'un bouquin
+
+    Args:
+        page (bytes): Contenu HTML de la page du bouquin
+        url (string): URL de la page du bouquin
+        backend (str, optional): Parseur HTML à utiliser (voir parsers.py)
+
+    Returns:
+        _dict_: Retourne les données du bouquin sous forme de dictionnaire
+    """
+    # Créez un objet BeautifulSoup limité à la section produit de la page
+    soup = make_soup(page, parse_only=product_strainer, backend=backend)
+
+    # Parcourir une seule fois les balises pour repérer tous les éléments utiles
+    tds = []
+    title = product_description = breadcrumb = review_class = article = None
+    for tag in soup.find_all(True):
+        name = tag.name
+        if name == 'td':
+            tds.append(tag)
+        elif name == 'h1':
+            if title is None:
+                title = tag.text
+        elif name == 'p':
+            if review_class is None and 'star-rating' in tag.get('class', ()):
+                review_class = tag['class'][1]
+        elif name == 'meta':
+            if product_description is None and tag.get('name') == 'description':
+                product_description = tag.get('content').strip()
+        elif name == 'ul':
+            if breadcrumb is None and 'breadcrumb' in tag.get('class', ()):
+                breadcrumb = tag
+        elif name == 'article':
+            if article is None and 'product_page' in tag.get('class', ()):
+                article = tag
+
+    # Extraire les informations requises
+    product_page_url = str(url)
+    universal_product_code = str(tds[0].string)
+    price_including_tax = str(tds[3].string)
+    price_excluding_tax = str(tds[2].string)
+    number_available = int(re.search(r'\d+', tds[5].string).group())
+    category = breadcrumb.find_all("li")[-2].find("a").text
+    review_rating = rating_mapping.get(review_class, None)
+    image_url = article.find("div").find("img").get("src")
+    image_url = url.rsplit('/', 2)[0] + '/' + image_url
+
+    # Retourner les données sous forme de dictionnaire
+    product_data = {
+        'product_page_url': product_page_url,
+        'universal_product_code': universal_product_code,
+        'title': title,
+        'price_including_tax': price_including_tax,
+        'price_excluding_tax': price_excluding_tax,
+        'number_available': number_available,
+        'product_description': product_description,
+        'category': category,
+        'review_rating': review_rating,
+        'image_url': image_url
+    }
+    return product_data
+
+
 def extract_product_info(url: str) -> dict:
     """_summary_ : Fonction pour extraire les informations d'une page d'un bouquin
 
@@ -33,57 +145,16 @@ def extract_product_info(url: str) -> dict:
         _dict_: Retourne les données du bouquin sous forme de dictionnaire
     """
 
-    # Utiliser requests pour obtenir le contenu HTML de la page
-    response = requests.get(url)
-    page = response.content
-
-    # Mapping des valeurs textuelles aux chiffres
-    rating_mapping = {
-        'One': 1,
-        'Two': 2,
-        'Three': 3,
-        'Four': 4,
-        'Five': 5
-    }
+    # Utiliser la session HTTP partagée pour obtenir le contenu HTML de la page
+    status_code, page, not_modified = fetch_page(url)
 
     # Vérifier si la requête s'est correctement déroulée
-    if response.status_code == 200:
-        # Créez un objet BeautifulSoup à partir du contenu HTML
-        soup = BeautifulSoup(page, 'html.parser')
-
-        # Extraire les informations requises
-        tds=soup.findAll('td')
-        product_page_url = str(url)
-        universal_product_code = tds[0].string
-        title=soup.h1.text
-        price_including_tax = tds[3].string
-        price_excluding_tax = tds[2].string
-        number_available = int(re.search(r'\d+', tds[5].string).group())
-        product_description = soup.find("meta", {"name": "description"}).get("content").strip()
-        category = soup.find("ul", class_="breadcrumb").find_all("li")[-2].find("a").text
-        #review_rating = soup.select_one('p.star-rating')['class'][1]
-        review_class = soup.find('p', class_='star-rating')['class'][1]
-        review_rating = rating_mapping.get(review_class, None)
-        image_url=soup.find('article', class_='product_page').find("div").find("img").get("src")
-        image_url = url.rsplit('/', 2)[0] + '/' + image_url
-        
-        # Retourner les données sous forme de dictionnaire
-        product_data = {
-            'product_page_url': product_page_url,
-            'universal_product_code': universal_product_code,
-            'title': title,
-            'price_including_tax': price_including_tax,
-            'price_excluding_tax': price_excluding_tax,
-            'number_available': number_available,
-            'product_description': product_description,
-            'category': category,
-            'review_rating': review_rating,
-            'image_url': image_url
-        }
-        return product_data
-    
+    if status_code == 200:
+        # Une page inchangée depuis le dernier passage n'est pas réanalysée
+        return parse_with_cache(url, page, not_modified, parse_product_page)
+
     else:
-        print("La requête a échoué avec le code :", response.status_code)
+        print("La requête a échoué avec le code :", status_code)
         return None
 
 
@@ -92,8 +163,13 @@ def main():
     # Configuration de argparse
     parser = argparse.ArgumentParser(description='Ce script visite une page produit spécifiée sur le site "http://books.toscrape.com", extrait les informations essentielles, puis les écrit dans un fichier CSV avec des en-têtes de colonnes appropriées.')
     parser.add_argument("url", help="URL de la page produit")
+    parser.add_argument("--report", metavar="FICHIER", help="Écrire le rapport JSON des mesures (requêtes, durées, volumes) dans ce fichier")
+    parser.add_argument("--profile", metavar="FICHIER", help="Enregistrer le profil cProfile de l'analyse de la page dans ce fichier")
     args = parser.parse_args()
 
+    if args.profile:
+        enable_profile()
+
     # URL de la page du produit
     url = args.url
 
@@ -116,5 +192,10 @@ def main():
     else:
         print("Impossible d'extraire les données du livre.")
 
+    if args.report:
+        get_metrics().write_report(args.report)
+    if args.profile:
+        write_profile(args.profile)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
-from scraping_p1 import extract_product_info
-import os
+from http_session import fetch_page
+from http_cache import parse_with_cache
+from parsers import make_soup
+from scraping_p1 import extract_product_info, rating_mapping, BOOK_FIELDS
+from bs4 import SoupStrainer
+from urllib.parse import urljoin
+from parse_pool import ParsePool
+from csv_writer import StreamingCsvWriter
+from metrics import get_metrics, enable_profile, write_profile, run_parse
+from typing import Iterable, Iterator
+import math
+import re
 import argparse
 
 
@@ -20,6 +27,10 @@ Date : 07/09/2023
 
     Input:
         URL(string): URL de la page de la catégorie des bouquins
+        --parse-workers(int) : Nombre de processus d'analyse des pages produit
+        --fields(str) : Champs à extraire, séparés par des virgules (par défaut tous)
+        --report(str) : Fichier du rapport JSON des mesures
+        --profile(str) : Fichier du profil cProfile de l'analyse des pages
 
     Output:
         category_books_data.csv : fichier CSV contenant les informations essentielles de tous les bouquins d'une catégorie donnée.
@@ -28,68 +39,253 @@ Date : 07/09/2023
 # URL de la page de catégorie de livres
 base_url = "http://books.toscrape.com/catalogue/category/books/mystery_3/page-1.html"
 
-def scrape_category_books(category_url: str) -> list[dict]:
-    """_summary_ : fonction qui va parcourir plusieurs pages de bouquins d'une catégorie d'ouvrage afin de récupérer certaines informations.
+# Champs des données d'un livre affichés sur les pages de catégorie. Le stock n'y est pas chiffré ("In stock") et
+# l'image est une miniature : les autres champs nécessitent la page produit.
+LISTING_FIELDS = ('product_page_url', 'title', 'price_including_tax', 'category', 'review_rating')
+
+# Éléments d'une page de catégorie conservés par parse_category_listing() : le nom de la catégorie, les livres et
+# la pagination
+listing_strainer = SoupStrainer(['h1', 'article', 'ul'])
+
+# Nombre de résultats de la catégorie et rang des livres affichés, en tête de chaque page de catégorie :
+# "<strong>45</strong> results - showing <strong>1</strong> to <strong>20</strong>."
+results_pattern = re.compile(rb'<strong>(\d+)</strong>\s*results?\b')
+showing_pattern = re.compile(rb'showing\s*<strong>(\d+)</strong>\s*to\s*<strong>(\d+)</strong>')
+next_link_pattern = re.compile(rb'<li class="next">\s*<a href="([^"]+)"')
+
+
+def check_fields(fields: Iterable[str]) -> None:
+    """_summary_ : Vérifie que les champs demandés font partie des données d'un livre.
 
     Args:
-        category_url (_type_): URL de la page web de la catégorie spécifiée
+        fields (Iterable[str]): Les noms des champs, parmi scraping_p1.BOOK_FIELDS.
+    """
+    unknown = set(fields) - set(BOOK_FIELDS)
+    if unknown:
+        raise ValueError(f"Champ inconnu : {', '.join(sorted(unknown))}")
+
+
+def listing_is_enough(fields: Iterable[str]) -> bool:
+    """_summary_ : Indique si les champs demandés sont tous affichés sur les pages de catégorie, auquel cas les
+    pages produit n'ont pas à être téléchargées.
+
+    Args:
+        fields (Iterable[str]): Les noms des champs, None pour tous les champs.
 
     Returns:
-        _list[dict]_: Une liste de dictionnaire qui contient les informations de tous les livres d'une catégorie donnée.
+        _bool_: True si les pages de catégorie suffisent.
     """
+    return fields is not None and set(fields) <= set(LISTING_FIELDS)
+
+
+def select_fields(book_data: dict, fields: Iterable[str]) -> dict:
+    """_summary_ : Ne conserve que les champs demandés des données d'un livre, dans l'ordre de BOOK_FIELDS.
 
-    all_books_data = []
-    while True:
-        response = requests.get(category_url)
-
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            h3_elements = soup.findAll('h3')
-            for h3_element in h3_elements:
-                link = h3_element.find('a')
-                product_url = link['href']           
-                product_data = extract_product_info(os.path.join(category_url.rsplit('/', 4)[0], product_url.split('/', 3)[3]))
-                all_books_data.append(product_data)
-
-            # Trouver le lien de la page suivante s'il existe
-            next_page = soup.find('li', class_='next')
-            if next_page:
-                next_page_link = next_page.find('a')
-                if next_page_link:
-                    next_page_url = os.path.join(os.path.split(category_url)[0], next_page_link['href'])
-                    category_url = next_page_url
+    Args:
+        book_data (dict): Les données du livre.
+        fields (Iterable[str]): Les noms des champs, None pour tous les champs.
+
+    Returns:
+        _dict_: Les données du livre réduites aux champs demandés.
+    """
+    if fields is None:
+        return book_data
+    return {name: book_data.get(name) for name in BOOK_FIELDS if name in fields}
+
+
+def parse_category_page(page: bytes, category_url: str) -> tuple[list[str], str]:
+    """_summary_ : fonction qui extrait d'une page de catégorie les URL des bouquins listés et l'URL de la page suivante.
+
+    Args:
+        page (bytes): Contenu HTML de la page de la catégorie
+        category_url (str): URL de la page de la catégorie
+
+    Returns:
+        _tuple[list[str], str]_: Les URL des pages produit et l'URL de la page suivante (None s'il n'y en a pas).
+    """
+    soup = make_soup(page)
+
+    product_urls = []
+    h3_elements = soup.find_all('h3')
+    for h3_element in h3_elements:
+        link = h3_element.find('a')
+        # Les liens sont relatifs à la page de catégorie ("../../../titre_1000/index.html")
+        product_urls.append(urljoin(category_url, link['href']))
+
+    # Trouver le lien de la page suivante s'il existe
+    next_page_url = None
+    next_page = soup.find('li', class_='next')
+    if next_page:
+        next_page_link = next_page.find('a')
+        if next_page_link:
+            next_page_url = urljoin(category_url, next_page_link['href'])
+
+    return product_urls, next_page_url
+
+def plan_category_pages(page: bytes, category_url: str) -> list[str]:
+    """_summary_ : fonction qui déduit de la première page d'une catégorie les URL de toutes ses pages, à partir du
+    nombre de résultats et du nombre de livres par page qui y sont affichés, afin de les télécharger en parallèle.
+
+    Args:
+        page (bytes): Contenu HTML de la première page de la catégorie
+        category_url (str): URL de la première page de la catégorie
+
+    Returns:
+        _list[str]_: Les URL des pages de la catégorie, dans l'ordre, ou None si elles ne peuvent pas être déduites
+        de la page (il faut alors suivre les liens "next" une page après l'autre).
+    """
+    results = results_pattern.search(page)
+    if results is None:
+        return None
+    count = int(results.group(1))
+    showing = showing_pattern.search(page)
+    if showing is not None:
+        page_size = int(showing.group(2)) - int(showing.group(1)) + 1
+    else:
+        # Catégorie d'une seule page : le rang des livres affichés n'est pas indiqué
+        page_size = page.count(b'class="product_pod"')
+    if page_size <= 0:
+        return None
+
+    page_urls = [category_url] + [urljoin(category_url, f"page-{number}.html") for number in range(2, math.ceil(count / page_size) + 1)]
+
+    # Les URL déduites doivent correspondre au lien "next" de la première page
+    next_link = next_link_pattern.search(page)
+    next_page_url = urljoin(category_url, next_link.group(1).decode()) if next_link else None
+    if next_page_url != (page_urls[1] if len(page_urls) > 1 else None):
+        return None
+    return page_urls
+
+def parse_category_listing(page: bytes, category_url: str) -> tuple[list[dict], str]:
+    """_summary_ : fonction qui extrait d'une page de catégorie les données des bouquins affichées dans la liste
+    (champs LISTING_FIELDS) et l'URL de la page suivante, sans passer par les pages produit.
+
+    Args:
+        page (bytes): Contenu HTML de la page de la catégorie
+        category_url (str): URL de la page de la catégorie
+
+    Returns:
+        _tuple[list[dict], str]_: Les données des livres de la page et l'URL de la page suivante (None s'il n'y en a pas).
+    """
+    soup = make_soup(page, parse_only=listing_strainer)
+
+    # Le titre de la page de catégorie est le nom de la catégorie, tel qu'il apparaît dans le fil d'Ariane des pages produit
+    header = soup.find('h1')
+    category = header.text.strip() if header else None
+
+    books_data = []
+    for article in soup.find_all('article', class_='product_pod'):
+        link = article.find('h3').find('a')
+        price = article.find('p', class_='price_color')
+        rating = article.find('p', class_='star-rating')
+        books_data.append({
+            'product_page_url': urljoin(category_url, link['href']),
+            'title': link.get('title', link.text),  # Le texte du lien est tronqué, pas l'attribut title
+            'price_including_tax': price.text if price else None,
+            'category': category,
+            'review_rating': rating_mapping.get(rating['class'][-1]) if rating else None,
+        })
+
+    next_page_url = None
+    next_page = soup.find('li', class_='next')
+    if next_page and next_page.find('a'):
+        next_page_url = urljoin(category_url, next_page.find('a')['href'])
+
+    return books_data, next_page_url
+
+def scrape_category_books(category_url: str, parse_workers: int = 0, fields: Iterable[str] = None) -> Iterator[dict]:
+    """_summary_ : générateur qui va parcourir plusieurs pages de bouquins d'une catégorie d'ouvrage afin de récupérer certaines informations.
+
+    Les données de chaque livre sont produites dès qu'elles sont extraites, sans conserver celles de toute la catégorie en mémoire.
+
+    Args:
+        category_url (_type_): URL de la page web de la catégorie spécifiée
+        parse_workers (int, optional): Nombre de processus d'analyse des pages produit. Avec 0, les pages sont analysées dans le processus courant. Defaults to 0.
+        fields (Iterable[str], optional): Champs à extraire, parmi scraping_p1.BOOK_FIELDS. Si tous sont affichés sur les pages de catégorie (LISTING_FIELDS), les pages produit ne sont pas téléchargées. Defaults to None (tous les champs).
+
+    Yields:
+        _dict_: Les informations de chaque livre de la catégorie donnée.
+    """
+
+    listing_only = listing_is_enough(fields)
+    parse_pool = ParsePool(parse_workers) if parse_workers and not listing_only else None
+    try:
+        while True:
+            status_code, page, not_modified = fetch_page(category_url)
+
+            if status_code != 200:
+                print("La requête a échoué avec le code :", status_code)
+                break
+
+            if listing_only:
+                # Les données des livres sont lues sur la page de catégorie elle-même
+                books_data, next_page_url = run_parse(parse_category_listing, page, category_url)
+                for book_data in books_data:
+                    yield select_fields(book_data, fields)
+            else:
+                product_urls, next_page_url = parse_with_cache(category_url, page, not_modified, parse_category_page)
+                if parse_pool is None:
+                    for product_url in product_urls:
+                        product_data = extract_product_info(product_url)
+                        if product_data:
+                            yield select_fields(product_data, fields)
+                else:
+                    # Télécharger les pages de la page de catégorie, puis les analyser en un lot dans le pool
+                    product_pages = []
+                    for product_url in product_urls:
+                        product_status_code, product_page, product_not_modified = fetch_page(product_url)
+                        if product_status_code == 200:
+                            product_pages.append((product_page, product_url, product_not_modified))
+                        else:
+                            print("La requête a échoué avec le code :", product_status_code)
+                    for product_data in parse_pool.parse(product_pages):
+                        yield select_fields(product_data, fields)
+
+            if next_page_url:
+                category_url = next_page_url
             else:
                 break  # Il n'y a plus de pages à parcourir
-        else:
-            print("La requête a échoué avec le code :", response.status_code)
-            break
-    
-    return all_books_data
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
 
 def main():
     # Configuration de argparse
     parser = argparse.ArgumentParser(description='Ce script visite une catégorie de livres spécifiée sur le site "http://books.toscrape.com", extrait les informations essentielles de chaque livre, puis les écrit dans un fichier CSV avec des en-têtes de colonnes appropriées.')
     parser.add_argument("url", help="URL de la page catégorie de livres. Exemple: http://books.toscrape.com/catalogue/category/books/mystery_3/index.html")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N", help="Nombre de processus d'analyse des pages produit (0 : analyse dans le processus courant)")
+    parser.add_argument("--fields", help="Champs à extraire, séparés par des virgules (par défaut tous). Exemple: title,price_including_tax,review_rating")
+    parser.add_argument("--report", metavar="FICHIER", help="Écrire le rapport JSON des mesures (requêtes, durées, volumes, pages/s) dans ce fichier")
+    parser.add_argument("--profile", metavar="FICHIER", help="Enregistrer le profil cProfile de l'analyse des pages dans ce fichier (analyse dans le processus courant)")
     args = parser.parse_args()
 
+    if args.profile:
+        # Le profil ne couvre que le processus courant : les pages n'y sont analysées qu'avec --parse-workers 0
+        enable_profile()
+        args.parse_workers = 0
+
+    # Champs demandés : sans page produit s'ils sont tous affichés sur les pages de catégorie
+    fields = args.fields.split(',') if args.fields else None
+    if fields:
+        check_fields(fields)
+
     # URL de la page de la catégorie des bouquins
     base_url = args.url
 
-    category_books_data = scrape_category_books(base_url)
-
-    if category_books_data:
-        # Écrivez les données dans un fichier CSV
-        with open('category_books_data.csv', 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = category_books_data[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            for book_data in category_books_data:
-                writer.writerow(book_data)
+    # Écrivez les données dans un fichier CSV au fur et à mesure de leur extraction
+    with StreamingCsvWriter('category_books_data.csv') as writer:
+        for book_data in scrape_category_books(base_url, args.parse_workers, fields):
+            writer.write(book_data)
 
+    if writer.rows_written:
         print("Les données des livres de la catégorie ont été écrites dans category_books_data.csv.")
     else:
         print("Aucune donnée de livre n'a été extraite.")
 
+    if args.report:
+        get_metrics().write_report(args.report)
+    if args.profile:
+        write_profile(args.profile)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
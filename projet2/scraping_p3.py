@@ -1,11 +1,21 @@
 import argparse
-import requests
-from bs4 import BeautifulSoup
-import csv
-from scraping_p2 import scrape_category_books
+from csv_writer import StreamingCsvWriter
+from sinks import CategorySink, category_csv_filename, check_sinks, SINKS, DEFAULT_SINKS
+from sqlite_sink import open_catalogue, close_catalogue, DEFAULT_DATABASE
+from metrics import reset_metrics, enable_profile, write_profile
+from typing import Iterable
+from crawler import CrawlEngine, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_PREFETCH_PAGES
+from http_session import create_client_session, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from parsers import make_soup, set_backend, get_backend, BACKENDS
+from scraping_p2 import check_fields, select_fields
+from http_cache import enable_cache, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE
+from rate_limiter import enable_rate_limiter, disable_rate_limiter, DEFAULT_RATE, DEFAULT_MIN_RATE, DEFAULT_MAX_RATE
+from crawl_journal import CrawlJournal, DEFAULT_JOURNAL_FILE
+from image_downloader import ImageDownloader, ImageQueue, DEFAULT_IMAGE_CONCURRENCY
+from image_store import ImageStore, require_pillow
+from urllib.parse import urljoin
 import os
 import asyncio
-import aiohttp
 
 
 """
@@ -22,11 +32,41 @@ Date : 07/09/2023
 
     Input:
         URL(string): URL des livres en ligne : http://books.toscrape.com/
+        --base-url(str) : URL de base du site, par exemple celle d'un serveur de rejeu (voir http_archive.py)
         --no-images(Booléan) : Désactiver le téléchargement d'images
+        --concurrency(int) : Nombre maximal de requêtes HTTP simultanées
+        --per-host(int) : Nombre maximal de requêtes HTTP simultanées vers un même hôte
+        --prefetch-pages(int) : Nombre de pages d'une catégorie téléchargées à la fois
+        --timeout(float) : Délai d'expiration d'une requête HTTP, en secondes
+        --retries(int) : Nombre de nouvelles tentatives sur erreur de connexion ou réponse 429 ou 5xx
+        --rate(float) : Débit initial par hôte, en requêtes par seconde (0 : pas de limite)
+        --min-rate(float) : Débit minimal par hôte, atteint après des erreurs ou des réponses 429
+        --max-rate(float) : Débit maximal par hôte, atteint tant que les réponses restent rapides
+        --incremental(Booléan) : Requêtes conditionnelles à travers le cache HTTP et réécriture des seuls CSV modifiés
+        --cache-dir(str) : Dossier du cache HTTP utilisé par --incremental
+        --cache-size(int) : Taille maximale du cache HTTP, en Mo
+        --parser(str) : Parseur HTML utilisé par BeautifulSoup (lxml s'il est installé, sinon html.parser)
+        --parse-workers(int) : Nombre de processus d'analyse des pages produit
+        --resume(Booléan) : Reprendre un crawl interrompu là où il s'est arrêté
+        --journal(str) : Fichier du journal de reprise
+        --image-concurrency(int) : Nombre maximal d'images téléchargées simultanément
+        --verify-images(Booléan) : Vérifier l'empreinte des images ajoutées ou modifiées depuis la vérification précédente
+        --thumbnail-size(int) : Taille des miniatures des images, en pixels (nécessite Pillow)
+        --fields(str) : Champs à extraire, séparés par des virgules (par défaut tous) ; sans page produit s'ils sont tous affichés sur les pages de catégorie
+        --sink(str) : Sortie des données, csv (par défaut), parquet ou sqlite, répétable
+        --database(str) : Base de données SQLite de la sortie sqlite
+        --report(str) : Fichier du rapport JSON des mesures du crawl
+        --profile(str) : Fichier du profil cProfile de l'analyse des pages
 
     Output:
         results_p3/*.csv : fichiers CSV contenant les informations essentielles de tous les bouquins de toutes les catégories données.
+        results_p3/books_parquet/<category_name>/part-0.parquet (avec --sink parquet) : jeu de données Parquet partitionné par catégorie.
+        results_p3/crawl_report.json : rapport des mesures du crawl (durées des requêtes et des analyses, volumes, échecs, pages/s par étape).
+        results_p3/books.sqlite (avec --sink sqlite) : catalogue SQLite des livres et historique de leurs prix et de leur stock.
         results_p4/images/<category_name>/*.jpg (optionnel) : fichiers JPG de tous les bouquins de toutes les catégories données.
+        results_p4/images/<category_name>/index.json (optionnel) : index UPC -> empreinte SHA-256 des images de la catégorie.
+        results_p4/images/objects/ (optionnel) : images stockées une seule fois par empreinte, dont les fichiers JPG des catégories sont des liens.
+        results_p4/images/thumbnails/<taille>/ (optionnel) : miniatures des images, avec --thumbnail-size.
 """
 
 # URL de base du site web à scraper
@@ -36,104 +76,393 @@ base_url = "http://books.toscrape.com/"
 results_folder_3 = "results_p3"
 results_folder_4= "results_p4"
 
+# Fichier du rapport des mesures du crawl, dans le dossier des résultats
+DEFAULT_REPORT_FILE = "crawl_report.json"
 
-async def download_image(session: aiohttp.ClientSession, image_url: str, image_path: str) -> None:
-    """_summary_:  Télécharge et enregistre une image depuis une URL.
+# Stockage des images par contenu, créé par get_image_store()
+_image_store = None
 
-    Args:
-        session (Objet): Session de type aiohttp.ClientSession pour effectuer les requêtes HTTP asynchrones.
-        image_url (str): L'URL de l'image à télécharger.
-        image_path (str): Le chemin de destination où l'image sera enregistrée localement.
-    """
-    async with session.get(image_url) as response:
-        if response.status == 200:
-            with open(image_path, 'wb') as image_file:
-                image_file.write(await response.read())
-                print(f"L'image {image_path} a été téléchargée avec succès.")
-        else:
-            print(f"Échec du téléchargement de l'image {image_path} depuis {image_url}")
 
-async def download_product_images_async(data: list[dict], category_name: str) -> None:
-    """_summary_ : Télécharge et enregistre les images des produits de la catégorie donnée.
+def get_image_store() -> ImageStore:
+    """_summary_ : Retourne le stockage des images par contenu (voir image_store.py), dans results_p4/images."""
+    global _image_store
+    if _image_store is None:
+        _image_store = ImageStore(os.path.join(results_folder_4, "images"))
+    return _image_store
+
+
+def product_images(data: list[dict], category_name: str, journal: CrawlJournal = None) -> list[tuple[str, str]]:
+    """_summary_ : Retourne les images des produits de la catégorie donnée qui restent à télécharger.
 
     Args:
         data (list[dict]): Une liste de dictionnaires contenant les données des produits, y compris les URL des images.
         category_name (str): Le nom de la catégorie actuellement traitée.
+        journal (CrawlJournal, optional): Journal de reprise : les images qui y sont enregistrées sont ignorées.
+
+    Returns:
+        _list[tuple[str, str]]_: L'URL et le chemin de destination de chaque image.
     """
     image_folder = os.path.join(results_folder_4, "images", category_name)
     if not os.path.exists(image_folder):
         os.makedirs(image_folder)
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for book_data in data:
-            image_url = book_data["image_url"]
-            image_name = book_data["universal_product_code"] + ".jpg"  # Nommez l'image en utilisant le code produit universel
-            image_path = os.path.join(image_folder, image_name)
-            tasks.append(download_image(session, image_url, image_path))
+    images = []
+    for book_data in data:
+        image_url = book_data["image_url"]
+        image_name = book_data["universal_product_code"] + ".jpg"  # Nommez l'image en utilisant le code produit universel
+        image_path = os.path.join(image_folder, image_name)
+        if journal is not None and journal.has_image(image_path):
+            continue
+        images.append((image_url, image_path))
+    return images
+
+
+async def download_product_images_async(data: list[dict], category_name: str, downloader: ImageDownloader = None, journal: CrawlJournal = None) -> None:
+    """_summary_ : Télécharge et enregistre les images des produits de la catégorie donnée.
+
+    Args:
+        data (list[dict]): Une liste de dictionnaires contenant les données des produits, y compris les URL des images.
+        category_name (str): Le nom de la catégorie actuellement traitée.
+        downloader (ImageDownloader, optional): Téléchargeur d'images partagé, qui borne le nombre de téléchargements
+            simultanés. Un téléchargeur et sa session sont créés s'il n'est pas fourni.
+        journal (CrawlJournal, optional): Journal de reprise : les images qui y sont enregistrées ne sont pas
+            retéléchargées et les nouvelles images y sont ajoutées.
+    """
+    if downloader is None:
+        async with create_client_session() as session:
+            await download_product_images_async(data, category_name, ImageDownloader(session, store=get_image_store()), journal)
+        return
+
+    images = product_images(data, category_name, journal)
+    results = await downloader.download_all(images)
+    if downloader.store is not None:
+        downloader.store.save(force=True)
+    if journal is not None:
+        for (_, image_path), downloaded in zip(images, results):
+            if downloaded:
+                journal.add_image(image_path)
 
-        await asyncio.gather(*tasks)
+
+def parse_category_links(page: bytes, base_url: str) -> list[tuple[str, str]]:
+    """_summary_ : Extrait les catégories de livres du menu de navigation de la page d'accueil.
+
+    Args:
+        page (bytes): Contenu HTML de la page d'accueil
+        base_url (str): L'URL de base du site web
+
+    Returns:
+        _list[tuple[str, str]]_: Le nom et l'URL de chaque catégorie, hors catégorie "Books".
+    """
+    soup = make_soup(page)
+
+    # Trouver tous les liens de catégories de livres dans le menu de navigation
+    category_links = soup.find('ul', class_='nav').findAll('a')
+
+    categories = []
+    for category_link in category_links:
+        category_url = urljoin(base_url, category_link['href'])
+
+        # Extraire le nom de la catégorie à partir de l'URL
+        category_name = category_url.split('/')[-2].split("_")[0]
+
+        # Exclure la catégorie "Books"
+        if category_name.lower() == "books":
+            continue
+        categories.append((category_name, category_url))
+    return categories
+
+
+def write_category_csv(category_books_data: Iterable[dict], category_name: str, results_folder_3: str, incremental: bool = False) -> str:
+    """_summary_ : Écrit les données des livres d'une catégorie dans un fichier CSV distinct, au fur et à mesure.
+
+    Args:
+        category_books_data (Iterable[dict]): Les données des livres de la catégorie (liste ou générateur).
+        category_name (str): Le nom de la catégorie.
+        results_folder_3 (str): Le dossier de destination où le fichier CSV sera enregistré.
+        incremental (bool, optional): Ne pas réécrire le fichier si son contenu est inchangé. Defaults to False.
+
+    Returns:
+        _str_: Le chemin du fichier CSV écrit, ou None si le fichier existant était déjà à jour ou s'il n'y avait aucune donnée.
+    """
+    csv_filename = category_csv_filename(category_name, results_folder_3)
+    writer = StreamingCsvWriter(csv_filename, incremental=incremental)
+    for book_data in category_books_data:
+        writer.write(book_data)
+    return csv_filename if writer.close() else None
 
 
-def scrape_all_category_books(base_url: str, results_folder_3: str, download_images: bool = True) -> None:
+async def scrape_category_async(engine: CrawlEngine, category_name: str, category_url: str, results_folder_3: str, download_images: bool, incremental: bool = False, journal: CrawlJournal = None, images: ImageQueue = None, sinks: tuple[str] = DEFAULT_SINKS, fields: tuple[str] = None) -> None:
+    """_summary_ : Extrait les données d'une catégorie et les écrit au fur et à mesure dans son fichier CSV (ou dans
+    les sorties choisies), en téléchargeant les images par lots.
+
+    Seuls les livres des pages de catégorie en cours de traitement (voir CrawlEngine.prefetch_pages) sont conservés
+    en mémoire à la fois, quelle que soit la taille de la catégorie.
+
+    Args:
+        engine (CrawlEngine): Le moteur de crawl partagé.
+        category_name (str): Le nom de la catégorie.
+        category_url (str): L'URL de la catégorie.
+        results_folder_3 (str): Le dossier de destination où le fichier CSV sera enregistré.
+        download_images (bool): Active ou désactive le téléchargement des images.
+        incremental (bool, optional): Ne réécrire le fichier CSV que si son contenu a changé. Defaults to False.
+        journal (CrawlJournal, optional): Journal de reprise du crawl. Les pages de catégorie déjà traitées ne sont
+            pas retéléchargées. Defaults to None.
+        images (ImageQueue, optional): File d'attente des téléchargements d'images, partagée entre les catégories et
+            vidée en tâche de fond. Sans file d'attente, les images de chaque page sont téléchargées avant de passer
+            à la page suivante. Defaults to None.
+        sinks (tuple[str], optional): Les sorties des données, parmi sinks.SINKS. Defaults to DEFAULT_SINKS.
+        fields (tuple[str], optional): Les champs écrits, parmi scraping_p1.BOOK_FIELDS. Defaults to None (tous les
+            champs).
+    """
+    # Champs nécessaires au crawl : ceux demandés, plus l'URL et le code UPC des images à télécharger
+    needed_fields = None
+    if fields is not None:
+        needed_fields = set(fields) | ({'image_url', 'universal_product_code'} if download_images else set())
+
+    if journal is None:
+        journal = CrawlJournal(None)  # Journal conservé en mémoire uniquement
+    if journal.is_category_done(category_name):
+        print(f"La catégorie {category_name} a déjà été traitée")
+        return
+
+    with CategorySink(category_name, results_folder_3, sinks, incremental, journal.csv_offset(category_name)) as writer:
+        # Les pages déjà traitées ne sont sautées que si les lignes écrites jusqu'à elles sont conservées
+        done_pages = journal.done_pages(category_name) if writer.keeps_done_pages else None
+        # Les pages traitées forment un début de la catégorie : elle est complète si la dernière page en fait partie
+        complete = done_pages is not None and None in done_pages.values()
+        # Appeler la fonction pour extraire les données de la catégorie, page par page
+        async for page_url, next_page_url, books_data in engine.scrape_category_pages(category_url, done_pages, needed_fields):
+            for book_data in books_data:
+                writer.write(select_fields(book_data, fields))
+            if download_images and images is None:  # Vérification de l'option pour télécharger les images
+                await download_product_images_async(books_data, category_name, ImageDownloader(engine.session, store=get_image_store()), journal)
+            elif download_images:
+                # Les images sont téléchargées en tâche de fond pendant l'extraction des pages suivantes
+                for image_url, image_path in product_images(books_data, category_name, journal):
+                    journal.add_pending_image(image_url, image_path)
+                    await images.put(image_url, image_path)
+            # La page n'est enregistrée dans le journal qu'une fois ses lignes écrites sur le disque
+            journal.mark_page_done(category_name, page_url, next_page_url, books_data, writer.tell())
+            complete = next_page_url is None
+        changed = writer.close()
+    # Une catégorie interrompue par l'échec d'une page reste ouverte : --resume reprendra à la page suivante
+    if complete:
+        journal.mark_category_done(category_name)
+    else:
+        print(f"La catégorie {category_name} n'a pas pu être entièrement extraite")
+
+    if changed:
+        print(f"Les données des livres de la catégorie {category_name} ont été écrites dans {', '.join(writer.paths)}")
+    elif writer.rows_written or writer.resume_offset:
+        print(f"Les données des livres de la catégorie {category_name} sont inchangées")
+    else:
+        print(f"Aucune donnée de livre n'a été extraite pour la catégorie {category_name}")
+
+
+async def scrape_all_category_books_async(base_url: str, results_folder_3: str, download_images: bool = True, **kwargs) -> None:
+    """_summary_ : Extrait en parallèle les données de livres de toutes les catégories du site web.
+
+    Args:
+        base_url (str): L'URL de base du site web à partir duquel les catégories de livres sont extraites.
+        results_folder_3 (str): Le dossier de destination où les fichiers CSV seront enregistrés.
+        download_images (bool, optional): Active ou désactive le téléchargement des images. Defaults to True.
+        **kwargs: Options du crawl, voir scrape_all_category_books().
+    """
+    engine = CrawlEngine(
+        kwargs.get('concurrency', DEFAULT_CONCURRENCY),
+        kwargs.get('per_host', DEFAULT_PER_HOST),
+        kwargs.get('timeout', DEFAULT_TIMEOUT),
+        kwargs.get('retries', DEFAULT_RETRIES),
+        kwargs.get('parse_workers', 0),
+        kwargs.get('prefetch_pages', DEFAULT_PREFETCH_PAGES),
+    )
+    async with engine:
+        page, _ = await engine.fetch(base_url)
+        if page is None:
+            print("La requête a échoué pour la page d'accueil")
+            return
+
+        categories = parse_category_links(page, base_url)
+        journal = CrawlJournal(kwargs.get('journal', DEFAULT_JOURNAL_FILE), resume=kwargs.get('resume', False))
+        image_concurrency = kwargs.get('image_concurrency', DEFAULT_IMAGE_CONCURRENCY)
+        downloader = ImageDownloader(engine.session, image_concurrency, store=get_image_store())
+
+        def on_image_done(image_path: str, downloaded: bool) -> None:
+            if downloaded:
+                journal.add_image(image_path)
+
+        # Une seule file d'attente d'images pour tout le crawl, vidée pendant l'extraction des catégories
+        async with ImageQueue(downloader, image_concurrency, on_done=on_image_done) as images:
+            if download_images:
+                # Reprise : images mises en file d'attente lors du crawl interrompu mais jamais écrites
+                for image_url, image_path in journal.pending_images():
+                    await images.put(image_url, image_path)
+            await asyncio.gather(*(
+                scrape_category_async(engine, category_name, category_url, results_folder_3, download_images, kwargs.get('incremental', False), journal, images, kwargs.get('sinks', DEFAULT_SINKS), kwargs.get('fields'))
+                for category_name, category_url in categories
+            ))
+            if download_images:
+                print("Attente de la fin des téléchargements d'images...")
+        get_image_store().save(force=True)
+        if all(journal.is_category_done(category_name) for category_name, _ in categories):
+            # Le crawl est terminé : le journal n'est plus utile
+            journal.remove()
+        else:
+            journal.save(force=True)
+            print(f"Des pages n'ont pas pu être extraites : relancer le crawl avec --resume pour les reprendre (journal {journal.path})")
+
+
+def scrape_all_category_books(base_url: str, results_folder_3: str, download_images: bool = True, **kwargs) -> None:
     """_summary_ : Extrait les données de livres de toutes les catégories du site web.
 
     Args:
         base_url (str): L'URL de base du site web à partir duquel les catégories de livres sont extraites.
         results_folder_3 (str): Le dossier de destination où les fichiers CSV seront enregistrés.
         download_images (bool, optional): Un paramètre optionnel qui détermine si le téléchargement des images doit être activé ou désactivé. Defaults to True.
+        **kwargs: Options du crawl :
+            concurrency (int): Nombre maximal de requêtes simultanées. Defaults to DEFAULT_CONCURRENCY.
+            per_host (int): Nombre maximal de requêtes simultanées par hôte. Defaults to DEFAULT_PER_HOST.
+            prefetch_pages (int): Nombre de pages d'une catégorie téléchargées et traitées à la fois, lorsque leurs
+                URL sont déduites de la première page. Defaults to DEFAULT_PREFETCH_PAGES.
+            timeout (float): Délai d'expiration d'une requête, en secondes. Defaults to DEFAULT_TIMEOUT.
+            retries (int): Nombre de nouvelles tentatives sur erreur. Defaults to DEFAULT_RETRIES.
+            rate (float): Débit initial par hôte des pages et des images, en requêtes par seconde, adapté pendant le
+                crawl (voir rate_limiter.py), 0 pour ne pas limiter le débit. Defaults to DEFAULT_RATE.
+            min_rate (float): Débit minimal par hôte. Defaults to DEFAULT_MIN_RATE.
+            max_rate (float): Débit maximal par hôte. Defaults to DEFAULT_MAX_RATE.
+            incremental (bool): Requêtes conditionnelles à travers le cache HTTP et réécriture des seuls CSV
+                modifiés. Defaults to False.
+            cache_dir (str): Dossier du cache HTTP. Defaults to DEFAULT_CACHE_DIR.
+            cache_size (int): Taille maximale du cache HTTP, en octets. Defaults to DEFAULT_MAX_SIZE.
+            parser (str): Parseur HTML, "lxml" ou "html.parser". Defaults to parsers.DEFAULT_BACKEND.
+            parse_workers (int): Nombre de processus d'analyse des pages produit, 0 pour analyser les pages dans la
+                boucle d'événements. Defaults to 0.
+            resume (bool): Reprendre un crawl interrompu à partir de son journal. Defaults to False.
+            journal (str): Fichier du journal de reprise. Defaults to DEFAULT_JOURNAL_FILE.
+            image_concurrency (int): Nombre maximal d'images téléchargées simultanément. Defaults to
+                DEFAULT_IMAGE_CONCURRENCY.
+            verify_images (bool): Vérifier l'empreinte des images ajoutées ou modifiées depuis la vérification
+                précédente avant le crawl. Defaults to False.
+            thumbnail_size (int): Taille des miniatures générées après le crawl, en pixels (nécessite Pillow), 0
+                pour ne pas en générer. Defaults to 0.
+            sinks (tuple[str]): Sorties des données, parmi sinks.SINKS : "csv" (un fichier CSV par catégorie),
+                "parquet" (jeu de données Parquet partitionné par catégorie, nécessite pyarrow), "sqlite" (catalogue
+                SQLite avec l'historique des prix). Defaults to DEFAULT_SINKS.
+            fields (tuple[str]): Champs écrits, parmi scraping_p1.BOOK_FIELDS. Si ceux-ci (et ceux des images) sont
+                tous affichés sur les pages de catégorie, les pages produit ne sont pas téléchargées. Defaults to None
+                (tous les champs).
+            database (str): Base de données de la sortie sqlite. Defaults to results_folder_3/DEFAULT_DATABASE.
+            report (str): Fichier du rapport JSON des mesures du crawl (voir metrics.py). Defaults to
+                results_folder_3/DEFAULT_REPORT_FILE.
+            profile (str): Fichier du profil cProfile de l'analyse des pages, None pour ne pas profiler. Les pages
+                sont alors analysées dans le processus courant. Defaults to None.
     """
     if not os.path.exists(results_folder_3):
         os.makedirs(results_folder_3)
-    response = requests.get(base_url)
-
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Trouver tous les liens de catégories de livres dans le menu de navigation
-        category_links = soup.find('ul', class_='nav').findAll('a')
-        
-        for category_link in category_links:
-            category_url = os.path.join(base_url, category_link['href'])
-            
-            # Extraire le nom de la catégorie à partir de l'URL
-            category_name = category_url.split('/')[-2].split("_")[0]
-
-            # Exclure la catégorie "Books"
-            if category_name.lower() == "books":
-                continue
-            
-            # Appeler la fonction pour extraire les données de la catégorie
-            category_books_data = scrape_category_books(category_url)
-
-            if category_books_data:
-                # Écrivez les données dans un fichier CSV distinct pour chaque catégorie
-                csv_filename = os.path.join(results_folder_3, f"{category_name}_books_data.csv")
-                with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    fieldnames = category_books_data[0].keys()
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-                    writer.writeheader()
-                    for book_data in category_books_data:
-                        writer.writerow(book_data)
-
-                print(f"Les données des livres de la catégorie {category_name} ont été écrites dans {csv_filename}")
-                if download_images:  # Vérification de l'option pour télécharger les images
-                    # Appeler la fonction pour télécharger et enregistrer les images
-                    asyncio.run(download_product_images_async(category_books_data, category_name))
-
-            else:
-                print(f"Aucune donnée de livre n'a été extraite pour la catégorie {category_name}")
 
+    if kwargs.get('parser'):
+        set_backend(kwargs['parser'])
+
+    if kwargs.get('fields') is not None:
+        check_fields(kwargs['fields'])
+    check_sinks(kwargs.get('sinks', DEFAULT_SINKS), kwargs.get('fields'))
+    # Pillow est vérifiée avant le crawl, pour ne pas échouer après celui-ci sans écrire le rapport
+    if download_images and kwargs.get('thumbnail_size'):
+        require_pillow()
+
+    if kwargs.get('incremental', False):
+        enable_cache(kwargs.get('cache_dir', DEFAULT_CACHE_DIR), kwargs.get('cache_size', DEFAULT_MAX_SIZE))
+
+    if kwargs.get('rate', DEFAULT_RATE):
+        limiter = enable_rate_limiter(kwargs.get('rate', DEFAULT_RATE), kwargs.get('min_rate', DEFAULT_MIN_RATE), kwargs.get('max_rate', DEFAULT_MAX_RATE))
     else:
-        print(f"La requête a échoué avec le code {response.status_code} pour la page d'accueil")
+        limiter = disable_rate_limiter()
+
+    if download_images and kwargs.get('verify_images', False):
+        corrupted = get_image_store().verify()
+        print(f"Vérification des images : {len(corrupted)} image(s) corrompue(s) seront retéléchargées")
+
+    metrics = reset_metrics()
+    if kwargs.get('profile'):
+        # Le profil ne couvre que le processus courant : les pages n'y sont analysées qu'avec parse_workers à 0
+        enable_profile()
+        kwargs['parse_workers'] = 0
+
+    if "sqlite" in kwargs.get('sinks', DEFAULT_SINKS):
+        open_catalogue(kwargs.get('database') or os.path.join(results_folder_3, DEFAULT_DATABASE))
+    try:
+        asyncio.run(scrape_all_category_books_async(base_url, results_folder_3, download_images, **kwargs))
+    finally:
+        close_catalogue()
+
+    if download_images and kwargs.get('thumbnail_size'):
+        count = get_image_store().build_thumbnails(kwargs['thumbnail_size'], kwargs.get('parse_workers') or None)
+        print(f"{count} miniature(s) de {kwargs['thumbnail_size']} pixels générée(s)")
+
+    if limiter is not None:
+        print(f"Débit par hôte en fin de crawl (requêtes/s) : {limiter.rates()}")
+    metrics.write_report(kwargs.get('report') or os.path.join(results_folder_3, DEFAULT_REPORT_FILE))
+    if kwargs.get('profile'):
+        write_profile(kwargs['profile'])
 
 def main():
     parser = argparse.ArgumentParser(description="Scraping des données de livres de toutes les catégories du site http://books.toscrape.com/ avec option de téléchargement d'images")
+    parser.add_argument("--base-url", default=base_url, help="URL de base du site (par exemple un serveur de rejeu, voir http_archive.py)")
     parser.add_argument("--no-images", dest="download_images", action="store_false", help="Désactiver le téléchargement d'images")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, metavar="N", help="Nombre maximal de requêtes HTTP simultanées")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, metavar="N", help="Nombre maximal de requêtes HTTP simultanées vers un même hôte")
+    parser.add_argument("--prefetch-pages", type=int, default=DEFAULT_PREFETCH_PAGES, metavar="N", help="Nombre de pages d'une catégorie téléchargées à la fois")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, metavar="SECONDES", help="Délai d'expiration d'une requête HTTP")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, metavar="N", help="Nombre de nouvelles tentatives sur erreur de connexion ou réponse 429 ou 5xx")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, metavar="REQ/S", help="Débit initial par hôte, adapté pendant le crawl (0 : pas de limite)")
+    parser.add_argument("--min-rate", type=float, default=DEFAULT_MIN_RATE, metavar="REQ/S", help="Débit minimal par hôte")
+    parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE, metavar="REQ/S", help="Débit maximal par hôte")
+    parser.add_argument("--incremental", action="store_true", help="Requêtes conditionnelles à travers le cache HTTP et réécriture des seuls CSV modifiés")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Dossier du cache HTTP utilisé par --incremental")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_SIZE // (1024 * 1024), metavar="MO", help="Taille maximale du cache HTTP, en Mo")
+    parser.add_argument("--parser", choices=BACKENDS, default=get_backend(), help="Parseur HTML utilisé par BeautifulSoup")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N", help="Nombre de processus d'analyse des pages produit (0 : analyse dans la boucle d'événements)")
+    parser.add_argument("--resume", action="store_true", help="Reprendre un crawl interrompu là où il s'est arrêté")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_FILE, help="Fichier du journal de reprise")
+    parser.add_argument("--image-concurrency", type=int, default=DEFAULT_IMAGE_CONCURRENCY, metavar="N", help="Nombre maximal d'images téléchargées simultanément")
+    parser.add_argument("--verify-images", action="store_true", help="Vérifier les images ajoutées ou modifiées depuis la vérification précédente")
+    parser.add_argument("--thumbnail-size", type=int, default=0, metavar="PIXELS", help="Générer des miniatures des images de cette taille (nécessite Pillow)")
+    parser.add_argument("--fields", help="Champs à extraire, séparés par des virgules (par défaut tous). Exemple: title,price_including_tax,review_rating")
+    parser.add_argument("--sink", dest="sinks", action="append", choices=SINKS, help="Sortie des données, répétable (csv par défaut ; parquet nécessite pyarrow)")
+    parser.add_argument("--database", help=f"Base de données de la sortie sqlite (par défaut {results_folder_3}/{DEFAULT_DATABASE})")
+    parser.add_argument("--report", metavar="FICHIER", help=f"Fichier du rapport JSON des mesures du crawl (par défaut {results_folder_3}/{DEFAULT_REPORT_FILE})")
+    parser.add_argument("--profile", metavar="FICHIER", help="Enregistrer le profil cProfile de l'analyse des pages dans ce fichier (analyse dans le processus courant)")
     args = parser.parse_args()
 
     # Appeler la fonction principale pour extraire les données
-    scrape_all_category_books(base_url, results_folder_3, download_images=args.download_images)
+    scrape_all_category_books(
+        args.base_url,
+        results_folder_3,
+        download_images=args.download_images,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        prefetch_pages=args.prefetch_pages,
+        timeout=args.timeout,
+        retries=args.retries,
+        rate=args.rate,
+        min_rate=args.min_rate,
+        max_rate=args.max_rate,
+        incremental=args.incremental,
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size * 1024 * 1024,
+        parser=args.parser,
+        parse_workers=args.parse_workers,
+        resume=args.resume,
+        journal=args.journal,
+        image_concurrency=args.image_concurrency,
+        verify_images=args.verify_images,
+        thumbnail_size=args.thumbnail_size,
+        fields=tuple(args.fields.split(',')) if args.fields else None,
+        sinks=tuple(args.sinks or DEFAULT_SINKS),
+        database=args.database,
+        report=args.report,
+        profile=args.profile,
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+from csv_writer import StreamingCsvWriter
+from parquet_export import ParquetCategoryWriter, DATASET_FOLDER, require_pyarrow
+from sqlite_sink import SqliteCategoryWriter, get_catalogue
+
+
+"""
+Description : Sorties des données de livres de scraping_p3.py. Les données d'une catégorie peuvent être écrites dans
+              plusieurs sorties à la fois : fichiers CSV par catégorie (sortie par défaut), jeu de données Parquet
+              partitionné par catégorie (voir parquet_export.py) et catalogue SQLite (voir sqlite_sink.py).
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Sorties disponibles
+SINKS = ("csv", "parquet", "sqlite")
+
+# Sortie utilisée si aucune n'est choisie
+DEFAULT_SINKS = ("csv",)
+
+
+def category_csv_filename(category_name: str, results_folder_3: str) -> str:
+    """_summary_ : Retourne le chemin du fichier CSV d'une catégorie."""
+    return os.path.join(results_folder_3, f"{category_name}_books_data.csv")
+
+
+def check_sinks(sinks: tuple[str], fields: tuple[str] = None) -> None:
+    """_summary_ : Vérifie, avant le crawl, que les sorties choisies existent et que leurs dépendances sont installées.
+
+    Args:
+        sinks (tuple[str]): Les sorties, parmi SINKS.
+        fields (tuple[str], optional): Les champs extraits (option --fields), None pour tous les champs.
+    """
+    unknown = set(sinks) - set(SINKS)
+    if unknown:
+        raise ValueError(f"Sortie inconnue : {', '.join(sorted(unknown))}")
+    if "parquet" in sinks:
+        require_pyarrow()
+    if "sqlite" in sinks and fields is not None and not {'universal_product_code', 'product_page_url'} <= set(fields):
+        # Les livres du catalogue sont identifiés par leur code UPC
+        raise ValueError("La sortie sqlite nécessite les champs universal_product_code et product_page_url")
+
+
+class CategorySink:
+    """_summary_ : Écrit les données des livres d'une catégorie dans chacune des sorties choisies.
+
+    La reprise d'une catégorie écrite en partie (resume_offset, voir crawl_journal.py) n'est possible qu'avec les
+    sorties CSV et SQLite : avec la sortie Parquet, la catégorie est réécrite depuis le début. La sortie SQLite
+    utilise le catalogue ouvert par sqlite_sink.open_catalogue().
+
+    Args:
+        category_name (str): Le nom de la catégorie.
+        results_folder_3 (str): Le dossier des résultats.
+        sinks (tuple[str], optional): Les sorties, parmi SINKS. Defaults to DEFAULT_SINKS.
+        incremental (bool, optional): Ne pas réécrire les fichiers dont le contenu est inchangé. Defaults to False.
+        resume_offset (int, optional): Taille du fichier CSV lors de la dernière page traitée. Defaults to 0.
+    """
+
+    def __init__(self, category_name: str, results_folder_3: str, sinks: tuple[str] = DEFAULT_SINKS, incremental: bool = False, resume_offset: int = 0) -> None:
+        check_sinks(sinks)
+        if "parquet" in sinks:
+            resume_offset = 0
+
+        self.csv_writer = None
+        self.writers = []
+        self.paths = []
+        if "csv" in sinks:
+            csv_filename = category_csv_filename(category_name, results_folder_3)
+            self.csv_writer = StreamingCsvWriter(csv_filename, incremental=incremental, resume_offset=resume_offset)
+            self.writers.append(self.csv_writer)
+            self.paths.append(csv_filename)
+        if "parquet" in sinks:
+            writer = ParquetCategoryWriter(os.path.join(results_folder_3, DATASET_FOLDER), category_name, incremental=incremental)
+            self.writers.append(writer)
+            self.paths.append(writer.filename)
+        if "sqlite" in sinks:
+            if get_catalogue() is None:
+                raise ValueError("Le catalogue SQLite n'est pas ouvert (sqlite_sink.open_catalogue)")
+            writer = SqliteCategoryWriter(get_catalogue())
+            self.writers.append(writer)
+            self.paths.append(writer.path)
+        self.parquet = "parquet" in sinks
+        self.resume_offset = self.csv_writer.resume_offset if self.csv_writer else 0
+
+    def __enter__(self) -> "CategorySink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def keeps_done_pages(self) -> bool:
+        """_summary_ : Indique si les lignes des pages déjà traitées sont conservées par toutes les sorties, auquel
+        cas ces pages n'ont pas à être retraitées lors d'une reprise.
+        """
+        if self.parquet:
+            return False
+        return self.csv_writer is None or self.csv_writer.resume_offset > 0
+
+    @property
+    def rows_written(self) -> int:
+        """_summary_ : Nombre de lignes écrites dans chaque sortie."""
+        return self.writers[0].rows_written
+
+    def write(self, book_data: dict) -> None:
+        """_summary_ : Écrit les données d'un livre dans chaque sortie."""
+        for writer in self.writers:
+            writer.write(book_data)
+
+    def tell(self) -> int:
+        """_summary_ : Écrit les lignes en attente dans chaque sortie et retourne la taille du fichier CSV (0 sans
+        sortie CSV).
+        """
+        offsets = [writer.tell() for writer in self.writers]
+        return offsets[0] if self.csv_writer else 0
+
+    def close(self) -> bool:
+        """_summary_ : Ferme chaque sortie.
+
+        Returns:
+            _bool_: True si au moins une sortie a été écrite ou modifiée.
+        """
+        changed = [writer.close() for writer in self.writers]
+        return any(changed)
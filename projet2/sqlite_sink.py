@@ -0,0 +1,251 @@
+import sqlite3
+from datetime import datetime, timezone
+from scraping_p1 import parse_price, BOOK_FIELDS
+
+
+"""
+Description : Catalogue SQLite des livres, alimenté par scraping_p3.py avec l'option --sink sqlite. La table books
+              contient une ligne par livre, identifiée par son code UPC et mise à jour à chaque crawl ; la table
+              price_history ne reçoit une ligne que lorsque le prix ou le stock d'un livre change, ce qui permet de
+              suivre l'évolution des prix sans relire les fichiers CSV de chaque crawl.
+
+              Les lignes sont écrites par lots (executemany) dans une transaction par lot.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# Base de données par défaut, dans le dossier des résultats
+DEFAULT_DATABASE = "books.sqlite"
+
+# Nombre de livres écrits par transaction
+DEFAULT_BATCH_SIZE = 500
+
+# Catalogue partagé, ouvert par open_catalogue()
+_catalogue = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    universal_product_code TEXT PRIMARY KEY,
+    product_page_url TEXT NOT NULL,
+    title TEXT,
+    price_including_tax REAL,
+    price_excluding_tax REAL,
+    number_available INTEGER,
+    product_description TEXT,
+    category TEXT,
+    review_rating INTEGER,
+    image_url TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS price_history (
+    universal_product_code TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    price_including_tax REAL,
+    price_excluding_tax REAL,
+    number_available INTEGER,
+    PRIMARY KEY (universal_product_code, recorded_at)
+);
+CREATE INDEX IF NOT EXISTS books_category ON books (category);
+CREATE INDEX IF NOT EXISTS books_review_rating ON books (review_rating);
+"""
+
+# Champs suivis par la table price_history
+HISTORY_FIELDS = ('price_including_tax', 'price_excluding_tax', 'number_available')
+
+# Ligne d'historique ajoutée uniquement pour un nouveau livre ou si son prix ou son stock a changé
+INSERT_HISTORY = """
+INSERT OR IGNORE INTO price_history
+    (universal_product_code, recorded_at, price_including_tax, price_excluding_tax, number_available)
+SELECT :universal_product_code, :seen_at, :price_including_tax, :price_excluding_tax, :number_available
+WHERE NOT EXISTS (
+    SELECT 1 FROM books
+    WHERE universal_product_code = :universal_product_code
+      AND price_including_tax IS :price_including_tax
+      AND price_excluding_tax IS :price_excluding_tax
+      AND number_available IS :number_available
+)
+"""
+
+# Mise à jour d'un livre : un champ absent (option --fields) conserve la valeur enregistrée
+UPSERT_BOOK = """
+INSERT INTO books (
+    universal_product_code, product_page_url, title, price_including_tax, price_excluding_tax, number_available,
+    product_description, category, review_rating, image_url, first_seen, last_seen
+) VALUES (
+    :universal_product_code, :product_page_url, :title, :price_including_tax, :price_excluding_tax, :number_available,
+    :product_description, :category, :review_rating, :image_url, :seen_at, :seen_at
+)
+ON CONFLICT (universal_product_code) DO UPDATE SET
+    product_page_url = excluded.product_page_url,
+    title = COALESCE(excluded.title, books.title),
+    price_including_tax = COALESCE(excluded.price_including_tax, books.price_including_tax),
+    price_excluding_tax = COALESCE(excluded.price_excluding_tax, books.price_excluding_tax),
+    number_available = COALESCE(excluded.number_available, books.number_available),
+    product_description = COALESCE(excluded.product_description, books.product_description),
+    category = COALESCE(excluded.category, books.category),
+    review_rating = COALESCE(excluded.review_rating, books.review_rating),
+    image_url = COALESCE(excluded.image_url, books.image_url),
+    last_seen = excluded.last_seen
+"""
+
+
+class BookCatalogue:
+    """_summary_ : Catalogue SQLite des livres, avec l'historique de leurs prix et de leur stock.
+
+    Args:
+        path (str): Le chemin de la base de données, créée si elle n'existe pas.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        # Date du crawl, commune à toutes les lignes écrites pendant le crawl
+        self.seen_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+    def close(self) -> None:
+        """_summary_ : Ferme la base de données."""
+        self.connection.close()
+
+    def upsert(self, books_data: list[dict]) -> int:
+        """_summary_ : Ajoute ou met à jour des livres dans une seule transaction.
+
+        Args:
+            books_data (list[dict]): Les données des livres, telles que retournées par scraping_p1.parse_product_page().
+
+        Returns:
+            _int_: Le nombre de lignes ajoutées à l'historique (nouveaux livres et livres dont le prix ou le stock a
+            changé).
+        """
+        # Les champs absents (option --fields) sont passés à NULL : UPSERT_BOOK conserve alors les valeurs enregistrées
+        rows = [
+            dict(
+                {name: book_data.get(name) for name in BOOK_FIELDS},
+                price_including_tax=parse_price(book_data.get('price_including_tax')),
+                price_excluding_tax=parse_price(book_data.get('price_excluding_tax')),
+                seen_at=self.seen_at,
+            )
+            for book_data in books_data
+        ]
+        # Seuls les livres dont le prix et le stock ont été extraits peuvent être comparés à l'historique
+        history_candidates = [
+            row for row, book_data in zip(rows, books_data) if all(name in book_data for name in HISTORY_FIELDS)
+        ]
+        history_rows = 0
+        with self.connection:
+            # L'historique est écrit avant la mise à jour, pour comparer avec les valeurs précédentes
+            if history_candidates:
+                history_rows = self.connection.executemany(INSERT_HISTORY, history_candidates).rowcount
+            self.connection.executemany(UPSERT_BOOK, rows)
+        return history_rows
+
+    def price_history(self, universal_product_code: str) -> list[tuple]:
+        """_summary_ : Retourne l'historique du prix et du stock d'un livre.
+
+        Args:
+            universal_product_code (str): Le code UPC du livre.
+
+        Returns:
+            _list[tuple]_: La date, le prix TTC, le prix HT et le stock de chaque changement, du plus ancien au plus
+            récent.
+        """
+        return self.connection.execute(
+            "SELECT recorded_at, price_including_tax, price_excluding_tax, number_available FROM price_history "
+            "WHERE universal_product_code = ? ORDER BY recorded_at",
+            (universal_product_code,),
+        ).fetchall()
+
+
+class SqliteCategoryWriter:
+    """_summary_ : Écrit les données des livres d'une catégorie dans le catalogue, par lots de batch_size livres.
+
+    Même interface que csv_writer.StreamingCsvWriter. Les écritures étant des mises à jour par code UPC, une page
+    déjà écrite peut être réécrite sans créer de doublon.
+
+    Args:
+        catalogue (BookCatalogue): Le catalogue.
+        batch_size (int, optional): Nombre de livres par transaction. Defaults to DEFAULT_BATCH_SIZE.
+    """
+
+    def __init__(self, catalogue: BookCatalogue, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.catalogue = catalogue
+        self.batch_size = batch_size
+        self.path = catalogue.path
+        self.resume_offset = 0
+        self.rows_written = 0
+        self.history_rows = 0
+        self.buffer = []
+        self.closed = False
+
+    def __enter__(self) -> "SqliteCategoryWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, book_data: dict) -> None:
+        """_summary_ : Ajoute une ligne, écrite dès que le lot est complet.
+
+        Args:
+            book_data (dict): Les données d'un livre.
+        """
+        self.buffer.append(book_data)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """_summary_ : Écrit les lignes en attente dans le catalogue."""
+        if not self.buffer:
+            return
+        self.history_rows += self.catalogue.upsert(self.buffer)
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def tell(self) -> int:
+        """_summary_ : Écrit les lignes en attente. Toujours 0 : la reprise ne dépend d'aucune position."""
+        self.flush()
+        return 0
+
+    def close(self) -> bool:
+        """_summary_ : Écrit les dernières lignes.
+
+        Returns:
+            _bool_: True si un livre a été ajouté ou si le prix ou le stock d'un livre a changé.
+        """
+        if self.closed:
+            return False
+        self.closed = True
+        self.flush()
+        return self.history_rows > 0
+
+
+def open_catalogue(path: str) -> BookCatalogue:
+    """_summary_ : Ouvre le catalogue partagé utilisé par la sortie sqlite.
+
+    Args:
+        path (str): Le chemin de la base de données.
+
+    Returns:
+        _BookCatalogue_: Le catalogue.
+    """
+    global _catalogue
+    _catalogue = BookCatalogue(path)
+    return _catalogue
+
+
+def get_catalogue() -> BookCatalogue:
+    """_summary_ : Retourne le catalogue partagé, ou None s'il n'a pas été ouvert."""
+    return _catalogue
+
+
+def close_catalogue() -> None:
+    """_summary_ : Ferme le catalogue partagé."""
+    global _catalogue
+    if _catalogue is not None:
+        _catalogue.close()
+        _catalogue = None
@@ -0,0 +1,201 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+
+
+"""
+Description : File de travail durable du crawl distribué (voir distributed_crawl.py), conservée dans une base SQLite
+              partagée par le coordinateur et les processus de travail, sans service externe. Chaque élément est une
+              page produit à extraire, avec sa catégorie et sa position dans la catégorie.
+
+              Un processus de travail prend un lot d'éléments en location (lease) pour une durée limitée : si le
+              processus s'arrête avant d'avoir rendu leur résultat, la location expire et les éléments sont repris
+              par un autre processus. Un élément en échec est réessayé jusqu'à max_attempts fois.
+
+Version : 1.0.0
+
+Auteur : Kenza BAZI-KABBAJ
+
+Date : 07/09/2023
+"""
+
+# File de travail par défaut
+DEFAULT_QUEUE_FILE = "crawl_queue.sqlite"
+
+# Durée d'une location, en secondes
+DEFAULT_LEASE_SECONDS = 60.0
+
+# Nombre maximal de tentatives par élément
+DEFAULT_MAX_ATTEMPTS = 3
+
+# États d'un élément
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_until REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (state, lease_until);
+CREATE INDEX IF NOT EXISTS items_category ON items (category, position);
+"""
+
+
+def worker_name() -> str:
+    """_summary_ : Retourne un identifiant du processus courant, unique sur l'ensemble des machines."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """_summary_ : File de travail SQLite, avec location des éléments et reprise des locations expirées.
+
+    Args:
+        path (str, optional): Le chemin de la base de données, créée si elle n'existe pas. Defaults to DEFAULT_QUEUE_FILE.
+        lease_seconds (float, optional): Durée d'une location, en secondes. Defaults to DEFAULT_LEASE_SECONDS.
+        max_attempts (int, optional): Nombre maximal de tentatives par élément. Defaults to DEFAULT_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_FILE, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Transactions gérées explicitement : la location d'un lot doit être atomique entre les processus
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """_summary_ : Ferme la base de données."""
+        self.connection.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def put_many(self, items: list[tuple[str, str, int]]) -> int:
+        """_summary_ : Ajoute des éléments à la file. Un élément déjà présent (même URL) n'est pas ajouté à nouveau.
+
+        Args:
+            items (list[tuple[str, str, int]]): L'URL, la catégorie et la position de chaque élément.
+
+        Returns:
+            _int_: Le nombre d'éléments ajoutés.
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            added = self.connection.executemany(
+                "INSERT OR IGNORE INTO items (url, category, position) VALUES (?, ?, ?)", items
+            ).rowcount
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def lease(self, worker: str, batch_size: int = 1) -> list[tuple[int, str]]:
+        """_summary_ : Prend en location des éléments en attente ou dont la location a expiré.
+
+        Args:
+            worker (str): L'identifiant du processus de travail.
+            batch_size (int, optional): Nombre maximal d'éléments. Defaults to 1.
+
+        Returns:
+            _list[tuple[int, str]]_: L'identifiant et l'URL de chaque élément loué (liste vide si aucun n'est
+            disponible).
+        """
+        now = time.time()
+        # BEGIN IMMEDIATE verrouille la base en écriture : deux processus ne peuvent pas louer le même élément
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.connection.execute(
+                "SELECT id, url FROM items WHERE (state = ? OR (state = ? AND lease_until < ?)) AND attempts < ? "
+                "ORDER BY id LIMIT ?",
+                (PENDING, LEASED, now, self.max_attempts, batch_size),
+            ).fetchall()
+            self.connection.executemany(
+                "UPDATE items SET state = ?, lease_until = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+                [(LEASED, now + self.lease_seconds, worker, item_id) for item_id, _ in rows],
+            )
+            # Éléments dont la dernière location a expiré après max_attempts tentatives
+            self.connection.execute(
+                "UPDATE items SET state = ?, error = 'location expirée' WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def complete(self, item_id: int, worker: str, result: dict) -> bool:
+        """_summary_ : Enregistre le résultat d'un élément loué.
+
+        Args:
+            item_id (int): L'identifiant de l'élément.
+            worker (str): L'identifiant du processus de travail.
+            result (dict): Le résultat, sérialisable en JSON.
+
+        Returns:
+            _bool_: False si la location avait expiré et que l'élément a été repris par un autre processus.
+        """
+        return self.connection.execute(
+            "UPDATE items SET state = ?, result = ?, error = NULL, lease_until = NULL WHERE id = ? AND state = ? AND worker = ?",
+            (DONE, json.dumps(result), item_id, LEASED, worker),
+        ).rowcount == 1
+
+    def fail(self, item_id: int, worker: str, error: str) -> None:
+        """_summary_ : Remet en attente un élément en échec, ou le marque en échec définitif après max_attempts
+        tentatives.
+
+        Args:
+            item_id (int): L'identifiant de l'élément.
+            worker (str): L'identifiant du processus de travail.
+            error (str): La description de l'erreur.
+        """
+        self.connection.execute(
+            "UPDATE items SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, lease_until = NULL "
+            "WHERE id = ? AND state = ? AND worker = ?",
+            (self.max_attempts, FAILED, PENDING, error, item_id, LEASED, worker),
+        )
+
+    def counts(self) -> dict:
+        """_summary_ : Retourne le nombre d'éléments dans chaque état."""
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(self.connection.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+        return counts
+
+    def is_finished(self) -> bool:
+        """_summary_ : Indique si tous les éléments sont terminés ou en échec définitif."""
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def categories(self) -> list[str]:
+        """_summary_ : Retourne les noms des catégories de la file, dans l'ordre de leur ajout."""
+        return [row[0] for row in self.connection.execute("SELECT category FROM items GROUP BY category ORDER BY MIN(id)")]
+
+    def results(self, category: str):
+        """_summary_ : Parcourt les résultats d'une catégorie, dans l'ordre des livres sur le site.
+
+        Args:
+            category (str): Le nom de la catégorie.
+
+        Yields:
+            _dict_: Le résultat de chaque élément terminé de la catégorie.
+        """
+        cursor = self.connection.execute(
+            "SELECT result FROM items WHERE category = ? AND state = ? ORDER BY position", (category, DONE)
+        )
+        for (result,) in cursor:
+            yield json.loads(result)
@@ -0,0 +1,230 @@
+"""Performance benchmarks of the tournament model on large synthetic tournaments.
+
+Usage (from the chess_management directory):
+    python benchmark.py standings [--players N] [--rounds N]
+    python benchmark.py pairing [--players N] [--rounds N]
+    python benchmark.py load [--players N] [--rounds N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from models.player import Player
+from models.tournament import Tournament
+
+
+def build_tournament(players: int, rounds: int, seed: int = 0) -> Tournament:
+    """Builds a synthetic tournament and plays its rounds with random results.
+
+    Args:
+        players (int): Number of players.
+        rounds (int): Number of rounds to play.
+        seed (int, optional): Seed of the random results, so that runs are comparable.
+
+    Returns:
+        Tournament: The tournament, with all its rounds finished.
+    """
+    rng = random.Random(seed)
+    tournament = Tournament("Benchmark", "Paris", "01/01/2024", "02/01/2024", round_number=rounds)
+    for number in range(players):
+        tournament.add_player(Player(f"AB{number:05d}", f"First{number}", f"Last{number}", "01/01/2000"))
+
+    # The rounds announce themselves on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            tournament.start_new_round()
+            for match in tournament.rounds[-1].matches:
+                match.set_scores(*rng.choice(((1, 0), (0, 1), (0.5, 0.5))))
+            tournament.rounds[-1].end_round()
+    return tournament
+
+
+def scan_player_points(tournament: Tournament, player: Player) -> float:
+    """Computes the points of a player by scanning every match of every round (the former get_player_points)."""
+    total_points = 0
+    for round in tournament.rounds:
+        for match in round.matches:
+            if match.player1 == player:
+                total_points += match.score1
+            elif match.player2 == player:
+                total_points += match.score2
+    return total_points
+
+
+def bench_standings(args: argparse.Namespace) -> None:
+    """Compares the running standings with a full scan of the matches, for the work done on each round: sorting
+    the players by points and updating the totals of both players of every match."""
+    tournament = build_tournament(args.players, args.rounds)
+    matches = sum(len(round.matches) for round in tournament.rounds)
+    print(f"{args.players} players, {len(tournament.rounds)} rounds, {matches} matches")
+
+    # Both methods must give the same points
+    for player in tournament.players:
+        if scan_player_points(tournament, player) != tournament.get_player_points(player):
+            raise AssertionError(f"Standings differ from the scan for {player.chess_id}")
+
+    last_matches = tournament.rounds[-1].matches
+    candidates = [
+        ("scan of all matches", lambda player: scan_player_points(tournament, player)),
+        ("running standings", tournament.get_player_points),
+    ]
+    print(f"{'method':22} {'sort (ms)':>10} {'round update (ms)':>18}")
+    for label, get_points in candidates:
+        start = time.perf_counter()
+        sorted(tournament.players, key=lambda player: -get_points(player))
+        sort_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for match in last_matches:
+            match.total_points_player1 = get_points(match.player1)
+            match.total_points_player2 = get_points(match.player2)
+        update_time = time.perf_counter() - start
+        print(f"{label:22} {sort_time * 1000:>10.2f} {update_time * 1000:>18.2f}")
+
+
+def greedy_round_pairs(tournament: Tournament) -> list:
+    """Pairs the players with the former first-fit scan, rebuilding the set of played matches from all the rounds."""
+    played_matches = {
+        (match.player1.chess_id, match.player2.chess_id) for r in tournament.rounds for match in r.matches
+    }
+    paired_players = set()
+    pairs = []
+    for i, player1 in enumerate(tournament.players):
+        if player1.chess_id in paired_players:
+            continue
+        for player2 in tournament.players[i + 1:]:
+            if (
+                (player2.chess_id in paired_players)
+                or ((player1.chess_id, player2.chess_id) in played_matches)
+                or ((player2.chess_id, player1.chess_id) in played_matches)
+            ):
+                continue
+            pairs.append((player1, player2))
+            paired_players.update([player1.chess_id, player2.chess_id])
+            break
+    return pairs
+
+
+def bench_pairing(args: argparse.Namespace) -> None:
+    """Measures the pairing time of every round with the Swiss pairing engine and with the former first-fit scan,
+    and the number of players each of them leaves unpaired."""
+    rng = random.Random(0)
+    tournament = build_tournament(args.players, 0)
+    tournament.round_number = args.rounds
+    print(f"{args.players} players, {args.rounds} rounds")
+    print(
+        f"{'round':>5} {'engine (ms)':>12} {'unpaired':>9} {'first-fit (ms)':>15} {'unpaired':>9} "
+        f"{'same colour x3':>15}"
+    )
+    for number in range(1, args.rounds + 1):
+        if number > 1:
+            tournament.players.sort(key=lambda player: -tournament.get_player_points(player))
+        start = time.perf_counter()
+        greedy = greedy_round_pairs(tournament)
+        greedy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_round, pairs = tournament.generate_round_pairs()
+        engine_time = time.perf_counter() - start
+
+        tournament.rounds.append(new_round)
+        tournament.history.add_round(new_round, tournament.standings.points)
+        # Players given the same colour in their last three rounds
+        repeats = sum(
+            1 for colours in tournament.history.colours.values() if len(colours) >= 3 and len(set(colours[-3:])) == 1
+        )
+        tournament.current_round += 1
+        for match in new_round.matches:
+            match.set_scores(*rng.choice(((1, 0), (0, 1), (0.5, 0.5))))
+        print(
+            f"{number:>5} {engine_time * 1000:>12.1f} {args.players - 2 * len(pairs):>9} "
+            f"{greedy_time * 1000:>15.1f} {args.players - 2 * len(greedy):>9} {repeats:>15}"
+        )
+
+
+class ScanTournament(Tournament):
+    """Tournament whose players are found by a linear scan of the player list (the former find_player_by_id)."""
+
+    def find_player_by_id(self, chess_id: str) -> Player:
+        for player in self.players:
+            if player.chess_id == chess_id:
+                return player
+        raise ValueError(f"Player with ID {chess_id} not found in tournament.")
+
+
+def legacy_dict(tournament: Tournament) -> dict:
+    """Serializes a tournament in version 1 of the save format, where every match embeds its two players."""
+    data = tournament.to_dict()
+    del data["format_version"]
+    data["rounds"] = [
+        {"name": round.name, "matches": [match.to_dict() for match in round.matches], "is_finished": round.is_finished}
+        for round in tournament.rounds
+    ]
+    return data
+
+
+def bench_load(args: argparse.Namespace) -> None:
+    """Measures the saving and loading times of a tournament in both save formats, and the loading time with the
+    index of the players and with a linear scan."""
+    tournament = build_tournament(args.players, args.rounds)
+    print(f"{args.players} players, {args.rounds} rounds")
+    print(f"{'save format':28} {'size (MB)':>10} {'write (ms)':>11} {'json.load (ms)':>15} {'from_dict (ms)':>15}")
+    formats = [
+        ("version 1, scan", legacy_dict(tournament), {"indent": 4}, ScanTournament),
+        ("version 1, index", legacy_dict(tournament), {"indent": 4}, Tournament),
+        ("version 2, index", tournament.to_dict(), {"separators": (",", ":")}, Tournament),
+    ]
+    with tempfile.TemporaryDirectory() as folder:
+        for label, data, dump_options, tournament_class in formats:
+            file_path = os.path.join(folder, "tournament.json")
+            start = time.perf_counter()
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, **dump_options)
+            write_time = time.perf_counter() - start
+            size = os.path.getsize(file_path) / 2**20
+
+            start = time.perf_counter()
+            with open(file_path, "r") as file:
+                loaded_data = json.load(file)
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = tournament_class.from_dict(loaded_data)
+            from_dict_time = time.perf_counter() - start
+            if loaded.standings.points != tournament.standings.points:
+                raise AssertionError(f"{label} does not restore the standings")
+            print(
+                f"{label:28} {size:>10.2f} {write_time * 1000:>11.1f} {load_time * 1000:>15.1f} "
+                f"{from_dict_time * 1000:>15.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks of the tournament model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    standings_parser = subparsers.add_parser("standings", help="Running standings against a scan of all matches")
+    standings_parser.add_argument("--players", type=int, default=1000, help="Number of players")
+    standings_parser.add_argument("--rounds", type=int, default=11, help="Number of rounds")
+    standings_parser.set_defaults(func=bench_standings)
+
+    pairing_parser = subparsers.add_parser("pairing", help="Swiss pairing engine against the former first-fit scan")
+    pairing_parser.add_argument("--players", type=int, default=1000, help="Number of players")
+    pairing_parser.add_argument("--rounds", type=int, default=11, help="Number of rounds")
+    pairing_parser.set_defaults(func=bench_pairing)
+
+    load_parser = subparsers.add_parser("load", help="Saving and loading times of a tournament in both save formats")
+    load_parser.add_argument("--players", type=int, default=2000, help="Number of players")
+    load_parser.add_argument("--rounds", type=int, default=9, help="Number of rounds")
+    load_parser.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
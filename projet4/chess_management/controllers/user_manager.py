@@ -22,7 +22,10 @@ class UserManager:
 
         # Check if a tournament exists before adding the player
         if self.controller.tournament_manager.tournament is not None:
-            self.controller.tournament_manager.tournament.add_player(player)
+            try:
+                self.controller.tournament_manager.tournament.add_player(player)
+            except ValueError as error:
+                self.user_view.show_error(str(error))
         else:
             print("No tournament has been created. Please create a tournament before adding players.")
 
@@ -0,0 +1,22 @@
+"""Converts the saved tournaments to the current, compact save format.
+
+Usage (from the chess_management directory):
+    python migrate_saves.py [--directory data/tournaments]
+"""
+import argparse
+from utils.save_data import migrate_tournaments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert saved tournaments to the current save format")
+    parser.add_argument("--directory", default="data/tournaments", help="Directory of the tournament JSON files")
+    args = parser.parse_args()
+
+    migrated = migrate_tournaments(args.directory)
+    for file_name in migrated:
+        print(f"Converted {file_name}")
+    print(f"{len(migrated)} tournament file(s) converted in {args.directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,8 @@ class Match:
         self.score2 = score2
         self.total_points_player1 = 0
         self.total_points_player2 = 0
+        # Standings of the tournament, updated when the scores are set (see Tournament.attach_match)
+        self.standings = None
 
     @property
     def is_finished(self) -> bool:
@@ -42,6 +44,8 @@ class Match:
             score1 (float): Score for player1.
             score2 (float): Score for player2.
         """
+        if self.standings is not None:
+            self.standings.record_scores(self, score1, score2)
         self.score1 = score1
         self.score2 = score2
 
@@ -0,0 +1,273 @@
+from itertools import chain
+from models.player import Player
+
+# Colours of a player in a match: player1 plays white, player2 plays black
+WHITE, BLACK = "W", "B"
+
+# Float of a player paired outside their score group
+DOWN, UP = "down", "up"
+
+# Maximum number of pairing attempts of the backtracking search before falling back to a greedy pairing
+MAX_PAIRING_STEPS = 100000
+
+
+class PairingHistory:
+    """Opponents, colours and floats of every player in the rounds already started, keyed by chess ID.
+
+    The index is updated once per round (see Tournament.start_new_round) instead of being rebuilt from all the
+    matches each time pairs are generated.
+
+    Attributes:
+        opponents (dict): Chess IDs of the opponents already met by each player.
+        colours (dict): Colours played by each player, in round order.
+        floats (dict): Float of each player in their last round (DOWN, UP or None).
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty PairingHistory instance."""
+        self.opponents = {}
+        self.colours = {}
+        self.floats = {}
+
+    def have_played(self, chess_id1: str, chess_id2: str) -> bool:
+        """Checks if two players have already met.
+
+        Args:
+            chess_id1 (str): The chess ID of the first player.
+            chess_id2 (str): The chess ID of the second player.
+
+        Returns:
+            bool: True if the players have already played each other.
+        """
+        return chess_id2 in self.opponents.get(chess_id1, ())
+
+    def add_round(self, round, points: dict) -> None:
+        """Records the pairs of a new round.
+
+        Args:
+            round (Round): The round, with player1 of each match playing white.
+            points (dict): The points of each player before the round, keyed by chess ID.
+        """
+        paired = set()
+        for match in round.matches:
+            id1 = match.player1.chess_id
+            id2 = match.player2.chess_id
+            self.opponents.setdefault(id1, set()).add(id2)
+            self.opponents.setdefault(id2, set()).add(id1)
+            self.colours.setdefault(id1, []).append(WHITE)
+            self.colours.setdefault(id2, []).append(BLACK)
+            points1 = points.get(id1, 0)
+            points2 = points.get(id2, 0)
+            self.floats[id1] = DOWN if points1 > points2 else UP if points1 < points2 else None
+            self.floats[id2] = DOWN if points2 > points1 else UP if points2 < points1 else None
+            paired.update((id1, id2))
+        # A player left out of the round has no float in it
+        for chess_id in self.floats.keys() - paired:
+            self.floats[chess_id] = None
+
+    def rebuild(self, rounds: list) -> None:
+        """Recomputes the index from all the rounds, e.g. after loading a saved tournament.
+
+        Args:
+            rounds (list[Round]): The rounds of the tournament.
+        """
+        self.opponents = {}
+        self.colours = {}
+        self.floats = {}
+        points = {}
+        for round in rounds:
+            self.add_round(round, points)
+            for match in round.matches:
+                if match.is_finished:
+                    points[match.player1.chess_id] = points.get(match.player1.chess_id, 0) + match.score1
+                    points[match.player2.chess_id] = points.get(match.player2.chess_id, 0) + match.score2
+
+    def has_possible_pair(self, chess_ids: list) -> bool:
+        """Checks if at least two of the players have not met yet, without pairing them.
+
+        Args:
+            chess_ids (list): The chess IDs of the players, without duplicates.
+
+        Returns:
+            bool: True if at least one match can still be formed.
+        """
+        # A player who has not met every other player still has a possible opponent
+        others = len(chess_ids) - 1
+        return any(len(self.opponents.get(chess_id, ())) < others for chess_id in chess_ids)
+
+    def colour_preference(self, chess_id: str) -> tuple:
+        """Returns the colour a player should play next, as in the Dutch system.
+
+        Args:
+            chess_id (str): The chess ID of the player.
+
+        Returns:
+            tuple: The preferred colour (WHITE, BLACK or None) and whether the preference is absolute (the player has
+            two more games with one colour, or played it in both of their last two games).
+        """
+        colours = self.colours.get(chess_id)
+        if not colours:
+            return None, False
+        balance = colours.count(WHITE) - colours.count(BLACK)
+        if balance > 0:
+            preferred = BLACK
+        elif balance < 0:
+            preferred = WHITE
+        else:
+            preferred = BLACK if colours[-1] == WHITE else WHITE
+        absolute = abs(balance) >= 2 or (len(colours) >= 2 and colours[-1] == colours[-2])
+        return preferred, absolute
+
+
+def assign_colours(player1: Player, player2: Player, history: PairingHistory) -> tuple:
+    """Orders the players of a pair so that the first one plays white, honouring their colour preferences.
+
+    When both players prefer the same colour, an absolute preference wins, then the higher-ranked player (player1).
+
+    Args:
+        player1 (Player): The higher-ranked player of the pair.
+        player2 (Player): The other player.
+        history (PairingHistory): The pairing history of the tournament.
+
+    Returns:
+        tuple: The white player and the black player.
+    """
+    colour1, absolute1 = history.colour_preference(player1.chess_id)
+    colour2, absolute2 = history.colour_preference(player2.chess_id)
+    if colour1 is None or (colour1 == colour2 and absolute2 and not absolute1):
+        colour1 = BLACK if colour2 == WHITE else WHITE
+    return (player1, player2) if colour1 == WHITE else (player2, player1)
+
+
+class _PairingPlan:
+    """Score groups, Dutch partners and pairing state of the players of a round, by rank index."""
+
+    def __init__(self, players: list, points: dict, history: PairingHistory) -> None:
+        self.history = history
+        self.ids = [player.chess_id for player in players]
+        self.preferences = [history.colour_preference(chess_id) for chess_id in self.ids]
+        self.paired = [False] * len(players)
+        self.group_end = [0] * len(players)
+        # Index of the first opponent tried: the S2 player at the same position for an S1 player, else the next one
+        self.partner = [index + 1 for index in range(len(players))]
+        start = 0
+        while start < len(players):
+            group = points.get(self.ids[start], 0)
+            end = start + 1
+            while end < len(players) and points.get(self.ids[end], 0) == group:
+                end += 1
+            half = (end - start) // 2
+            for index in range(start, end):
+                self.group_end[index] = end
+                if index < start + half:
+                    self.partner[index] = index + half
+            start = end
+
+
+def _candidates(index: int, plan: _PairingPlan):
+    """Yields the possible opponents of the player at index, in order of preference.
+
+    As in the Dutch system, the score group is split into an upper half S1 and a lower half S2: a player of S1 first
+    meets the S2 player at the same position, then the following players of the group, then the players above that
+    one. Players of the lower score groups (a downfloat) come last. Opponents with the same absolute colour
+    preference, or who already floated up in the last round for a downfloat, are moved to the end of their part of
+    the list. The opponents are found lazily, since the first one is usually accepted.
+    """
+    ids, paired = plan.ids, plan.paired
+    played = plan.history.opponents.get(ids[index], ())
+    colour, absolute = plan.preferences[index]
+    end = plan.group_end[index]
+    start = plan.partner[index]
+
+    postponed = []
+    for candidate in chain(range(start, end), range(index + 1, start)):
+        if paired[candidate] or ids[candidate] in played:
+            continue
+        if absolute and plan.preferences[candidate] == (colour, True):
+            postponed.append(candidate)
+        else:
+            yield candidate
+    # The search resumes this generator only once the pairs made since are undone, so postponed players are unpaired
+    yield from postponed
+
+    floated_up = []
+    for candidate in range(end, len(ids)):
+        if paired[candidate] or ids[candidate] in played:
+            continue
+        if plan.history.floats.get(ids[candidate]) == UP:
+            floated_up.append(candidate)
+        else:
+            yield candidate
+    yield from floated_up
+
+
+def _greedy_pairs(players: list, history: PairingHistory) -> list:
+    # First-fit pairing by rank, which pairs as many players as it can when no complete pairing exists
+    paired = set()
+    pairs = []
+    for i, player1 in enumerate(players):
+        if player1.chess_id in paired:
+            continue
+        for player2 in players[i + 1:]:
+            if player2.chess_id in paired or history.have_played(player1.chess_id, player2.chess_id):
+                continue
+            pairs.append((player1, player2))
+            paired.update((player1.chess_id, player2.chess_id))
+            break
+    return pairs
+
+
+def pair_players(players: list, points: dict, history: PairingHistory, max_steps: int = MAX_PAIRING_STEPS) -> list:
+    """Pairs the players of a new Swiss round, so that no two players meet twice.
+
+    The players are paired by rank within their score group (Dutch system), with a backtracking search: when a
+    player has no possible opponent left, the previous pairs are revised until every player is paired. With an odd
+    number of players, the lowest-ranked player possible is left unpaired. If no complete pairing exists or if the
+    search exceeds max_steps attempts, the players are paired greedily by rank and some of them stay unpaired.
+
+    Args:
+        players (list[Player]): The players, sorted by rank (points first).
+        points (dict): The points of each player, keyed by chess ID.
+        history (PairingHistory): The pairing history of the tournament.
+        max_steps (int, optional): Maximum number of attempts of the backtracking search.
+
+    Returns:
+        list: The pairs (white player, black player), by rank.
+    """
+    count = len(players)
+    plan = _PairingPlan(players, points, history)
+    paired = plan.paired
+    # The search succeeds when every player is paired, except one if their number is odd
+    target = count // 2
+    stack = []  # (player index, remaining candidates, current opponent index)
+    steps = 0
+
+    def next_unpaired(start: int) -> int:
+        while start < count and paired[start]:
+            start += 1
+        return start
+
+    index = next_unpaired(0)
+    candidates = None
+    while len(stack) < target:
+        steps += 1
+        if steps > max_steps:
+            break
+        if candidates is None:
+            candidates = _candidates(index, plan)
+        opponent = next(candidates, None)
+        if opponent is not None:
+            paired[index] = paired[opponent] = True
+            stack.append((index, candidates, opponent))
+            index = next_unpaired(index + 1)
+            candidates = None
+            continue
+        # No opponent left for this player: revise the previous pair
+        if not stack:
+            break
+        index, candidates, opponent = stack.pop()
+        paired[index] = paired[opponent] = False
+
+    if len(stack) < target:
+        return [assign_colours(player1, player2, history) for player1, player2 in _greedy_pairs(players, history)]
+    return [assign_colours(players[index], players[opponent], history) for index, _, opponent in stack]
@@ -0,0 +1,66 @@
+class Standings:
+    """Running points table of a tournament, keyed by chess ID.
+
+    The table is updated by Match.set_scores each time a result is entered, so reading a player's points never
+    rescans the rounds.
+
+    Attributes:
+        points (dict): Total points of each player, keyed by chess ID.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty Standings instance."""
+        self.points = {}
+
+    def add_player(self, chess_id: str) -> None:
+        """Adds a player with no points to the table, if not already present.
+
+        Args:
+            chess_id (str): The chess ID of the player.
+        """
+        if chess_id not in self.points:
+            self.points[chess_id] = 0
+
+    def get_points(self, chess_id: str) -> float:
+        """Returns the total points of a player.
+
+        Args:
+            chess_id (str): The chess ID of the player.
+
+        Returns:
+            float: The total points of the player, 0 if they have no recorded result.
+        """
+        return self.points.get(chess_id, 0)
+
+    def record_scores(self, match, score1: float, score2: float) -> None:
+        """Replaces the scores of a match in the table, removing its previous scores if they were already set.
+
+        Args:
+            match (Match): The match whose scores change.
+            score1 (float): The new score of player1.
+            score2 (float): The new score of player2.
+        """
+        points = self.points
+        id1 = match.player1.chess_id
+        id2 = match.player2.chess_id
+        if match.is_finished:
+            points[id1] = points.get(id1, 0) - match.score1
+            points[id2] = points.get(id2, 0) - match.score2
+        if score1 is not None and score2 is not None:
+            points[id1] = points.get(id1, 0) + score1
+            points[id2] = points.get(id2, 0) + score2
+
+    def rebuild(self, players: list, rounds: list) -> None:
+        """Recomputes the table from the results of all rounds, e.g. after loading a saved tournament.
+
+        Args:
+            players (list[Player]): The players of the tournament.
+            rounds (list[Round]): The rounds of the tournament.
+        """
+        self.points = {player.chess_id: 0 for player in players}
+        for round in rounds:
+            for match in round.matches:
+                match.standings = self
+                if match.is_finished:
+                    self.points[match.player1.chess_id] = self.get_points(match.player1.chess_id) + match.score1
+                    self.points[match.player2.chess_id] = self.get_points(match.player2.chess_id) + match.score2
@@ -2,6 +2,12 @@ import random
 from models.player import Player
 from models.match import Match
 from models.round import Round
+from models.standings import Standings
+from models.pairing import PairingHistory, pair_players
+
+# Version of the save format written by Tournament.to_dict. Version 1 (no "format_version" key) embedded both
+# players in every match; version 2 stores the roster once and each match as [chess ID 1, chess ID 2, score1, score2].
+SAVE_FORMAT_VERSION = 2
 
 
 class Tournament:
@@ -24,6 +30,9 @@ class Tournament:
         current_round (int): The round that is currently being played.
         rounds (List[Round]): A list to store the rounds of the tournament.
         players (List[Player]): A list to store the players participating in the tournament.
+        players_by_id (dict): The players of the tournament, keyed by chess ID.
+        standings (Standings): The running points table of the players, keyed by chess ID.
+        history (PairingHistory): The opponents, colours and floats of the players in the rounds already started.
     """
 
     def __init__(
@@ -44,22 +53,26 @@ class Tournament:
         self.current_round = 1
         self.rounds = []
         self.players = []
+        self.players_by_id = {}
+        self.standings = Standings()
+        self.history = PairingHistory()
 
     def add_player(self, player: Player) -> None:
-        """Adds a new player to the tournament's player list."""
+        """Adds a new player to the tournament's player list, rejecting a chess ID already registered."""
+        if player.chess_id in self.players_by_id:
+            raise ValueError(f"Player with ID {player.chess_id} is already registered in the tournament.")
         self.players.append(player)
+        self.players_by_id[player.chess_id] = player
+        self.standings.add_player(player.chess_id)
+
+    def attach_match(self, match: Match) -> Match:
+        """Links a match to the tournament standings, so that setting its scores updates the players' points."""
+        match.standings = self.standings
+        return match
 
     def get_player_points(self, player: Player) -> float:
-        """Calculates the total points of a player by summing up the points from all matches."""
-        total_points = 0
-        for round in self.rounds:
-            for match in round.matches:
-                # Accumulate points if the player was part of the match
-                if match.player1 == player:
-                    total_points += match.score1
-                elif match.player2 == player:
-                    total_points += match.score2
-        return total_points
+        """Returns the total points of a player from the running standings, without rescanning the matches."""
+        return self.standings.get_points(player.chess_id)
 
     def start_new_round(self):
         """Begins a new round if the previous one has finished, otherwise alerts that the current round is still
@@ -82,41 +95,21 @@ class Tournament:
         # Generate player pairs for the new round
         new_round, _ = self.generate_round_pairs()
         self.rounds.append(new_round)
+        self.history.add_round(new_round, self.standings.points)
         new_round.start_round()
         print(f"Round {self.current_round} of the tournament has started.")
         self.current_round += 1
 
     def generate_round_pairs(self) -> tuple:
         """Generates unique player pairs for matches in the current round to ensure each player only plays against
-        another once."""
-
-        # Collect all previously played matches to avoid repeats.
-        played_matches = {(match.player1.chess_id, match.player2.chess_id) for r in self.rounds for match in r.matches}
-
-        # Initialize sets to track pairs and matches for the current round.
-        paired_players = set()
-        current_round_matches = []
+        another once. The players are paired by the Swiss pairing engine (see models/pairing.py), in their current
+        order, using the opponent history of the tournament."""
         current_round = Round(f"Round {self.current_round}")
-
-        # Loop through players and pair them if they haven't been paired before.
-        for i, player1 in enumerate(self.players):
-            if player1.chess_id in paired_players:
-                continue
-            for _, player2 in enumerate(self.players[i + 1:], start=i + 1):
-                if (
-                    (player2.chess_id in paired_players)
-                    or ((player1.chess_id, player2.chess_id) in played_matches)
-                    or ((player2.chess_id, player1.chess_id) in played_matches)
-                ):
-                    continue
-
-                current_round_matches.append((player1, player2))
-                paired_players.update([player1.chess_id, player2.chess_id])
-                break
+        current_round_matches = pair_players(self.players, self.standings.points, self.history)
 
         # Create Match objects for each pair and add them to the current round.
         for player1, player2 in current_round_matches:
-            current_round.add_match(Match(player1, player2))
+            current_round.add_match(self.attach_match(Match(player1, player2)))
 
         return current_round, current_round_matches
 
@@ -131,11 +124,10 @@ class Tournament:
 
     def is_ended(self) -> bool:
         """Determines if the tournament has finished either by completing the designated number of rounds or if no more
-        matches can be formed."""
+        matches can be formed. The check uses the opponent history and does not pair the players."""
         if len(self.rounds) >= self.round_number:
             return True
-        _, pairs = self.generate_round_pairs()
-        return len(pairs) == 0
+        return not self.history.has_possible_pair([player.chess_id for player in self.players])
 
     def __str__(self) -> str:
         """Provides a human-readable string representation of the tournament."""
@@ -151,12 +143,14 @@ class Tournament:
 
         This method is typically used for saving the state of the tournament to a file
         or sending over a network in a format that can be easily converted to JSON.
+        The dictionary follows version 2 of the save format (see SAVE_FORMAT_VERSION).
 
         Returns:
             dict: A dictionary representation of the tournament with all its current state data.
         """
         # Create a base dictionary with the tournament's metadata.
         tournament_dict = {
+            "format_version": SAVE_FORMAT_VERSION,  # Version of the save format
             "name": self.name,  # Name of the tournament
             "location": self.location,  # Physical location of the tournament
             "start_date": self.start_date,  # Starting date of the tournament
@@ -164,27 +158,23 @@ class Tournament:
             "description": self.description,  # Description of the tournament
             "round_number": self.round_number,  # Total number of rounds in the tournament
             "current_round": self.current_round,  # Current round number
-            # Convert each player to a dictionary; good for JSON serialization
+            # The roster is stored once; the matches reference the players by chess ID
             "players": [player.to_dict() for player in self.players],
             "rounds": [],  # Initialize rounds as an empty list to be filled next
         }
 
         # Iterate over each round in the tournament.
         for round in self.rounds:
-            # Create a dictionary to represent the round.
+            # Each match is stored as [chess ID of player1, chess ID of player2, score1, score2].
             round_dict = {
                 "name": round.name,  # Name of the round
-                "matches": [],  # Initialize matches as an empty list to be filled
+                "matches": [
+                    [match.player1.chess_id, match.player2.chess_id, match.score1, match.score2]
+                    for match in round.matches
+                ],
                 "is_finished": round.is_finished,  # Boolean indicating if the round is finished
             }
 
-            # Iterate over each match in the round.
-            for match in round.matches:
-                # Convert the match to a dictionary using its own to_dict method.
-                match_dict = match.to_dict()
-                # Append the match dictionary to the round's list of matches.
-                round_dict["matches"].append(match_dict)
-
             # Append the fully constructed round dictionary to the tournament's list of rounds.
             tournament_dict["rounds"].append(round_dict)
 
@@ -195,6 +185,9 @@ class Tournament:
         """Creates a Tournament object from a dictionary representation. This method is typically used when loading a
         tournament from a saved state, such as a JSON file.
 
+        Both versions of the save format are read: version 1, where every match embeds its two players, and
+        version 2, where every match is a [chess ID 1, chess ID 2, score1, score2] list.
+
         Args:
             data (dict): A dictionary containing all the tournament information.
 
@@ -220,40 +213,64 @@ class Tournament:
 
         # Add players to the tournament from the 'players' data.
         # Each player is created using the Player.from_dict method.
+        # Players saved with a duplicate chess ID are kept, so that has_duplicate_players reports them.
         for player_data in data.get("players", []):
             player = Player.from_dict(player_data)
             tournament.players.append(player)
+            tournament.players_by_id.setdefault(player.chess_id, player)
 
         # Add rounds and their matches to the tournament from the 'rounds' data.
-        # Each round is created using the Round.from_dict method.
+        # The matches reference the tournament's players, so Round.from_dict (which creates new players) is not used.
+        format_version = data.get("format_version", 1)
+        points = {}  # Points of each player after each round, for the totals of the version 2 matches
         for round_data in data.get("rounds", []):
-            round = Round.from_dict(round_data)
-            round.matches = []  # Reset the matches list for the round.
+            round = Round(round_data["name"])
 
             # For each match in the round, find the players by their ID,
             # and create a Match object with the retrieved players and scores.
             for match_data in round_data["matches"]:
-                player1 = tournament.find_player_by_id(match_data["player1"]["chess_id"])
-                player2 = tournament.find_player_by_id(match_data["player2"]["chess_id"])
-                match = Match(player1, player2)
-                match.score1 = match_data["score1"]
-                match.score2 = match_data["score2"]
+                if format_version >= 2:
+                    chess_id1, chess_id2, score1, score2 = match_data
+                else:
+                    chess_id1 = match_data["player1"]["chess_id"]
+                    chess_id2 = match_data["player2"]["chess_id"]
+                    score1 = match_data["score1"]
+                    score2 = match_data["score2"]
+                match = Match(tournament.find_player_by_id(chess_id1), tournament.find_player_by_id(chess_id2))
+                match.score1 = score1
+                match.score2 = score2
 
                 # Set the total points accumulated by each player up to this match.
-                match.total_points_player1 = match_data.get("total_points_player1", 0)
-                match.total_points_player2 = match_data.get("total_points_player2", 0)
+                if format_version < 2:
+                    match.total_points_player1 = match_data.get("total_points_player1", 0)
+                    match.total_points_player2 = match_data.get("total_points_player2", 0)
                 round.matches.append(match)
 
+            # Version 2 does not store the totals: they are the players' points at the end of the round.
+            if format_version >= 2:
+                for match in round.matches:
+                    if match.is_finished:
+                        points[match.player1.chess_id] = points.get(match.player1.chess_id, 0) + match.score1
+                        points[match.player2.chess_id] = points.get(match.player2.chess_id, 0) + match.score2
+                for match in round.matches:
+                    if match.is_finished:
+                        match.total_points_player1 = points[match.player1.chess_id]
+                        match.total_points_player2 = points[match.player2.chess_id]
+
             # Add the fully constructed round to the tournament's list of rounds.
             tournament.rounds.append(round)
 
+        # Recompute the standings from the loaded results and link every match to them.
+        tournament.standings.rebuild(tournament.players, tournament.rounds)
+        tournament.history.rebuild(tournament.rounds)
+
         return tournament  # Return the fully reconstructed Tournament object.
 
     def find_player_by_id(self, chess_id: str) -> Player:
-        """Searches for a player in the tournament by their chess ID and returns the Player object."""
-        for player in self.players:
-            if player.chess_id == chess_id:
-                return player
+        """Returns the Player object of a chess ID, from the index of the players."""
+        player = self.players_by_id.get(chess_id)
+        if player is not None:
+            return player
         raise ValueError(f"Player with ID {chess_id} not found in tournament.")
 
     def is_valid_player_count(self) -> bool:
@@ -261,6 +278,6 @@ class Tournament:
         return len(self.players) % 2 == 0
 
     def has_duplicate_players(self) -> bool:
-        """Checks for duplicate player entries based on chess ID, which should be unique."""
-        ids = [player.chess_id for player in self.players]
-        return len(ids) != len(set(ids))
+        """Checks for duplicate player entries based on chess ID, which should be unique. add_player rejects them, so
+        they can only come from a saved tournament."""
+        return len(self.players_by_id) != len(self.players)
@@ -4,7 +4,8 @@ from models.tournament import Tournament
 
 
 def load_state(file_name):
-    """Cette méthode va charger un fichier JSON du tournoi.
+    """Cette méthode va charger un fichier JSON du tournoi, à l'ancien format (version 1) comme au format
+    compact (version 2).
 
     Args:
         file_name (file): le fichier JSON contenant les informations du
@@ -1,5 +1,6 @@
 import os
 import json
+from models.tournament import Tournament, SAVE_FORMAT_VERSION
 
 
 def save_tournament(tournament):
@@ -23,6 +24,38 @@ def save_tournament(tournament):
         file_path = os.path.join(directory, file_name)
 
         with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(tournament.to_dict(), f, ensure_ascii=False, indent=4)
+            # Format compact (version 2, sans indentation) : les joueurs ne sont enregistrés qu'une fois
+            json.dump(tournament.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
 
         return file_path
+
+
+def migrate_tournaments(directory="data/tournaments"):
+    """Convertit au format de sauvegarde actuel (version 2) les fichiers JSON des tournois d'un dossier.
+
+    Chaque fichier est réécrit sous un nom temporaire puis renommé, afin de ne jamais laisser de fichier
+    partiellement écrit. Les fichiers déjà au format actuel ne sont pas modifiés.
+
+    Args:
+        directory (str): le dossier des fichiers JSON des tournois
+
+    Returns:
+        migrated (list) : noms des fichiers convertis
+    """
+    migrated = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".json"):
+            continue
+        file_path = os.path.join(directory, file_name)
+        with open(file_path, "r", encoding="utf-8") as f:
+            tournament_data = json.load(f)
+        if tournament_data.get("format_version", 1) >= SAVE_FORMAT_VERSION:
+            continue
+
+        tournament = Tournament.from_dict(tournament_data)
+        temporary_path = file_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(tournament.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary_path, file_path)
+        migrated.append(file_name)
+    return migrated